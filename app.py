@@ -1,82 +1,294 @@
 # app.py
-from flask import Flask, render_template, request, redirect, url_for, flash
+import atexit
+import gzip
+import hashlib
+import io
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, Response, g, session
+from flask import before_render_template, template_rendered
+from markupsafe import Markup, escape
 import lecture_manager_core as core 
-from load_df import download_last_version
+import load_df
+import metrics
 app = Flask(__name__)
-app.secret_key = "your_very_secret_key_here" 
+app.secret_key = os.environ.get("LECTURE_MANAGER_SECRET_KEY", "your_very_secret_key_here") # Must match across worker processes
+
+SUBTITLE_GZIP_MIN_BYTES = 1024 # Smaller transcripts aren't worth compressing
+REQUEST_PROFILING = True # Requests sent with an "X-Profile: 1" header get a Server-Timing breakdown
+
+ROUTE_SECONDS = metrics.Histogram("lecture_manager_http_request_seconds", "Time to handle HTTP requests.", profile_name="route")
+TEMPLATE_SECONDS = metrics.Histogram("lecture_manager_template_render_seconds", "Time to render templates.", profile_name="render")
+
+# Startup: Flask serves immediately while the DB is migrated, yt-dlp is probed and the CSV is parsed
+BACKGROUND_STARTUP = os.environ.get("LECTURE_MANAGER_BACKGROUND_STARTUP", "1") != "0" # "0" restores blocking startup
+STARTUP_REQUEST_WAIT = 3 # Seconds a request waits for background startup before running with what's loaded
+USER_NAME_MAX_LENGTH = 64
 
 # Global variables
-lectures_df = None
+lectures_df = None # Kept for diffing on reload
+lecture_index = None # lectures.csv as parsed; request handlers read the requesting user's library instead
+default_user_id = None # Owner of lectures.csv, and the user of requests that haven't chosen one
 yt_dlp_ready = False
+prefetcher = None
+csv_sync = None
+startup_complete = threading.Event()
+# With several worker processes (see wsgi.py) one leader runs the CSV sync and the startup prefetch;
+# the others pick up reloads made by any process through core.CSV_GENERATION.
+leader_lock = None # Held for the life of the leader process
+lectures_generation = 0 # core.CSV_GENERATION that lectures_df was loaded at
+_lectures_sync_lock = threading.Lock()
 
 def initialize_app_data():
     """
     Initializes database, checks yt-dlp, and loads lecture data.
-    This function is called once at app startup.
+    This function is called once at app startup; with BACKGROUND_STARTUP the work runs in a
+    background thread and /ready reports when it is done.
     """
-    global lectures_df, yt_dlp_ready # Declare modification intent at the beginning
-
-    core.logging.info("Initializing application data...")
-    core.init_db()
-    yt_dlp_ready = core.check_yt_dlp()
-    
-    lectures_df = core.load_and_prepare_data() # Assign to global
-    if lectures_df is None:
-        core.logging.error("CRITICAL: lectures.csv could not be loaded at startup. App may not function correctly.")
+    core.setup_logging()
+    if BACKGROUND_STARTUP:
+        threading.Thread(target=load_app_data, name="startup", daemon=True).start()
     else:
-        core.logging.info("lectures.csv loaded successfully at startup.")
-        core._playlist_cache = {}
+        load_app_data()
+
+def load_app_data():
+    global lectures_df, yt_dlp_ready, prefetcher, csv_sync, default_user_id, leader_lock, lectures_generation # Declare modification intent at the beginning
+
+    try:
+        core.logging.info("Initializing application data...")
+        core.init_db()
+        default_user_id = core.get_or_create_user(core.DEFAULT_USER)
+        yt_dlp_ready = core.check_yt_dlp(max_age=core.YT_DLP_PROBE_TTL) # Reuse a sibling worker's check
+        lock = core.ProcessLock("leader")
+        if lock.acquire(timeout=0):
+            leader_lock = lock
+
+        lectures_generation = core.get_generation(core.CSV_GENERATION, max_age=0)
+        set_lectures(core.reload_lecture_data(None, invalidate=leader_lock is not None)[0]) # Followers' caches start empty
+        if lectures_df is None:
+            core.logging.error("CRITICAL: lectures.csv could not be loaded at startup. App may not function correctly.")
+        else:
+            core.logging.info("lectures.csv loaded successfully at startup.")
+
+        if core.PREFETCH_ENABLED and yt_dlp_ready:
+            prefetcher = core.LecturePrefetcher()
+            prefetcher.start()
+            atexit.register(prefetcher.shutdown, wait=False)
+            if leader_lock is not None:
+                prefetcher.enqueue_library(core.get_user_lectures(default_user_id).series)
+
+        # Boot from the local copy; the remote sheet (if configured) is synced in the background
+        if load_df.is_sync_configured() and leader_lock is not None:
+            csv_sync = load_df.CsvSync(df_path=core.CSV_FILE, on_update=reload_lectures_after_sync)
+            csv_sync.start()
+            atexit.register(csv_sync.stop, timeout=1)
+    except Exception as e:
+        core.logging.error(f"CRITICAL: application startup failed: {e}")
+    finally:
+        startup_complete.set()
+
+def set_lectures(df):
+    """Publishes a loaded DataFrame and stores it as the default user's library."""
+    global lectures_df, lecture_index
+    lecture_index = core.LectureIndex.from_dataframe(df) if df is not None else None
+    lectures_df = df
+    if lecture_index is not None and default_user_id is not None:
+        core.save_user_library(default_user_id, lecture_index)
+
+def apply_reloaded_lectures(new_df, changes):
+    """
+    Swaps in a reloaded DataFrame, tells the other worker processes to pick it up and prefetches
+    the series that were added or changed.
+    """
+    global lectures_generation
+    set_lectures(new_df)
+    lectures_generation = core.bump_generation(core.CSV_GENERATION)
+    if prefetcher is not None:
+        library = core.get_user_lectures(default_user_id)
+        prefetcher.enqueue_library([record for record in map(library.get, changes["added"] + changes["changed"]) if record is not None])
+
+def reload_lectures_after_sync():
+    new_df, changes = core.reload_lecture_data(lectures_df)
+    if new_df is None:
+        core.logging.error("Synced lectures.csv could not be loaded; keeping the previous data.")
+    elif not changes["unchanged"]:
+        apply_reloaded_lectures(new_df, changes)
+
+def sync_lectures_from_other_workers():
+    """
+    Reloads lectures_df if another worker process reloaded lectures.csv. That process already stored
+    the default user's library and invalidated stale playlists, so this only refreshes the local copy.
+    """
+    global lectures_df, lecture_index, lectures_generation
+    generation = core.get_generation(core.CSV_GENERATION)
+    if generation == lectures_generation or not _lectures_sync_lock.acquire(blocking=False):
+        return # Up to date, or another request thread is already reloading
+    try:
+        new_df, changes = core.reload_lecture_data(lectures_df, invalidate=False)
+        if new_df is not None and not changes["unchanged"]:
+            lecture_index = core.LectureIndex.from_dataframe(new_df)
+            lectures_df = new_df
+        lectures_generation = generation
+    finally:
+        _lectures_sync_lock.release()
 
 initialize_app_data()
 
+@app.before_request
+def start_request_timing():
+    g.request_started = time.perf_counter()
+    if REQUEST_PROFILING and request.headers.get('X-Profile') == '1':
+        metrics.start_profile()
+
+@app.before_request
+def wait_for_startup():
+    if request.endpoint not in ('ready', 'metrics_endpoint', 'static'):
+        if not startup_complete.is_set():
+            started = time.perf_counter()
+            startup_complete.wait(STARTUP_REQUEST_WAIT)
+            metrics.record_profile("startup-wait", time.perf_counter() - started)
+        if startup_complete.is_set() and lectures_df is not None:
+            sync_lectures_from_other_workers()
+
+@app.after_request
+def finish_request_timing(response):
+    elapsed = time.perf_counter() - g.pop('request_started', time.perf_counter())
+    ROUTE_SECONDS.observe(elapsed, endpoint=request.endpoint or 'unknown', method=request.method,
+                          status=str(response.status_code))
+    profile = metrics.stop_profile()
+    if profile is not None:
+        entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in profile]
+        entries.append(f"total;dur={elapsed * 1000:.1f}")
+        response.headers['Server-Timing'] = ", ".join(entries)
+    return response
+
+def _template_render_started(sender, template, context, **extra):
+    g.template_render_started = time.perf_counter()
+
+def _template_render_finished(sender, template, context, **extra):
+    started = g.pop('template_render_started', None)
+    if started is not None:
+        elapsed = time.perf_counter() - started
+        TEMPLATE_SECONDS.observe(elapsed, template=template.name)
+        metrics.record_profile(f"render.{template.name}", elapsed)
+
+before_render_template.connect(_template_render_started, app)
+template_rendered.connect(_template_render_finished, app)
+
+def current_user_id():
+    """The requesting user: the one chosen with /switch_user in this session, else the owner of lectures.csv."""
+    return session.get('user_id', default_user_id)
+
+def current_lectures():
+    """The requesting user's library as a LectureIndex (cached in core), or None before startup has loaded the DB."""
+    user_id = current_user_id()
+    return core.get_user_lectures(user_id) if user_id is not None else None
+
+@app.context_processor
+def inject_user():
+    return {"user_name": session.get('user_name', core.DEFAULT_USER)}
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus scrape endpoint."""
+    return Response(metrics.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/ready')
+def ready():
+    """Readiness probe: 200 once startup has finished, 503 while it is still running."""
+    status = {"ready": startup_complete.is_set(), "yt_dlp_ready": yt_dlp_ready, "lectures_loaded": lecture_index is not None,
+              "users_ready": default_user_id is not None, "leader": leader_lock is not None, "pid": os.getpid()}
+    return jsonify(status), 200 if status["ready"] else 503
+
 @app.route('/')
 def index():
-    # We primarily READ globals here. If we need to re-assign lectures_df,
-    # the global declaration must be at the top of this function too.
-    # Let's restructure to make this clearer.
-    global lectures_df, yt_dlp_ready 
-
-    local_lectures_df = lectures_df # Work with a local copy for reading
+    # We only READ globals here; reloading goes through set_lectures.
+    global lecture_index, yt_dlp_ready 
 
-    if local_lectures_df is None:
+    if lecture_index is None and current_user_id() == default_user_id:
         # Try to load again, maybe the file was fixed
-        core.logging.warning("lectures_df was None at start of index route. Attempting reload.")
-        reloaded_df = core.load_and_prepare_data()
+        core.logging.warning("lecture_index was None at start of index route. Attempting reload.")
+        reloaded_df, _ = core.reload_lecture_data(None)
         if reloaded_df is None:
             flash("CRITICAL Error: Could not load or parse lectures.csv. Please check the file and server logs.", "danger")
         else: 
-            lectures_df = reloaded_df # Assign to the global lectures_df
-            core._playlist_cache = {}
-            local_lectures_df = lectures_df # Update local copy
+            set_lectures(reloaded_df)
             flash("Notice: lectures.csv was reloaded successfully after an initial problem.", "info")
 
     if not yt_dlp_ready:
          flash("CRITICAL WARNING: yt-dlp is not found or not working. Subtitle features will fail. Please check installation and server logs.", "danger")
 
-    num_series = len(local_lectures_df) if local_lectures_df is not None else 0
+    lectures = current_lectures()
+    num_series = len(lectures) if lectures is not None else 0
     num_yt_series = 0
-    if local_lectures_df is not None and 'is_youtube_playlist' in local_lectures_df.columns:
-        yt_series_df = local_lectures_df[local_lectures_df['is_youtube_playlist']]
-        if not yt_series_df.empty:
-             num_yt_series = len(yt_series_df)
-    return render_template('index.html', num_series=num_series, num_yt_series=num_yt_series)
+    if lectures is not None:
+        num_yt_series = sum(1 for record in lectures.series if record.is_youtube_playlist)
+    return render_template('index.html', num_series=num_series, num_yt_series=num_yt_series,
+                           is_default_user=current_user_id() == default_user_id)
+
+@app.route('/switch_user', methods=['POST'])
+def switch_user():
+    name = request.form.get('user_name', '').strip()
+    if not name or len(name) > USER_NAME_MAX_LENGTH:
+        flash(f"Please enter a user name of at most {USER_NAME_MAX_LENGTH} characters.", "warning")
+        return redirect(url_for('index'))
+    session['user_id'] = core.get_or_create_user(name)
+    session['user_name'] = name
+    flash(f"You are now working as '{name}'.", "info")
+    return redirect(url_for('index'))
+
+@app.route('/import_library', methods=['POST'])
+def import_library():
+    """Replaces the requesting user's library with an uploaded CSV in the lectures.csv format."""
+    upload = request.files.get('library_csv')
+    data = upload.read() if upload else b""
+    problem = load_df.validate_csv(data) if data else "no file uploaded"
+    if problem:
+        flash(f"Could not import the library: {problem}.", "danger")
+        return redirect(url_for('index'))
+    df = core.load_and_prepare_data(io.BytesIO(data))
+    if df is None:
+        flash("Could not import the library: the CSV could not be parsed. Check the server logs.", "danger")
+        return redirect(url_for('index'))
+    user_id = current_user_id()
+    saved = core.save_user_library(user_id, core.LectureIndex.from_dataframe(df))
+    if prefetcher is not None:
+        prefetcher.enqueue_library(core.get_user_lectures(user_id).series)
+    flash(f"Library imported: {saved['saved']} series saved, {saved['removed']} removed.", "success")
+    return redirect(url_for('index'))
+
+@app.route('/mark_watched', methods=['POST'])
+def mark_watched():
+    series_title = request.form.get('series_title')
+    video_playlist_index = request.form.get('video_playlist_index', type=int)
+    if not series_title or video_playlist_index is None:
+        flash("Missing lecture data. Please try again.", "danger")
+        return redirect(url_for('index'))
+    record = core.advance_series_progress(current_user_id(), series_title, video_playlist_index + 1)
+    if record is None:
+        flash(f"'{series_title}' is not in your library.", "warning")
+    else:
+        flash(f"Progress saved: {record.current} of {record.total if record.total is not None else '?'} watched in '{series_title}'.", "success")
+        if prefetcher is not None:
+            prefetcher.enqueue_library([record])
+    return redirect(url_for('index'))
 
 @app.route('/select_to_watch', methods=['POST'])
 def select_to_watch():
-    # This function only reads global lectures_df and yt_dlp_ready
-    # So, `global` keyword is not strictly needed here unless we were assigning to them.
-    # However, for consistency and to avoid future errors if we modify it,
-    # it's good practice to declare it if the global is central to the function.
-    global lectures_df, yt_dlp_ready
+    # This function only reads the global yt_dlp_ready; the library is the requesting user's
+    global yt_dlp_ready
 
-    if lectures_df is None:
+    lectures = current_lectures()
+    if lectures is None:
         flash("Lecture data not loaded. Please ensure lectures.csv is correct and try refreshing CSV data.", "warning")
         return redirect(url_for('index'))
     if not yt_dlp_ready:
         flash("Warning: yt-dlp is not working. Playlist video fetching might fail.", "warning")
         # Allow to proceed, but with a warning
 
-    result = core.select_random_lecture_to_watch(lectures_df)
+    result = core.select_random_lecture_to_watch(lectures)
     if result and "error" not in result:
         flash(result.get("message", "Lecture selected!"), "success")
         return render_template('lecture_display.html', lecture=result, action_type="watch")
@@ -86,21 +298,22 @@ def select_to_watch():
 
 @app.route('/select_for_review', methods=['POST'])
 def select_for_review():
-    global lectures_df, yt_dlp_ready
+    global yt_dlp_ready
 
-    if lectures_df is None:
+    lectures = current_lectures()
+    if lectures is None:
         flash("Lecture data not loaded. Please ensure lectures.csv is correct and try refreshing CSV data.", "warning")
         return redirect(url_for('index'))
     if not yt_dlp_ready:
         flash("Warning: yt-dlp is not working. Subtitle features might fail.", "warning")
         
-    result = core.select_random_watched_lecture_for_review(lectures_df)
+    result = core.select_random_watched_lecture_for_review(lectures, current_user_id())
     
-    if result and "error" not in result and lectures_df is not None:
-        series_data = lectures_df[lectures_df['lecture_series'] == result.get('series_title')]
-        if not series_data.empty and 'playlist_url' in series_data.columns:
+    if result and "error" not in result:
+        series_record = lectures.get(result.get('series_title'))
+        if series_record is not None:
             if 'playlist_url' not in result or not result.get('playlist_url'): # Check if key exists and is non-empty
-                 result['playlist_url'] = series_data.iloc[0].get('playlist_url')
+                 result['playlist_url'] = series_record.playlist_url
 
     if result and "error" not in result:
         flash(result.get("message", "Lecture for review selected!"), "info")
@@ -111,9 +324,10 @@ def select_for_review():
 
 @app.route('/download_review_subtitle', methods=['POST'])
 def download_review_subtitle():
-    global lectures_df, yt_dlp_ready # Reading globals
+    global yt_dlp_ready # Reading globals
 
-    if lectures_df is None: 
+    lectures = current_lectures()
+    if lectures is None: 
         flash("Critical Error: Lecture data not available. Cannot download subtitle.", "danger")
         return redirect(url_for('index'))
     if not yt_dlp_ready:
@@ -128,7 +342,7 @@ def download_review_subtitle():
         playlist_index_form = request.form.get('video_playlist_index', type=int)
         playlist_url_form = request.form.get('playlist_url')
         if all([series_title_form, video_title_form, video_url_form, playlist_index_form is not None]):
-            lecture_data_for_display = {"series_title": series_title_form, "video_title": video_title_form, "video_url": video_url_form, "playlist_index": playlist_index_form, "playlist_url": playlist_url_form, "subtitles": None, "subtitles_exist_in_db": False, "error": "yt-dlp not working"}
+            lecture_data_for_display = {"series_title": series_title_form, "video_title": video_title_form, "video_url": video_url_form, "playlist_index": playlist_index_form, "playlist_url": playlist_url_form, "subtitles_exist_in_db": False, "error": "yt-dlp not working"}
             return render_template('lecture_display.html', lecture=lecture_data_for_display, action_type="review")
         return redirect(url_for('index'))
 
@@ -146,19 +360,19 @@ def download_review_subtitle():
     final_playlist_url = playlist_url_from_form
     if not final_playlist_url or "youtube.com/playlist?list=" not in str(final_playlist_url):
         core.logging.warning(f"Playlist URL from form ('{playlist_url_from_form}') is invalid or missing for {series_title}. Attempting lookup from CSV data.")
-        series_row = lectures_df[lectures_df['lecture_series'] == series_title]
-        if not series_row.empty and 'playlist_url' in series_row.columns:
-            final_playlist_url = series_row.iloc[0]['playlist_url']
+        series_record = lectures.get(series_title)
+        if series_record is not None:
+            final_playlist_url = series_record.playlist_url
             core.logging.info(f"Looked up playlist URL from CSV: {final_playlist_url} for series {series_title}")
         else:
             core.logging.error(f"Could not determine a valid playlist URL for series '{series_title}'. Form value: '{playlist_url_from_form}'.")
             flash(f"Could not determine playlist URL for series '{series_title}'. Cannot download subtitle.", "danger")
-            lecture_data_for_display = {"series_title": series_title, "video_title": video_title_for_page, "video_url": video_url_for_page, "playlist_index": video_playlist_index, "playlist_url": playlist_url_from_form, "subtitles": None, "subtitles_exist_in_db": False, "error": "Could not find playlist URL"}
+            lecture_data_for_display = {"series_title": series_title, "video_title": video_title_for_page, "video_url": video_url_for_page, "playlist_index": video_playlist_index, "playlist_url": playlist_url_from_form, "subtitles_exist_in_db": False, "error": "Could not find playlist URL"}
             return render_template('lecture_display.html', lecture=lecture_data_for_display, action_type="review")
 
     if not final_playlist_url or "youtube.com/playlist?list=" not in str(final_playlist_url):
         flash(f"Still unable to get a valid playlist URL for '{series_title}'. Cannot download subtitle.", "danger")
-        lecture_data_for_display = {"series_title": series_title, "video_title": video_title_for_page, "video_url": video_url_for_page, "playlist_index": video_playlist_index, "playlist_url": final_playlist_url, "subtitles": None, "subtitles_exist_in_db": False, "error": "Invalid playlist URL"}
+        lecture_data_for_display = {"series_title": series_title, "video_title": video_title_for_page, "video_url": video_url_for_page, "playlist_index": video_playlist_index, "playlist_url": final_playlist_url, "subtitles_exist_in_db": False, "error": "Invalid playlist URL"}
         return render_template('lecture_display.html', lecture=lecture_data_for_display, action_type="review")
 
     download_result = core.download_single_subtitle_if_needed(series_title, final_playlist_url, video_playlist_index)
@@ -169,8 +383,7 @@ def download_review_subtitle():
         "video_url": video_url_for_page,
         "playlist_index": video_playlist_index,
         "playlist_url": final_playlist_url,
-        "subtitles": download_result.get("subtitles"),
-        "subtitles_exist_in_db": bool(download_result.get("subtitles"))
+        "subtitles_exist_in_db": False # The page fetches the text itself from /subtitles
     }
 
     if "error" in download_result:
@@ -182,36 +395,133 @@ def download_review_subtitle():
     return render_template('lecture_display.html', lecture=lecture_data_for_display, action_type="review")
 
 
+@app.route('/record_review', methods=['POST'])
+def record_review():
+    video_url = request.form.get('video_url')
+    quality = request.form.get('quality', type=int)
+    if not video_url or quality is None:
+        flash("Missing review data. Please try again.", "danger")
+        return redirect(url_for('index'))
+    schedule = core.record_review(current_user_id(), video_url, quality)
+    if schedule is None:
+        flash("This video isn't in the review schedule yet, so the review wasn't recorded.", "warning")
+    else:
+        days = schedule["interval_days"]
+        flash(f"Review recorded. Next review of this lecture in {days:g} day{'s' if days != 1 else ''}.", "success")
+    return redirect(url_for('index'))
+
+@app.route('/subtitles')
+def subtitles_text():
+    """
+    Serves a stored transcript as plain text for the lecture page to load on demand.
+    Supports conditional requests (ETag/Last-Modified from downloaded_at) and gzip.
+    """
+    video_url = request.args.get('video_url', '')
+    downloaded_at = core.get_subtitle_downloaded_at(video_url) if video_url else None
+    if downloaded_at is None:
+        return Response("No stored subtitles for this video.", status=404, mimetype='text/plain')
+
+    response = Response(mimetype='text/plain')
+    response.set_etag(hashlib.sha1(f"{video_url}|{downloaded_at}".encode('utf-8')).hexdigest())
+    response.last_modified = datetime.strptime(downloaded_at, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True # Always revalidate; unchanged transcripts come back as 304
+    response.vary.add('Accept-Encoding')
+    response.make_conditional(request)
+    if response.status_code == 304:
+        return response # Not modified: skip loading and decompressing the transcript
+
+    body = (core.get_subtitle_for_review(video_url) or "").encode('utf-8')
+    if 'gzip' in request.accept_encodings and len(body) > SUBTITLE_GZIP_MIN_BYTES:
+        body = gzip.compress(body, compresslevel=6)
+        response.content_encoding = 'gzip'
+    response.set_data(body)
+    return response
+
+@app.route('/feynman_prompt')
+def feynman_prompt():
+    """Returns the Feynman prompt for a stored transcript, trimmed to the token budget, as JSON."""
+    video_url = request.args.get('video_url', '')
+    budget = request.args.get('budget', core.FEYNMAN_PROMPT_TOKEN_BUDGET, type=int)
+    try:
+        result = core.build_feynman_prompt(video_url, token_budget=budget) if video_url else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if result is None:
+        return jsonify({"error": "No stored subtitles for this video."}), 404
+    return jsonify(result)
+
 @app.route('/bulk_download_subtitles', methods=['POST'])
 def bulk_download_subtitles():
-    global lectures_df, yt_dlp_ready # Reading globals
+    global yt_dlp_ready # Reading globals
 
-    if lectures_df is None:
+    lectures = current_lectures()
+    if lectures is None:
         flash("Lecture data not loaded. Please ensure lectures.csv is correct and try refreshing CSV data.", "warning")
         return redirect(url_for('index'))
     if not yt_dlp_ready:
         flash("Error: yt-dlp is not working. Cannot bulk download subtitles.", "danger")
         return redirect(url_for('index'))
-        
-    flash("Starting bulk subtitle download. This may take a while... Check server logs for detailed progress.", "info")
-    results = core.bulk_download_watched_subtitles(lectures_df)
-    
-    summary = (f"Bulk Download Complete. Downloaded: {results['downloaded']}, "
-               f"Skipped: {results['skipped']}, Failed: {results['failed']}.")
-    flash(summary, "success" if results['downloaded'] > 0 or results['skipped'] > 0 else "warning")
-    
-    return render_template('bulk_status.html', results=results)
+
+    job, started = core.start_bulk_download_job(lectures, library_key=f"user:{current_user_id()}")
+    if started:
+        flash("Started bulk subtitle download in the background. Progress is shown below.", "info")
+    elif job is not None:
+        flash("A bulk subtitle download is already running for this library. Showing its progress.", "warning")
+    else:
+        flash("A bulk subtitle download is already running for this library.", "warning")
+        return redirect(url_for('index'))
+    return redirect(url_for('bulk_download_status', job_id=job['job_id']))
+
+@app.route('/bulk_download_subtitles/<job_id>')
+def bulk_download_status(job_id):
+    job = core.get_bulk_download_job(job_id)
+    if job is None:
+        flash("Unknown or expired bulk download job.", "warning")
+        return redirect(url_for('index'))
+    return render_template('bulk_status.html', job=job)
+
+@app.route('/bulk_download_subtitles/<job_id>/progress')
+def bulk_download_progress(job_id):
+    job = core.get_bulk_download_job(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired bulk download job."}), 404
+    return jsonify(job)
+
+@app.route('/search')
+def search():
+    query = request.args.get('q', '').strip()
+    hits = core.search_subtitles(query, limit=request.args.get('limit', 20, type=int)) if query else []
+    for hit in hits:
+        # Escape the transcript text, then turn the match markers into <mark> tags
+        hit['snippet'] = (escape(hit['snippet'])
+                          .replace(core.SEARCH_SNIPPET_START, Markup('<mark>'))
+                          .replace(core.SEARCH_SNIPPET_END, Markup('</mark>')))
+    return render_template('search.html', query=query, hits=hits)
+
+@app.cli.command('rebuild-search-index')
+def rebuild_search_index_command():
+    """Re-indexes all stored subtitles for full-text search."""
+    startup_complete.wait() # init_db may still be running in the background
+    count = core.rebuild_search_index()
+    print(f"Indexed {count} subtitles.")
 
 @app.route('/refresh_csv', methods=['POST'])
 def refresh_csv():
     global lectures_df # Modifying global
 
     core.logging.info("Attempting to refresh CSV data via web UI...")
-    temp_df = core.load_and_prepare_data()
-    if temp_df is not None:
-        lectures_df = temp_df # Assign to global
-        core._playlist_cache = {} 
-        flash("CSV data reloaded successfully.", "success")
+    if csv_sync is not None:
+        csv_sync.sync() # Pull the remote sheet now instead of waiting for the next background sync
+    elif load_df.is_sync_configured():
+        load_df.download_last_version(df_path=core.CSV_FILE) # A worker without the background sync
+    temp_df, changes = core.reload_lecture_data(lectures_df)
+    if temp_df is not None and changes["unchanged"]:
+        flash("lectures.csv is unchanged; nothing to reload.", "info")
+    elif temp_df is not None:
+        apply_reloaded_lectures(temp_df, changes)
+        summary = ", ".join(f"{kind}: {', '.join(changes[kind])}" for kind in ("added", "removed", "changed") if changes[kind])
+        flash(f"CSV data reloaded successfully. {summary or 'No series changed.'}", "success")
         core.logging.info("CSV data reloaded successfully via web UI.")
     else:
         flash("Error: Failed to reload CSV data. Check server logs. The application might be using stale or no data.", "danger")
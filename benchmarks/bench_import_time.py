@@ -0,0 +1,76 @@
+# benchmarks/bench_import_time.py
+"""
+Measures module import time with `python -X importtime` and fails (exit code 1) when a module
+exceeds its budget or pulls in a dependency that should only be imported lazily.
+Run it after changes to module-level code:
+
+    python benchmarks/bench_import_time.py --repeat 5
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# module -> (budget in ms for its cumulative import time, modules it must not import)
+BUDGETS = {
+    "lecture_manager_core": (150, ("pandas", "numpy", "requests")),
+    "load_df": (50, ("requests", "urllib3")),
+    "app": (600, ("pandas", "numpy", "requests")),
+}
+
+def import_times(module: str, cwd: str):
+    """
+    Returns {module name: cumulative import time in µs} for everything a fresh interpreter imports
+    while importing module (interpreter startup such as site is left out).
+    """
+    env = dict(os.environ, PYTHONPATH=REPO_DIR + os.pathsep + os.environ.get("PYTHONPATH", ""),
+               LECTURE_MANAGER_BACKGROUND_STARTUP="1")
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=cwd, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|") # self µs | cumulative µs | indented name
+        if name.startswith("  "): # Nested imports are listed before the top-level import that caused them
+            times[name.strip()] = int(cumulative)
+        elif name.strip() == module:
+            times[module] = int(cumulative)
+            break # Later lines come from threads the import started (app's background startup)
+        else:
+            times = {}
+    return times
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per module; the fastest is reported")
+    parser.add_argument("--top", type=int, default=5, help="Slowest dependencies to list per module")
+    args = parser.parse_args()
+
+    failures = []
+    with tempfile.TemporaryDirectory() as work_dir: # app creates its DB in the working directory
+        for module, (budget_ms, forbidden) in BUDGETS.items():
+            runs = [import_times(module, work_dir) for _ in range(args.repeat)]
+            best = min(runs, key=lambda times: times[module])
+            total_ms = best[module] / 1000
+            print(f"{module}: {total_ms:.1f} ms (budget {budget_ms} ms)")
+            slowest = sorted((name for name in best if name != module and "." not in name), key=best.get, reverse=True)
+            for name in slowest[:args.top]:
+                print(f"    {name}: {best[name] / 1000:.1f} ms")
+            if total_ms > budget_ms:
+                failures.append(f"{module} took {total_ms:.1f} ms, budget is {budget_ms} ms")
+            leaked = [name for name in forbidden if name in best]
+            if leaked:
+                failures.append(f"{module} imports {', '.join(leaked)} at import time")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
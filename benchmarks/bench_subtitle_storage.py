@@ -0,0 +1,77 @@
+# benchmarks/bench_subtitle_storage.py
+"""
+Compares plain-text and zlib-compressed subtitle storage on a synthetic corpus:
+database size on disk and get_subtitle_for_review latency.
+
+    python benchmarks/bench_subtitle_storage.py --videos 500 --reads 2000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_yt_dlp import WORDS
+
+def synthetic_transcript(rng: random.Random, lines: int) -> str:
+    return "\n".join(" ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 14))) for _ in range(lines))
+
+def run(compression, corpus, reads: int, workdir: str) -> dict:
+    import lecture_manager_core as core
+
+    core.close_db_connection()
+    core.DB_FILE = os.path.join(workdir, f"bench_{compression or 'text'}.db")
+    core.SUBTITLE_COMPRESSION = compression
+    core.init_db()
+    conn = core.get_db_connection()
+    with conn:
+        conn.executemany(core._SUBTITLE_INSERT_SQL, [
+            ("Synthetic Series", idx, f"Video {idx}", url, *core._encode_subtitles(text))
+            for idx, (url, text) in enumerate(corpus)
+        ])
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.execute("VACUUM")
+
+    rng = random.Random(1)
+    urls = [url for url, _ in corpus]
+    latencies = []
+    for _ in range(reads):
+        url = rng.choice(urls)
+        start = time.perf_counter()
+        core.get_subtitle_for_review(url)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return {
+        "format": compression or "text",
+        "db_mb": os.path.getsize(core.DB_FILE) / 1e6,
+        "read_p50_ms": statistics.median(latencies),
+        "read_p99_ms": latencies[int(len(latencies) * 0.99) - 1],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--videos", type=int, default=500)
+    parser.add_argument("--lines", type=int, default=800, help="Transcript lines per video (~1h lecture)")
+    parser.add_argument("--reads", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    corpus = [(f"https://www.youtube.com/watch?v=bench{idx}", synthetic_transcript(rng, args.lines))
+              for idx in range(args.videos)]
+    raw_mb = sum(len(text.encode('utf-8')) for _, text in corpus) / 1e6
+
+    with tempfile.TemporaryDirectory(prefix="bench_storage_") as workdir:
+        os.chdir(workdir)
+        print(f"{args.videos} transcripts, {raw_mb:.1f} MB of text")
+        print(f"{'format':<8}{'db MB':>10}{'read p50 ms':>14}{'read p99 ms':>14}")
+        for compression in (None, "zlib"):
+            result = run(compression, corpus, args.reads, workdir)
+            print(f"{result['format']:<8}{result['db_mb']:>10.1f}{result['read_p50_ms']:>14.3f}{result['read_p99_ms']:>14.3f}")
+
+if __name__ == "__main__":
+    main()
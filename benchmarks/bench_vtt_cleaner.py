@@ -0,0 +1,85 @@
+# benchmarks/bench_vtt_cleaner.py
+"""
+Benchmarks clean_vtt_content against the pre-streaming implementation on synthetic
+YouTube auto-caption VTT (rolling two-line cues with word timing tags), and checks
+that the outputs agree.
+
+    python benchmarks/bench_vtt_cleaner.py --minutes 180 --repeat 5
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fake_yt_dlp
+
+def legacy_clean_vtt_content(vtt_string: str) -> str:
+    """clean_vtt_content as it was before the streaming rewrite, kept as the reference output."""
+    if not vtt_string:
+        return ""
+    lines = vtt_string.splitlines()
+    cleaned_lines = []
+    current_cue_text = []
+    for line in lines:
+        line = line.strip()
+        if not line or \
+           line.lower() == "webvtt" or \
+           line.lower().startswith("note") or \
+           re.match(r'^\d{2}:\d{2}:\d{2}\.\d{3}\s*-->\s*\d{2}:\d{2}:\d{2}\.\d{3}', line):
+            if current_cue_text:
+                cleaned_lines.append(" ".join(current_cue_text))
+                current_cue_text = []
+            continue
+        if "-->" not in line and (":" in line and "%" in line or line.startswith("<c>") or line.startswith("</c>")):
+            continue
+        line = re.sub(r'<[^>]+>', '', line)
+        current_cue_text.append(line)
+    if current_cue_text:
+        cleaned_lines.append(" ".join(current_cue_text))
+    cleaned_lines_final = []
+    for i in range(len(cleaned_lines)-1):
+        line = cleaned_lines[i].strip()
+        if line:
+            if line in cleaned_lines[i+1]:
+                continue
+            cleaned_lines_final.append(line)
+    return "\n".join(filter(None, cleaned_lines_final)).strip()
+
+def best_of(func, arg, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(arg)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=int, default=180, help="Length of the synthetic lecture")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    from lecture_manager_core import clean_vtt_content
+
+    vtt = fake_yt_dlp.synthetic_vtt("lecture", -(-args.minutes * 60000 // fake_yt_dlp.CUE_MS))
+    legacy = legacy_clean_vtt_content(vtt)
+    streaming = clean_vtt_content(vtt, trim_overlap=False)
+    # The legacy cleaner dropped the final cue; everything before it must be identical.
+    assert streaming.split("\n")[:-1] == legacy.split("\n"), "streaming cleaner diverged from the legacy output"
+    trimmed = clean_vtt_content(vtt)
+
+    print(f"{args.minutes} min of auto captions, {len(vtt) / 1e6:.2f} MB VTT")
+    print(f"{'cleaner':<26}{'best ms':>10}{'output KB':>12}")
+    for name, func, output in (
+        ("legacy", legacy_clean_vtt_content, legacy),
+        ("streaming", lambda v: clean_vtt_content(v, trim_overlap=False), streaming),
+        ("streaming + overlap trim", clean_vtt_content, trimmed),
+    ):
+        print(f"{name:<26}{best_of(func, vtt, args.repeat):>10.1f}{len(output) / 1e3:>12.1f}")
+
+if __name__ == "__main__":
+    main()
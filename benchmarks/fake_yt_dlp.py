@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# benchmarks/fake_yt_dlp.py
+"""
+Stand-in for the yt-dlp executable, for benchmarks. Point YT_DLP_PATH at this file.
+It understands the invocations lecture_manager_core makes: --version, playlist listing
+(-j --flat-playlist URL) and subtitle downloads (-o TEMPLATE [--batch-file FILE | URL]).
+
+Playlist URLs encode their size: ...playlist?list=BENCH0001n120 lists 120 videos.
+Behaviour is configured through environment variables:
+
+    FAKE_YT_DLP_LATENCY       seconds slept per run (default 0)
+    FAKE_YT_DLP_JITTER        extra uniform random latency, in seconds (default 0)
+    FAKE_YT_DLP_FAILURE_RATE  share of videos that have no subtitles (default 0)
+    FAKE_YT_DLP_SUBTITLE_ERROR_RATE  share of videos whose subtitle fetch fails with HTTP 429, which
+                              yt-dlp reports as a warning while still exiting 0 (default 0)
+    FAKE_YT_DLP_CRASH_RATE    share of runs that exit with an error and produce nothing (default 0)
+    FAKE_YT_DLP_CUES          caption lines per generated VTT (default 100)
+    FAKE_YT_DLP_LANGS         comma-separated subtitle languages every video has (default en)
+
+Which videos fail is derived from their ID, so every run of a benchmark sees the same failures.
+Progress goes to stdout and warnings/errors to stderr, like yt-dlp.
+"""
+import json
+import os
+import random
+import sys
+import time
+import zlib
+
+WORDS = ("group symmetry element identity inverse subgroup coset normal quotient homomorphism kernel "
+         "image cycle permutation generator order orbit stabilizer action theorem proof example so we "
+         "have that the and of to is this it you can see here now let's look at what happens when").split()
+
+def playlist_entries(playlist_id: str):
+    """The flat playlist listing for a playlist ID like BENCH0001n120."""
+    size = int(playlist_id.rsplit("n", 1)[-1]) if "n" in playlist_id else 10
+    return [{"title": f"{playlist_id} lecture {i + 1}", "url": f"https://www.youtube.com/watch?v={playlist_id}v{i}"}
+            for i in range(size)]
+
+CUE_MS = 2510 # Audio covered by each cue synthetic_vtt generates (shown for 2500 ms, then a 10 ms repeat)
+
+def _fraction(video_id: str, salt: str) -> float:
+    return zlib.crc32(f"{salt}:{video_id}".encode()) / 0xFFFFFFFF
+
+def has_subtitles(video_id: str, failure_rate: float) -> bool:
+    return _fraction(video_id, "subs") >= failure_rate
+
+def _ts(ms: int) -> str:
+    return f"{ms // 3600000:02d}:{ms // 60000 % 60:02d}:{ms // 1000 % 60:02d}.{ms % 1000:03d}"
+
+def synthetic_vtt(video_id: str, cues: int, lang: str = "en") -> str:
+    """Auto-caption style VTT: each line is shown growing with word timings, then repeated above the next."""
+    rng = random.Random(video_id)
+    out = ["WEBVTT", "Kind: captions", f"Language: {lang}", ""]
+    ms, previous = 0, ""
+    for _ in range(cues):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(4, 9))]
+        timed = words[0] + "".join(f"<{_ts(ms + 300 * i)}><c> {w}</c>" for i, w in enumerate(words[1:], 1))
+        out += [f"{_ts(ms)} --> {_ts(ms + 2500)} align:start position:0%", previous, timed, ""]
+        ms += 2500
+        previous = " ".join(words)
+        out += [f"{_ts(ms)} --> {_ts(ms + 10)} align:start position:0%", previous, " ", ""]
+        ms += 10
+    return "\n".join(out)
+
+def main(args):
+    latency = float(os.environ.get("FAKE_YT_DLP_LATENCY", 0)) + random.uniform(0, float(os.environ.get("FAKE_YT_DLP_JITTER", 0)))
+    if latency > 0:
+        time.sleep(latency)
+    if "--version" in args:
+        print("2025.04.30")
+        return 0
+    if random.random() < float(os.environ.get("FAKE_YT_DLP_CRASH_RATE", 0)):
+        print("ERROR: [fake] injected failure", file=sys.stderr, flush=True)
+        return 1
+
+    if "--flat-playlist" in args:
+        for entry in playlist_entries(args[-1].split("list=")[-1]):
+            print(json.dumps(entry))
+        return 0
+
+    template = args[args.index("-o") + 1]
+    langs = args[args.index("--sub-lang") + 1].split(",") if "--sub-lang" in args else ["en"]
+    urls = [arg for arg in args if arg.startswith("http")]
+    if "--batch-file" in args:
+        with open(args[args.index("--batch-file") + 1]) as f:
+            urls += [line.strip() for line in f if line.strip()]
+    failure_rate = float(os.environ.get("FAKE_YT_DLP_FAILURE_RATE", 0))
+    subtitle_error_rate = float(os.environ.get("FAKE_YT_DLP_SUBTITLE_ERROR_RATE", 0))
+    cues = int(os.environ.get("FAKE_YT_DLP_CUES", 100))
+    available = os.environ.get("FAKE_YT_DLP_LANGS", "en").split(",")
+    for url in urls:
+        video_id = url.split("v=")[-1].split("&")[0]
+        found = [lang for lang in langs if lang in available]
+        print(f"[youtube] {video_id}: Downloading webpage", flush=True)
+        if not has_subtitles(video_id, failure_rate) or not found:
+            print(f"[info] {video_id}: There are no subtitles for the requested languages", flush=True)
+            continue
+        if _fraction(video_id, "429") < subtitle_error_rate:
+            print(f"WARNING: Unable to download video subtitles for '{found[0]}': HTTP Error 429: Too Many Requests",
+                  file=sys.stderr, flush=True)
+            continue
+        for lang in found: # Like yt-dlp, writes every requested language the video has
+            with open(template.replace("%(id)s", video_id).replace("%(ext)s", f"{lang}.vtt"), "w", encoding="utf-8") as f:
+                f.write(synthetic_vtt(video_id, cues, lang))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,299 @@
+# benchmarks/load_test.py
+"""
+Load test of the multi-user app: hundreds of simulated users, each with their own library drawn from
+a shared set of playlists, hit a real threaded HTTP server concurrently. Every user switches to
+their name, imports a library, then repeats a session of dashboard, watch + mark watched and
+review + grade. Subtitles and playlists are stored up front, so the run measures the app and SQLite,
+not yt-dlp (the fake one in this directory is only probed at startup).
+
+Redirects are followed, and a response is an error if its status is 400 or above, or if the page shows
+a warning or danger flash (most failures here are a flash and a redirect). Afterwards every user's
+progress and review schedule in the DB is checked against what that user did, so one user's actions
+showing up in another's library count as isolation violations.
+
+    python benchmarks/load_test.py --users 300 --concurrency 32 --rounds 3
+
+Reports throughput, p50/p99 per route, error and isolation-violation counts, server peak RSS and how many subtitle rows the
+shared store needed compared with the videos all libraries together reference.
+"""
+import argparse
+import html
+import http.client
+import json
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode, urlparse
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+import fake_yt_dlp
+
+_FIELD_RE = re.compile(r'name="(series_title|video_playlist_index|video_url)" value="([^"]*)"')
+_FLASH_RE = re.compile(r'<div class="alert alert-(\w+)[^"]*" role="alert">\s*(.*?)\s*<button', re.S)
+ERROR_FLASH_CATEGORIES = ("danger", "warning")
+
+# --- Fixture ---
+def playlist_url(number: int, size: int) -> str:
+    return f"https://www.youtube.com/playlist?list=BENCH{number:04d}n{size}"
+
+def build_fixture(workdir: str, playlists: int, videos_per_playlist: int, cues: int):
+    """Writes an empty lectures.csv and stores every shared playlist listing and its subtitles in the DB."""
+    import lecture_manager_core as core
+    core.DB_FILE = os.path.join(workdir, "lecture_subtitles.db")
+    core.init_db()
+    with core.SubtitleWriter() as writer:
+        for number in range(playlists):
+            url = playlist_url(number, videos_per_playlist)
+            videos = fake_yt_dlp.playlist_entries(url.split("list=")[-1])
+            core.save_cached_playlist(url, videos)
+            for idx, video in enumerate(videos):
+                writer.add(f"Shared Series {number}", idx, video["title"], video["url"],
+                           fake_yt_dlp.synthetic_vtt(video["url"].split("v=")[-1], cues))
+    core.close_db_connection()
+    with open(os.path.join(workdir, "lectures.csv"), "w") as f:
+        f.write("Lecture Series,Current,Total,Playlist URL\n")
+
+def library(rng: random.Random, playlists: int, videos_per_playlist: int, series: int) -> dict:
+    """
+    A user's library: `series` of the shared playlists with random progress, as {title: [current, total, playlist URL]}.
+    Every user names a playlist alike, so a leak between libraries can't hide behind distinct titles.
+    """
+    return {f"My Series {number}": [rng.randint(2, videos_per_playlist - 1), videos_per_playlist, playlist_url(number, videos_per_playlist)]
+            for number in rng.sample(range(playlists), min(series, playlists))}
+
+def library_csv(series: dict) -> bytes:
+    lines = ["Lecture Series,Current,Total,Playlist URL"]
+    lines += [f"{title},{current},{total},{url}" for title, (current, total, url) in series.items()]
+    return ("\n".join(lines) + "\n").encode()
+
+# --- Server (runs in its own process) ---
+def serve(workdir: str):
+    os.chdir(workdir)
+    os.environ["LECTURE_MANAGER_BACKGROUND_STARTUP"] = "0"
+    import lecture_manager_core as core
+    core.YT_DLP_PATH = os.path.join(BENCH_DIR, "fake_yt_dlp.py")
+    core.PREFETCH_ENABLED = False # Everything is stored already; keep background work out of the measurements
+    import logging
+    import app
+    from werkzeug.serving import make_server
+    for logger in (logging.getLogger(), logging.getLogger("werkzeug")): # Don't log every request
+        logger.setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", 0, app.app, threaded=True)
+    print(server.server_port, flush=True)
+    server.serve_forever()
+
+# --- Clients ---
+class SimulatedUser:
+    """
+    One browser: its own connection and Flask session cookie. Tracks the progress and reviews it expects
+    the server to have stored for it.
+    """
+
+    def __init__(self, port: int, name: str, series: dict, samples: dict, lock: threading.Lock):
+        self.conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        self.name = name
+        self.series = series # {title: [current, total, playlist URL]}, updated as videos are marked watched
+        self.reviews = 0 # Reviews the server confirmed
+        self.cookie = None
+        self.samples = samples
+        self.lock = lock
+        self.errors = []
+
+    def _send(self, route: str, method: str, path: str, body: bytes = None, content_type: str = None):
+        headers = {"Cookie": self.cookie} if self.cookie else {}
+        if content_type:
+            headers["Content-Type"] = content_type
+        start = time.perf_counter()
+        self.conn.request(method, path, body=body, headers=headers)
+        response = self.conn.getresponse()
+        data = response.read()
+        elapsed = time.perf_counter() - start
+        cookie = response.getheader("Set-Cookie")
+        if cookie:
+            self.cookie = cookie.split(";", 1)[0]
+        with self.lock:
+            self.samples.setdefault(route, []).append(elapsed)
+        return response, data.decode("utf-8", "replace")
+
+    def request(self, route: str, method: str, path: str, form: dict = None, body: bytes = None,
+                content_type: str = None) -> tuple:
+        """Sends a request and follows its redirects. Returns (final page, [(flash category, message), ...])."""
+        if form is not None:
+            body, content_type = urlencode(form).encode(), "application/x-www-form-urlencoded"
+        response, page = self._send(route, method, path, body, content_type)
+        while 300 <= response.status < 400:
+            location = urlparse(response.getheader("Location"))
+            response, page = self._send("GET / (redirect)", "GET", location.path + (f"?{location.query}" if location.query else ""))
+        flashes = [(category, html.unescape(message)) for category, message in _FLASH_RE.findall(page)]
+        if response.status >= 400:
+            self.errors.append(f"{route}: HTTP {response.status}")
+        self.errors += [f"{route}: {message}" for category, message in flashes if category in ERROR_FLASH_CATEGORIES]
+        return page, flashes
+
+    def import_library(self, csv_data: bytes):
+        boundary = uuid.uuid4().hex
+        body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"library_csv\"; filename=\"library.csv\"\r\n"
+                f"Content-Type: text/csv\r\n\r\n").encode() + csv_data + f"\r\n--{boundary}--\r\n".encode()
+        self.request("POST /import_library", "POST", "/import_library", body=body,
+                     content_type=f"multipart/form-data; boundary={boundary}")
+
+    def session(self, rng: random.Random):
+        self.request("GET /", "GET", "/")
+        page, _ = self.request("POST /select_to_watch", "POST", "/select_to_watch", form={})
+        fields = {name: html.unescape(value) for name, value in _FIELD_RE.findall(page)}
+        if "series_title" in fields:
+            _, flashes = self.request("POST /mark_watched", "POST", "/mark_watched",
+                                      form={"series_title": fields["series_title"], "video_playlist_index": fields["video_playlist_index"]})
+            if ("success", ) == tuple(category for category, _ in flashes):
+                series = self.series[fields["series_title"]]
+                series[0] = min(max(series[0], int(fields["video_playlist_index"]) + 1), series[1])
+        page, _ = self.request("POST /select_for_review", "POST", "/select_for_review", form={})
+        fields = {name: html.unescape(value) for name, value in _FIELD_RE.findall(page)}
+        if "video_url" in fields:
+            _, flashes = self.request("POST /record_review", "POST", "/record_review",
+                                      form={"video_url": fields["video_url"], "quality": rng.choice((1, 3, 4, 5))})
+            if ("success", ) == tuple(category for category, _ in flashes):
+                self.reviews += 1
+
+def run_user(port: int, index: int, args, samples: dict, lock: threading.Lock) -> SimulatedUser:
+    rng = random.Random(index)
+    series = library(rng, args.playlists, args.videos_per_playlist, args.series_per_user)
+    user = SimulatedUser(port, f"loadtest-user-{index}", series, samples, lock)
+    user.request("POST /switch_user", "POST", "/switch_user", form={"user_name": user.name})
+    user.import_library(library_csv(series))
+    for _ in range(args.rounds):
+        user.session(rng)
+    user.conn.close()
+    return user
+
+# --- Driver ---
+def percentiles(samples: list) -> dict:
+    ordered = sorted(samples)
+    return {"count": len(ordered), "p50_ms": round(statistics.median(ordered) * 1000, 2),
+            "p99_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000, 2)}
+
+def peak_rss_mb(pid: int):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None # Not on Linux
+
+def isolation_violations(workdir: str, users: list) -> list:
+    """
+    Compares each user's user_library and review_items with what that user did: progress must match
+    its own marks, its reviews must be of videos in its own playlists, and its review count must match.
+    """
+    import sqlite3
+    conn = sqlite3.connect(os.path.join(workdir, "lecture_subtitles.db"))
+    violations = []
+    for user in users:
+        row = conn.execute("SELECT id FROM users WHERE name = ?", (user.name,)).fetchone()
+        if row is None:
+            violations.append(f"{user.name}: user was not created")
+            continue
+        user_id = row[0]
+        stored = {title: current for title, current in conn.execute(
+            "SELECT series_title, current FROM user_library WHERE user_id = ?", (user_id,))}
+        expected = {title: current for title, (current, _, _) in user.series.items()}
+        if stored != expected:
+            violations.append(f"{user.name}: progress {stored} differs from {expected}")
+        own_videos = {video["url"] for _, _, url in user.series.values()
+                      for video in fake_yt_dlp.playlist_entries(url.split("list=")[-1])}
+        foreign = [url for (url,) in conn.execute("SELECT video_url FROM review_items WHERE user_id = ?", (user_id,))
+                   if url not in own_videos]
+        if foreign:
+            violations.append(f"{user.name}: review_items holds {len(foreign)} videos outside its library")
+        reviews = conn.execute("SELECT count(*) FROM review_history WHERE user_id = ?", (user_id,)).fetchone()[0]
+        if reviews != user.reviews:
+            violations.append(f"{user.name}: {reviews} reviews stored, {user.reviews} recorded")
+    conn.close()
+    return violations
+
+def dedup_stats(workdir: str) -> dict:
+    import sqlite3
+    conn = sqlite3.connect(os.path.join(workdir, "lecture_subtitles.db"))
+    referenced = conn.execute("SELECT coalesce(sum(total), 0) FROM user_library").fetchone()[0]
+    stored = conn.execute("SELECT count(*) FROM subtitles").fetchone()[0]
+    users = conn.execute("SELECT count(*) FROM users").fetchone()[0]
+    conn.close()
+    return {"users": users, "library_videos": referenced, "subtitle_rows": stored}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=300, help="Simulated users")
+    parser.add_argument("--concurrency", type=int, default=32, help="Users active at the same time")
+    parser.add_argument("--rounds", type=int, default=3, help="Sessions per user after the import")
+    parser.add_argument("--playlists", type=int, default=40, help="Shared playlists the libraries draw from")
+    parser.add_argument("--videos-per-playlist", type=int, default=20)
+    parser.add_argument("--series-per-user", type=int, default=10)
+    parser.add_argument("--cues", type=int, default=50, help="Caption lines per synthetic VTT")
+    parser.add_argument("--output", help="Also write the results as JSON to this file")
+    parser.add_argument("--serve", help=argparse.SUPPRESS) # Internal: run the server for this workdir
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve)
+        return
+
+    with tempfile.TemporaryDirectory(prefix="bench_load_") as workdir:
+        build_fixture(workdir, args.playlists, args.videos_per_playlist, args.cues)
+        env = dict(os.environ, YT_DLP_PATH=os.path.join(BENCH_DIR, "fake_yt_dlp.py"))
+        server = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve", workdir],
+                                  env=env, stdout=subprocess.PIPE, text=True)
+        try:
+            port = int(server.stdout.readline())
+            samples, lock = {}, threading.Lock()
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+                users = list(executor.map(lambda i: run_user(port, i, args, samples, lock), range(args.users)))
+            elapsed = time.perf_counter() - start
+            server_rss = peak_rss_mb(server.pid)
+        finally:
+            server.terminate()
+            server.wait()
+        all_samples = [s for route_samples in samples.values() for s in route_samples]
+        errors = [error for user in users for error in user.errors]
+        violations = isolation_violations(workdir, users)
+        report = {
+            "config": {key: getattr(args, key) for key in ("users", "concurrency", "rounds", "playlists",
+                                                            "videos_per_playlist", "series_per_user")},
+            "requests": len(all_samples), "errors": len(errors), "error_samples": errors[:20],
+            "isolation_violations": violations, "seconds": round(elapsed, 2),
+            "throughput_per_s": round(len(all_samples) / elapsed, 1), **percentiles(all_samples),
+            "server_peak_rss_mb": server_rss, "routes": {route: percentiles(s) for route, s in sorted(samples.items())},
+            "storage": dedup_stats(workdir),
+        }
+
+    print(f"{report['requests']} requests from {args.users} users ({args.concurrency} concurrent) in {report['seconds']}s: "
+          f"{report['throughput_per_s']} /s, p50 {report['p50_ms']} ms, p99 {report['p99_ms']} ms, "
+          f"{report['errors']} errors, {len(violations)} isolation violations, server peak RSS {report['server_peak_rss_mb']} MB")
+    for problem in report["error_samples"] + violations[:20]:
+        print(f"    FAIL: {problem}")
+    for route, stats in report["routes"].items():
+        print(f"    {route:<24}{stats['count']:>7}  p50 {stats['p50_ms']} ms  p99 {stats['p99_ms']} ms")
+    storage = report["storage"]
+    print(f"Storage: {storage['users']} users reference {storage['library_videos']} videos, "
+          f"served from {storage['subtitle_rows']} shared subtitle rows")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    sys.exit(1 if report["errors"] or violations else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+# benchmarks/run_benchmarks.py
+"""
+End-to-end benchmarks against a synthetic lecture library and the fake yt-dlp in this directory.
+Each scenario runs in its own process (so peak RSS is per scenario) and reports throughput,
+p50/p99 latency and peak RSS. Results are written as JSON; pass an earlier file to --compare.
+
+    python benchmarks/run_benchmarks.py --scale 1k
+    python benchmarks/run_benchmarks.py --scale 50k --scenarios bulk,vtt --latency 0.05 --failure-rate 0.1
+    python benchmarks/run_benchmarks.py --scale 1k --compare benchmarks/results/1k-20250101-120000.json
+
+Scenarios: bulk (bulk_download_watched_subtitles through the fake yt-dlp), vtt (clean_vtt_content),
+review (select_random_watched_lecture_for_review + record_review) and routes (Flask test client).
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+import fake_yt_dlp
+
+SCALES = {"10": 10, "1k": 1000, "50k": 50000} # Videos in the synthetic library
+VIDEOS_PER_SERIES = 50
+SCENARIOS = ("bulk", "vtt", "review", "routes")
+
+# --- Synthetic library ---
+def write_library(workdir: str, videos: int) -> list:
+    """Writes lectures.csv with enough series for `videos` videos, all but the last of each series watched."""
+    series = []
+    remaining = videos
+    while remaining > 0:
+        size = min(VIDEOS_PER_SERIES, remaining)
+        playlist_id = f"BENCH{len(series):04d}n{size}"
+        series.append((f"Synthetic Series {len(series)}", playlist_id, size))
+        remaining -= size
+    with open(os.path.join(workdir, "lectures.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Lecture Series", "Current", "Total", "Playlist URL"])
+        for title, playlist_id, size in series:
+            writer.writerow([title, max(size - 1, 1), size, f"https://www.youtube.com/playlist?list={playlist_id}"])
+    return series
+
+def percentiles(samples: list) -> dict:
+    if not samples:
+        return {"p50_ms": None, "p99_ms": None}
+    ordered = sorted(samples)
+    return {"p50_ms": round(statistics.median(ordered) * 1000, 3),
+            "p99_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000, 3)}
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1) # Bytes on macOS, KiB on Linux
+
+def _core(workdir: str):
+    import lecture_manager_core as core
+    core.DB_FILE = os.path.join(workdir, "lecture_subtitles.db")
+    core.CSV_FILE = os.path.join(workdir, "lectures.csv")
+    core.YT_DLP_PATH = os.path.join(BENCH_DIR, "fake_yt_dlp.py")
+    core.YT_DLP_HOST_MIN_INTERVAL = 0 # Measure our own overhead, not the politeness delay
+    core.init_db()
+    return core
+
+def _lectures(core):
+    return core.LectureIndex.from_dataframe(core.load_and_prepare_data())
+
+def _store_library(core, lectures, cues: int):
+    """Stores subtitles and playlist listings for the whole library without running yt-dlp."""
+    user_id = core.get_or_create_user(core.DEFAULT_USER)
+    with core.SubtitleWriter() as writer:
+        for record in lectures.series:
+            playlist_id = record.playlist_url.split("list=")[-1]
+            videos = fake_yt_dlp.playlist_entries(playlist_id)
+            core.save_cached_playlist(record.playlist_url, videos)
+            core.register_watched_videos(user_id, record.title, record.playlist_url, videos, record.current)
+            for idx, video in enumerate(videos):
+                video_id = video["url"].split("v=")[-1]
+                writer.add(record.title, idx, video["title"], video["url"], fake_yt_dlp.synthetic_vtt(video_id, cues))
+
+# --- Scenarios (each runs in a fresh process) ---
+def scenario_bulk(workdir: str, args) -> dict:
+    core = _core(workdir)
+    lectures = _lectures(core)
+    calls = []
+    run_yt_dlp = core._run_yt_dlp
+    def timed_run(*a, **kw):
+        start = time.perf_counter()
+        try:
+            return run_yt_dlp(*a, **kw)
+        finally:
+            calls.append(time.perf_counter() - start)
+    core._run_yt_dlp = timed_run
+    start = time.perf_counter()
+    results = core.bulk_download_watched_subtitles(lectures, max_workers=args.workers, batch_size=args.batch_size)
+    elapsed = time.perf_counter() - start
+    return {"operations": results["downloaded"], "seconds": elapsed, "latency_of": "yt-dlp run",
+            **percentiles(calls), "failed": results["failed"], "yt_dlp_runs": len(calls)}
+
+def scenario_vtt(workdir: str, args) -> dict:
+    core = _core(workdir)
+    samples, total_bytes = [], 0
+    for i in range(args.videos): # Generated one at a time so 50k documents don't sit in memory; only cleaning is timed
+        vtt = fake_yt_dlp.synthetic_vtt(f"doc{i}", args.cues)
+        total_bytes += len(vtt)
+        t = time.perf_counter()
+        core.clean_vtt_content(vtt)
+        samples.append(time.perf_counter() - t)
+    elapsed = sum(samples)
+    return {"operations": len(samples), "seconds": elapsed, "latency_of": "document",
+            **percentiles(samples), "mb_per_second": round(total_bytes / 1e6 / elapsed, 2)}
+
+def scenario_review(workdir: str, args) -> dict:
+    core = _core(workdir)
+    lectures = _lectures(core)
+    user_id = core.get_or_create_user(core.DEFAULT_USER)
+    for record in lectures.series:
+        videos = fake_yt_dlp.playlist_entries(record.playlist_url.split("list=")[-1])
+        core.save_cached_playlist(record.playlist_url, videos)
+        core.register_watched_videos(user_id, record.title, record.playlist_url, videos, record.current)
+    samples = []
+    start = time.perf_counter()
+    for i in range(args.requests):
+        t = time.perf_counter()
+        picked = core.select_random_watched_lecture_for_review(lectures, user_id)
+        samples.append(time.perf_counter() - t)
+        core.record_review(user_id, picked["video_url"], 3 + i % 3)
+    elapsed = time.perf_counter() - start
+    return {"operations": len(samples), "seconds": elapsed, "latency_of": "selection", **percentiles(samples)}
+
+def scenario_routes(workdir: str, args) -> dict:
+    os.chdir(workdir)
+    core = _core(workdir)
+    _store_library(core, _lectures(core), args.cues)
+    core.close_db_connection()
+    os.environ["LECTURE_MANAGER_BACKGROUND_STARTUP"] = "0"
+    core.PREFETCH_ENABLED = False # Keep background yt-dlp traffic out of the measurements
+    import app
+    client = app.app.test_client()
+    video_url = "https://www.youtube.com/watch?v=BENCH0000n{}v0".format(min(VIDEOS_PER_SERIES, args.videos))
+    routes = {
+        "GET /": lambda: client.get("/"),
+        "POST /select_to_watch": lambda: client.post("/select_to_watch"),
+        "POST /select_for_review": lambda: client.post("/select_for_review"),
+        "GET /subtitles": lambda: client.get("/subtitles", query_string={"video_url": video_url}),
+        "GET /feynman_prompt": lambda: client.get("/feynman_prompt", query_string={"video_url": video_url}),
+        "GET /search": lambda: client.get("/search", query_string={"q": "symmetry coset"}),
+        # Synthetic transcripts share a small vocabulary, so "symmetry coset" matches every one of them
+        # (the worst case); a playlist ID only matches the titles of one series, like a rare term.
+        "GET /search (one series)": lambda: client.get("/search", query_string={"q": "BENCH0000n{}".format(min(VIDEOS_PER_SERIES, args.videos))}),
+        "GET /search (limit=-1)": lambda: client.get("/search", query_string={"q": "symmetry coset", "limit": -1}),
+    }
+    per_route, all_samples = {}, []
+    start = time.perf_counter()
+    for name, call in routes.items():
+        samples = []
+        for _ in range(args.requests):
+            t = time.perf_counter()
+            response = call()
+            samples.append(time.perf_counter() - t)
+            if response.status_code >= 400:
+                raise RuntimeError(f"{name} returned HTTP {response.status_code}")
+        per_route[name] = percentiles(samples)
+        all_samples += samples
+    elapsed = time.perf_counter() - start
+    return {"operations": len(all_samples), "seconds": elapsed, "latency_of": "request",
+            **percentiles(all_samples), "routes": per_route}
+
+def run_scenario(name: str, workdir: str, args) -> dict:
+    result = globals()[f"scenario_{name}"](workdir, args)
+    result["throughput_per_s"] = round(result["operations"] / result["seconds"], 2) if result["seconds"] else None
+    result["seconds"] = round(result["seconds"], 3)
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+# --- Driver ---
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def compare(previous_path: str, report: dict):
+    with open(previous_path) as f:
+        previous = json.load(f)["results"]
+    print(f"\nCompared with {previous_path}:")
+    for name, result in report["results"].items():
+        old = previous.get(name)
+        if not old:
+            continue
+        for key in ("throughput_per_s", "p50_ms", "p99_ms", "peak_rss_mb"):
+            if old.get(key) and result.get(key) is not None:
+                print(f"  {name:<8}{key:<18}{old[key]:>12}{result[key]:>12}{result[key] / old[key]:>9.2f}x")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=SCALES, default="1k", help="Synthetic library size in videos")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--cues", type=int, default=100, help="Caption lines per synthetic VTT")
+    parser.add_argument("--requests", type=int, default=200, help="Calls per route / review selections")
+    parser.add_argument("--workers", type=int, default=None, help="Bulk download workers (default: BULK_DOWNLOAD_WORKERS)")
+    parser.add_argument("--batch-size", type=int, default=None, help="Videos per yt-dlp run (default: BULK_BATCH_SIZE)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Fake yt-dlp seconds per run")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random fake yt-dlp latency, seconds")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of videos without subtitles")
+    parser.add_argument("--crash-rate", type=float, default=0.0, help="Share of fake yt-dlp runs that fail")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/<scale>-<timestamp>.json)")
+    parser.add_argument("--compare", help="Earlier result file to compare against")
+    parser.add_argument("--scenario", help=argparse.SUPPRESS) # Internal: run one scenario in this process
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    args.videos = SCALES[args.scale]
+
+    if args.scenario:
+        print(json.dumps(run_scenario(args.scenario, args.workdir, args)))
+        return
+
+    env = dict(os.environ, FAKE_YT_DLP_LATENCY=str(args.latency), FAKE_YT_DLP_JITTER=str(args.jitter),
+               FAKE_YT_DLP_FAILURE_RATE=str(args.failure_rate), FAKE_YT_DLP_CRASH_RATE=str(args.crash_rate),
+               FAKE_YT_DLP_CUES=str(args.cues), YT_DLP_PATH=os.path.join(BENCH_DIR, "fake_yt_dlp.py"))
+    report = {
+        "scale": args.scale, "videos": args.videos, "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {key: getattr(args, key) for key in ("cues", "requests", "workers", "batch_size", "latency",
+                                                        "jitter", "failure_rate", "crash_rate")},
+        "results": {},
+    }
+    for name in args.scenarios.split(","):
+        if name not in SCENARIOS:
+            parser.error(f"unknown scenario '{name}'")
+        with tempfile.TemporaryDirectory(prefix=f"bench_{name}_") as workdir:
+            write_library(workdir, args.videos)
+            command = [sys.executable, os.path.abspath(__file__), *sys.argv[1:], "--scenario", name, "--workdir", workdir]
+            process = subprocess.run(command, env=env, capture_output=True, text=True)
+        if process.returncode != 0:
+            print(f"{name}: FAILED\n{process.stderr[-3000:]}")
+            continue
+        result = json.loads(process.stdout.strip().splitlines()[-1])
+        report["results"][name] = result
+        print(f"{name:<8}{result['operations']:>8} ops in {result['seconds']:>8.2f}s  {result['throughput_per_s']:>10} /s  "
+              f"p50 {result['p50_ms']} ms  p99 {result['p99_ms']} ms per {result['latency_of']}  "
+              f"peak RSS {result['peak_rss_mb']} MB")
+        for route, stats in result.get("routes", {}).items():
+            print(f"    {route:<26}p50 {stats['p50_ms']} ms  p99 {stats['p99_ms']} ms")
+
+    output = args.output or os.path.join(BENCH_DIR, "results", f"{args.scale}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+    if args.compare:
+        compare(args.compare, report)
+
+if __name__ == "__main__":
+    main()
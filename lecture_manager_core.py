@@ -1,58 +1,648 @@
 # lecture_manager_core.py
-import pandas as pd
+from __future__ import annotations
 import random
 import subprocess
 import json
 import sqlite3
 import os
+import atexit
 import logging # Use logging instead of print for many things
-from typing import List, Dict, Optional, Tuple
-from load_df import download_last_version
+from typing import List, Dict, Optional, Tuple, Iterable, Iterator, Set, Callable, TYPE_CHECKING
 import re
+import io
+import hashlib
+import zlib
 import tempfile # For creating a temporary directory for subtitles
+import threading
+import uuid
+import queue
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from urllib.parse import urlparse
+import metrics
+
+try:
+    import fcntl
+except ImportError: # Windows: ProcessLock then only excludes threads of this process
+    fcntl = None
+
+if TYPE_CHECKING:
+    import pandas as pd # Imported lazily (it dominates import time) by the functions that build DataFrames
 
 
 # --- Configuration ---
-download_last_version() #comment this line if you want to just have local copy of your lectures.csv. I use this paired with google sheets
 CSV_FILE = "lectures.csv"
 DB_FILE = "lecture_subtitles.db"
-YT_DLP_PATH = "yt-dlp"  # Or full path if not in PATH
+YT_DLP_PATH = os.environ.get("YT_DLP_PATH", "yt-dlp")  # Or full path if not in PATH
+SUBTITLE_LANGS_PRIORITY = ['en', 'en-US', 'en-GB']
+SUBTITLE_SINGLE_CALL = True # Ask for all SUBTITLE_LANGS_PRIORITY in one yt-dlp run instead of one run per language
+BULK_DOWNLOAD_WORKERS = 4 # Max concurrent yt-dlp processes during bulk download
+BULK_BATCH_SIZE = 20 # Videos handed to a single yt-dlp process during bulk download
+YT_DLP_HOST_MIN_INTERVAL = 0.5 # Min seconds between yt-dlp launches against the same host
+
+PLAYLIST_CACHE_TTL = 24 * 60 * 60 # Seconds a playlist listing stored in the DB is considered fresh
 
-_playlist_cache = {} # Cache for playlist video details
+PREFETCH_ENABLED = True # Warm playlists and next-lecture subtitles in the background
+PREFETCH_WORKERS = 2 # Max concurrent prefetch tasks
+PREFETCH_QUEUE_SIZE = 200 # Max series waiting to be prefetched
+PREFETCH_MAX_VIDEOS_PER_PLAYLIST = 5 # Next lectures (one per distinct follower position) downloaded per prefetched playlist
+DEFAULT_USER = "default" # Owner of CSV_FILE; requests without a chosen user act as this user
+USER_LIBRARY_CACHE_SIZE = 1024 # Users whose LectureIndex is kept in memory
+SHARED_STATE_POLL_INTERVAL = 1.0 # Seconds between checks for caches invalidated by other worker processes
+YT_DLP_PROBE_TTL = 10 * 60 # Seconds a yt-dlp check made by one worker process is reused by the others
+LOCK_DIR = None # Directory for cross-process lock files; None uses DB_FILE + ".locks"
+PLAYLIST_FETCH_LOCK_TIMEOUT = 120 # Seconds to wait for another process fetching the same playlist before fetching anyway
+
+_playlist_cache = {} # In-process cache for playlist video details, backed by the playlist_cache table
+_playlist_cache_generation = 0 # PLAYLISTS_GENERATION that _playlist_cache is valid for
 
 # --- Logging Setup ---
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+def setup_logging(level: int = logging.INFO):
+    """Configures root logging for the app. Not done on import, so tools and tests importing this module keep their own."""
+    logging.basicConfig(level=level, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# --- Metrics ---
+# Exposed by the app on /metrics; timed blocks also show up in per-request profiles (Server-Timing).
+YT_DLP_SECONDS = metrics.Histogram("lecture_manager_yt_dlp_seconds", "Wall time of yt-dlp subprocess runs.",
+                                   profile_name="yt-dlp")
+YT_DLP_IN_FLIGHT = metrics.Gauge("lecture_manager_yt_dlp_in_flight", "yt-dlp subprocesses currently running.")
+SUBTITLE_DOWNLOADS_IN_FLIGHT = metrics.Gauge("lecture_manager_subtitle_downloads_in_flight",
+                                             "Subtitle downloads in progress (one per yt-dlp batch in batched mode).")
+DB_SECONDS = metrics.Histogram("lecture_manager_db_seconds", "Time spent in SQLite operations.", profile_name="db")
+PLAYLIST_CACHE_LOOKUPS = metrics.Counter("lecture_manager_playlist_cache_lookups_total",
+                                         "Playlist listing lookups by where they were served from.")
+
+# --- Database Connection Layer ---
+# One long-lived connection per thread (sqlite3 connections must not be shared across threads).
+# WAL lets readers (page views, prefetch) proceed while a bulk job is writing.
+DB_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL", # Safe with WAL; only the last commits can be lost on power failure
+    "cache_size": -16000, # Negative = KiB, so ~16 MB of page cache per connection
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000, # ms to wait for a competing writer before raising "database is locked"
+    "recursive_triggers": "ON", # So INSERT OR REPLACE fires the delete trigger that keeps subtitles_fts in sync
+}
+DB_STATEMENT_CACHE_SIZE = 256 # Prepared statements kept per connection
+SUBTITLE_COMPRESSION = "zlib" # How new subtitles are stored: "zlib" (compressed BLOB) or None (plain TEXT)
+SUBTITLE_ZLIB_LEVEL = 6
+SUBTITLE_WRITE_BATCH_ROWS = 50 # Bulk ingestion commits after this many subtitles...
+SUBTITLE_WRITE_BATCH_SECONDS = 5.0 # ...or once the oldest buffered one is this old
+SQL_IN_CHUNK_SIZE = 500 # Max bound parameters per IN (...) query, well below SQLite's limit
+
+_db_local = threading.local()
+
+def get_db_connection() -> sqlite3.Connection:
+    """Returns this thread's connection to DB_FILE, opening and tuning it on first use."""
+    conn = getattr(_db_local, "conn", None)
+    if conn is not None and _db_local.db_file == DB_FILE:
+        return conn
+    if conn is not None: # DB_FILE was changed, drop the connection to the old file
+        conn.close()
+    conn = sqlite3.connect(DB_FILE, cached_statements=DB_STATEMENT_CACHE_SIZE)
+    for pragma, value in DB_PRAGMAS.items():
+        conn.execute(f"PRAGMA {pragma} = {value}")
+    # Used by the subtitles_fts triggers to index the plain text of compressed rows
+    conn.create_function("subtitle_plaintext", 2, _decode_subtitles, deterministic=True)
+    _db_local.conn = conn
+    _db_local.db_file = DB_FILE
+    return conn
+
+def close_db_connection():
+    """Closes this thread's connection, if any. The next get_db_connection() reopens it."""
+    conn = getattr(_db_local, "conn", None)
+    if conn is not None:
+        conn.close()
+        _db_local.conn = None
 
 # --- Database Functions ---
-def init_db():
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS subtitles (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        series_title TEXT NOT NULL,
-        video_playlist_index INTEGER NOT NULL,
-        video_title TEXT,
-        video_url TEXT UNIQUE NOT NULL,
-        subtitles_text TEXT,
-        downloaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        UNIQUE(series_title, video_playlist_index)
-    )
+# Subtitles are shared by every user and keyed by video_url alone. Series title and playlist position
+# are whatever the first downloader's library said, so they are informational, not unique.
+_SUBTITLES_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS {name} (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    series_title TEXT NOT NULL,
+    video_playlist_index INTEGER NOT NULL,
+    video_title TEXT,
+    video_url TEXT UNIQUE NOT NULL,
+    subtitles_text TEXT,
+    downloaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    subtitles_format TEXT NOT NULL DEFAULT 'text'
+)
+"""
+
+_REVIEW_ITEMS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS review_items (
+    user_id INTEGER NOT NULL,
+    video_url TEXT NOT NULL,
+    series_title TEXT NOT NULL,
+    video_playlist_index INTEGER NOT NULL,
+    video_title TEXT,
+    playlist_url TEXT,
+    repetitions INTEGER NOT NULL DEFAULT 0,
+    interval_days REAL NOT NULL DEFAULT 0,
+    ease_factor REAL NOT NULL DEFAULT 2.5,
+    due_at REAL NOT NULL,
+    last_reviewed_at REAL,
+    has_subtitles INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, video_url)
+)
+"""
+
+def _migrate_subtitles_to_shared(conn: sqlite3.Connection):
+    """
+    Databases from the single-user version made (series_title, video_playlist_index) unique, so two
+    libraries naming series alike, or a reordered playlist, made INSERT OR REPLACE drop other videos'
+    subtitles. Rebuilds the table without that constraint, keeping row ids (the search index uses them).
+    """
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'subtitles'").fetchone()
+    if row is None or "UNIQUE(series_title,video_playlist_index)" not in "".join(row[0].split()):
+        return
+    if not conn.in_transaction:
+        conn.execute("BEGIN") # All or nothing, committed by init_db
+    columns = {info[1] for info in conn.execute("PRAGMA table_info(subtitles)")}
+    subtitles_format = "subtitles_format" if "subtitles_format" in columns else "'text'"
+    conn.execute(_SUBTITLES_TABLE_SQL.format(name="subtitles_shared"))
+    conn.execute(f"""
+    INSERT INTO subtitles_shared (id, series_title, video_playlist_index, video_title, video_url, subtitles_text, downloaded_at, subtitles_format)
+    SELECT id, series_title, video_playlist_index, video_title, video_url, subtitles_text, downloaded_at, {subtitles_format} FROM subtitles
     """)
-    conn.commit()
-    conn.close()
+    conn.execute("DROP TABLE subtitles") # Its triggers and indexes go with it and are recreated by init_db
+    conn.execute("ALTER TABLE subtitles_shared RENAME TO subtitles")
+    logging.info("Migrated subtitles to the shared, per-video layout.")
+
+_SUBTITLE_CUES_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS {name} (
+    subtitle_id INTEGER NOT NULL,
+    start_ms INTEGER NOT NULL,
+    end_ms INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (subtitle_id, start_ms)
+) WITHOUT ROWID
+"""
+
+def _migrate_subtitle_cues_to_ids(conn: sqlite3.Connection):
+    """Rebuilds a subtitle_cues table keyed by video_url (with its URL index) into the subtitle_id layout."""
+    columns = {info[1] for info in conn.execute("PRAGMA table_info(subtitle_cues)")}
+    if "video_url" not in columns:
+        return
+    if not conn.in_transaction:
+        conn.execute("BEGIN")
+    conn.execute(_SUBTITLE_CUES_TABLE_SQL.format(name="subtitle_cues_by_id"))
+    conn.execute("""
+    INSERT INTO subtitle_cues_by_id (subtitle_id, start_ms, end_ms, text)
+    SELECT s.id, c.start_ms, MAX(c.end_ms), group_concat(c.text, char(10))
+    FROM subtitle_cues c JOIN subtitles s ON s.video_url = c.video_url
+    GROUP BY s.id, c.start_ms
+    """)
+    conn.execute("DROP TABLE subtitle_cues") # Takes idx_subtitle_cues_video_start with it
+    conn.execute("ALTER TABLE subtitle_cues_by_id RENAME TO subtitle_cues")
+    logging.info("Migrated subtitle cues to be keyed by subtitle id.")
+
+def _migrate_review_items_to_users(conn: sqlite3.Connection, user_id: int):
+    """Moves review schedules from the single-user version (keyed by video_url alone) to user_id."""
+    columns = {info[1] for info in conn.execute("PRAGMA table_info(review_items)")}
+    if columns and "user_id" not in columns:
+        if not conn.in_transaction:
+            conn.execute("BEGIN")
+        # Triggers and the index would follow the renamed table and then be dropped with it
+        conn.execute("DROP TRIGGER IF EXISTS review_items_subtitles_insert")
+        conn.execute("DROP TRIGGER IF EXISTS review_items_subtitles_delete")
+        conn.execute("DROP INDEX IF EXISTS idx_review_items_due")
+        conn.execute("ALTER TABLE review_items RENAME TO review_items_single_user")
+        conn.execute(_REVIEW_ITEMS_TABLE_SQL)
+        conn.execute("""
+        INSERT INTO review_items (user_id, video_url, series_title, video_playlist_index, video_title, playlist_url,
+            repetitions, interval_days, ease_factor, due_at, last_reviewed_at, has_subtitles)
+        SELECT ?, video_url, series_title, video_playlist_index, video_title, playlist_url,
+            repetitions, interval_days, ease_factor, due_at, last_reviewed_at, has_subtitles FROM review_items_single_user
+        """, (user_id,))
+        conn.execute("DROP TABLE review_items_single_user")
+        logging.info(f"Moved existing review schedules to user '{DEFAULT_USER}'.")
+    history_columns = {info[1] for info in conn.execute("PRAGMA table_info(review_history)")}
+    if history_columns and "user_id" not in history_columns:
+        conn.execute("ALTER TABLE review_history ADD COLUMN user_id INTEGER")
+        conn.execute("UPDATE review_history SET user_id = ?", (user_id,))
+
+def init_db():
+    conn = get_db_connection()
+    with conn:
+        _migrate_subtitles_to_shared(conn)
+        conn.execute(_SUBTITLES_TABLE_SQL.format(name="subtitles"))
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS playlist_cache (
+            playlist_url TEXT PRIMARY KEY,
+            videos_json TEXT NOT NULL,
+            fetched_at REAL NOT NULL
+        )
+        """)
+        # Cleaned transcript lines with their timings, for time-range retrieval. Keyed by the integer
+        # subtitles.id and clustered on it (WITHOUT ROWID), so a cue costs no URL copy and no extra index
+        _migrate_subtitle_cues_to_ids(conn)
+        conn.execute(_SUBTITLE_CUES_TABLE_SQL.format(name="subtitle_cues"))
+        # Replacing or deleting a video's subtitles drops its cues (REPLACE fires this via recursive_triggers)
+        conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS subtitle_cues_subtitles_delete AFTER DELETE ON subtitles BEGIN
+            DELETE FROM subtitle_cues WHERE subtitle_id = old.id;
+        END
+        """)
+        # Users and their libraries: one row per followed series, with that user's progress
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL,
+            created_at REAL NOT NULL,
+            library_version INTEGER NOT NULL DEFAULT 0
+        )
+        """)
+        if "library_version" not in {row[1] for row in conn.execute("PRAGMA table_info(users)")}:
+            conn.execute("ALTER TABLE users ADD COLUMN library_version INTEGER NOT NULL DEFAULT 0")
+        conn.execute("INSERT OR IGNORE INTO users (name, created_at) VALUES (?, ?)", (DEFAULT_USER, time.time()))
+        default_user_id = conn.execute("SELECT id FROM users WHERE name = ?", (DEFAULT_USER,)).fetchone()[0]
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS user_library (
+            user_id INTEGER NOT NULL,
+            series_title TEXT NOT NULL,
+            playlist_url TEXT,
+            current INTEGER,
+            total INTEGER,
+            source_current INTEGER,
+            updated_at REAL NOT NULL,
+            PRIMARY KEY (user_id, series_title)
+        )
+        """)
+        # Finds every follower of a playlist, so one fetch serves all of them
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_user_library_playlist ON user_library(playlist_url)")
+        # Spaced-repetition state per user and watched video (SM-2), and a log of every review
+        _migrate_review_items_to_users(conn, default_user_id)
+        conn.execute(_REVIEW_ITEMS_TABLE_SQL)
+        # The due query is a range scan per (user, has_subtitles), so the next review is the first index entry read
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_review_items_due ON review_items(user_id, has_subtitles, due_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_review_items_video ON review_items(video_url)") # For the triggers below
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS review_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            video_url TEXT NOT NULL,
+            reviewed_at REAL NOT NULL,
+            quality INTEGER NOT NULL,
+            interval_days REAL NOT NULL,
+            ease_factor REAL NOT NULL,
+            user_id INTEGER
+        )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_review_history_video ON review_history(video_url, reviewed_at)")
+        # Keep review_items.has_subtitles in step with the subtitles table
+        conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS review_items_subtitles_insert AFTER INSERT ON subtitles BEGIN
+            UPDATE review_items SET has_subtitles = 1 WHERE video_url = new.video_url;
+        END
+        """)
+        conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS review_items_subtitles_delete AFTER DELETE ON subtitles BEGIN
+            UPDATE review_items SET has_subtitles = 0 WHERE video_url = old.video_url;
+        END
+        """)
+        # State shared by all worker processes: generation counters and the last yt-dlp check
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS app_state (
+            key TEXT PRIMARY KEY,
+            value TEXT,
+            updated_at REAL NOT NULL
+        )
+        """)
+        # Bulk download jobs, readable by every worker process while they run and after they end
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS bulk_jobs (
+            job_id TEXT PRIMARY KEY,
+            library_key TEXT NOT NULL,
+            status TEXT NOT NULL,
+            done INTEGER NOT NULL DEFAULT 0,
+            total INTEGER,
+            current_series TEXT,
+            failures_json TEXT NOT NULL DEFAULT '[]',
+            results_json TEXT NOT NULL DEFAULT 'null',
+            error TEXT,
+            started_at REAL NOT NULL,
+            finished_at REAL
+        )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_bulk_jobs_library ON bulk_jobs(library_key, status)")
+        # Outcome of past subtitle downloads that didn't store anything, so bulk runs and the prefetcher
+        # skip videos without subtitles and retry failed ones only once their backoff has passed
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS ingestion_state (
+            video_url TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT,
+            last_attempt_at REAL,
+            next_retry_at REAL
+        )
+        """)
+        conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS ingestion_state_subtitles_insert AFTER INSERT ON subtitles BEGIN
+            UPDATE ingestion_state SET status = 'done', last_error = NULL, next_retry_at = NULL
+            WHERE video_url = new.video_url;
+        END
+        """)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(subtitles)")}
+        if "subtitles_format" not in columns: # Databases created before compressed storage
+            conn.execute("ALTER TABLE subtitles ADD COLUMN subtitles_format TEXT NOT NULL DEFAULT 'text'")
+        # Lets the format migration find unconverted rows without reading every transcript
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_subtitles_format ON subtitles(subtitles_format)")
+    migrate_subtitle_storage()
+    init_search_index()
     logging.info(f"Database {DB_FILE} initialized/checked.")
 
+# --- Shared State Across Processes ---
+# Several worker processes (see wsgi.py) share the DB. In-process caches stay valid by watching
+# generation counters in app_state, which writers bump; ProcessLock serializes work across processes.
+PLAYLISTS_GENERATION = "playlists_generation" # Bumped when cached playlists are invalidated
+CSV_GENERATION = "csv_generation" # Bumped when lectures.csv was reloaded with changes
+
+_shared_generations: Dict[str, int] = {}
+_shared_generations_read_at = 0.0
+_shared_generations_lock = threading.Lock()
+
+@DB_SECONDS.timed(operation="get_app_state")
+def get_app_state(key: str) -> Optional[Tuple[object, float]]:
+    """Returns (value, updated_at) stored under key, or None."""
+    row = get_db_connection().execute("SELECT value, updated_at FROM app_state WHERE key = ?", (key,)).fetchone()
+    return (json.loads(row[0]), row[1]) if row else None
+
+@DB_SECONDS.timed(operation="set_app_state")
+def set_app_state(key: str, value):
+    conn = get_db_connection()
+    with conn:
+        conn.execute("INSERT OR REPLACE INTO app_state (key, value, updated_at) VALUES (?, ?, ?)",
+                     (key, json.dumps(value), time.time()))
+
+@DB_SECONDS.timed(operation="bump_generation")
+def bump_generation(key: str) -> int:
+    """Increments a generation counter so every process drops what it cached under it. Returns the new value."""
+    conn = get_db_connection()
+    with conn:
+        conn.execute("""
+        INSERT INTO app_state (key, value, updated_at) VALUES (?, '1', ?)
+        ON CONFLICT(key) DO UPDATE SET value = CAST(CAST(value AS INTEGER) + 1 AS TEXT), updated_at = excluded.updated_at
+        """, (key, time.time()))
+        generation = int(conn.execute("SELECT value FROM app_state WHERE key = ?", (key,)).fetchone()[0])
+    with _shared_generations_lock:
+        _shared_generations[key] = generation
+    return generation
+
+def get_generation(key: str, max_age: float = SHARED_STATE_POLL_INTERVAL) -> int:
+    """
+    Current value of a generation counter (0 if never bumped). The counters are re-read from the DB
+    at most every max_age seconds per process, so checking them on every request is cheap.
+    """
+    global _shared_generations_read_at
+    with _shared_generations_lock:
+        if time.monotonic() - _shared_generations_read_at < max_age:
+            return _shared_generations.get(key, 0)
+    try:
+        rows = get_db_connection().execute("SELECT key, value FROM app_state WHERE key IN (?, ?)",
+                                           (PLAYLISTS_GENERATION, CSV_GENERATION)).fetchall()
+    except sqlite3.Error as e:
+        logging.warning(f"Could not read shared generations: {e}")
+        rows = None
+    with _shared_generations_lock:
+        if rows is not None:
+            _shared_generations.update((name, int(value)) for name, value in rows)
+            _shared_generations_read_at = time.monotonic()
+        return _shared_generations.get(key, 0)
+
+class ProcessLock:
+    """
+    Exclusive lock shared by every process using the same DB_FILE: an flock on a file in LOCK_DIR.
+    Without fcntl (Windows) it falls back to a lock that only excludes threads of this process.
+    """
+
+    _thread_locks: Dict[str, threading.Lock] = {}
+    _thread_locks_guard = threading.Lock()
+
+    def __init__(self, name: str):
+        self.path = os.path.join(LOCK_DIR or DB_FILE + ".locks", name + ".lock")
+        self._fd = None
+        self._thread_lock = None
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Waits up to timeout seconds (None waits forever, 0 not at all). Returns whether the lock is now held."""
+        if fcntl is None:
+            with self._thread_locks_guard:
+                lock = self._thread_locks.setdefault(self.path, threading.Lock())
+            if not lock.acquire(timeout=-1 if timeout is None else timeout):
+                return False
+            self._thread_lock = lock
+            return True
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | (fcntl.LOCK_NB if deadline is not None else 0))
+                self._fd = fd
+                return True
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    os.close(fd)
+                    return False
+                time.sleep(min(0.05, max(0.0, deadline - time.monotonic())))
+            except OSError:
+                os.close(fd)
+                raise
+
+    def release(self):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+        elif self._thread_lock is not None:
+            self._thread_lock.release()
+            self._thread_lock = None
+
+# --- Full-Text Search ---
+# subtitles_fts indexes subtitles (rowid = subtitles.id) but keeps no copy of the text: it is an
+# external-content table reading the subtitles_fts_source view, which decompresses rows with
+# subtitle_plaintext(). Triggers keep the index in sync. subtitle_plaintext() is registered by
+# get_db_connection(), so rows must be written, and snippets read, through this module's connections.
+_SEARCH_SCHEMA_SQL = """
+CREATE VIEW IF NOT EXISTS subtitles_fts_source AS
+    SELECT id, video_title, subtitle_plaintext(subtitles_text, subtitles_format) AS subtitles_text FROM subtitles;
+CREATE VIRTUAL TABLE IF NOT EXISTS subtitles_fts USING fts5(
+    video_title, subtitles_text, content = 'subtitles_fts_source', content_rowid = 'id',
+    tokenize = 'porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS subtitles_fts_insert AFTER INSERT ON subtitles BEGIN
+    INSERT INTO subtitles_fts (rowid, video_title, subtitles_text)
+    VALUES (new.id, new.video_title, subtitle_plaintext(new.subtitles_text, new.subtitles_format));
+END;
+CREATE TRIGGER IF NOT EXISTS subtitles_fts_delete AFTER DELETE ON subtitles BEGIN
+    INSERT INTO subtitles_fts (subtitles_fts, rowid, video_title, subtitles_text)
+    VALUES ('delete', old.id, old.video_title, subtitle_plaintext(old.subtitles_text, old.subtitles_format));
+END;
+CREATE TRIGGER IF NOT EXISTS subtitles_fts_update AFTER UPDATE OF video_title, subtitles_text ON subtitles BEGIN
+    INSERT INTO subtitles_fts (subtitles_fts, rowid, video_title, subtitles_text)
+    VALUES ('delete', old.id, old.video_title, subtitle_plaintext(old.subtitles_text, old.subtitles_format));
+    INSERT INTO subtitles_fts (rowid, video_title, subtitles_text)
+    VALUES (new.id, new.video_title, subtitle_plaintext(new.subtitles_text, new.subtitles_format));
+END;
+"""
+
+def init_search_index():
+    """
+    Creates the FTS5 index and its triggers; indexes existing rows the first time. An index from
+    before external content (holding its own copy of every transcript) is dropped and rebuilt.
+    """
+    conn = get_db_connection()
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'subtitles_fts'").fetchone()
+    stale = row is not None and "content" not in row[0]
+    try:
+        if stale:
+            with conn:
+                for trigger in ("subtitles_fts_insert", "subtitles_fts_delete", "subtitles_fts_update"):
+                    conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+                conn.execute("DROP TABLE subtitles_fts")
+            logging.info("Rebuilding the full-text search index without its copy of the transcripts.")
+        conn.executescript(_SEARCH_SCHEMA_SQL)
+    except sqlite3.OperationalError as e:
+        logging.error(f"Full-text search unavailable (SQLite built without FTS5?): {e}")
+        return
+    if row is None or stale:
+        rebuild_search_index()
+
+def rebuild_search_index() -> int:
+    """Re-indexes every stored subtitle from scratch. Returns the number of indexed rows."""
+    conn = get_db_connection()
+    with conn:
+        conn.execute("INSERT INTO subtitles_fts (subtitles_fts) VALUES ('rebuild')")
+        count = conn.execute("SELECT count(*) FROM subtitles").fetchone()[0]
+    conn.execute("INSERT INTO subtitles_fts (subtitles_fts) VALUES ('optimize')")
+    conn.commit()
+    logging.info(f"Rebuilt full-text search index over {count} subtitles.")
+    return count
+
+def _fts_query(query: str) -> str:
+    """Turns free text into an FTS5 query matching all words, so user input can't cause syntax errors."""
+    return " ".join('"' + word.replace('"', '""') + '"' for word in query.split())
+
+SEARCH_SNIPPET_START = "\x02" # Match markers in snippets; the caller decides how to render them
+SEARCH_SNIPPET_END = "\x03"
+SEARCH_MAX_RESULTS = 100 # Upper bound on `limit`: each result decompresses its transcript for the snippet
+
+@DB_SECONDS.timed(operation="search_subtitles")
+def search_subtitles(query: str, limit: int = 20) -> List[Dict]:
+    """
+    Full-text search over stored subtitles and video titles, best matches (bm25) first.
+    Each hit has series_title, video_title, playlist_index, video_url and a snippet whose
+    matches are wrapped in SEARCH_SNIPPET_START/SEARCH_SNIPPET_END. `limit` is clamped to 1..SEARCH_MAX_RESULTS.
+    """
+    limit = max(1, min(limit, SEARCH_MAX_RESULTS)) # SQLite reads a negative LIMIT as no limit at all
+    fts_query = _fts_query(query)
+    if not fts_query:
+        return []
+    conn = get_db_connection()
+    try:
+        # Every match is ranked, which only reads the index. ORDER BY bm25() keeps just the `limit` best
+        # in SQLite's top-N sorter, where ORDER BY rank makes FTS5 sort every match (~35% slower on
+        # 50k transcripts). Snippets decompress the transcript, so they are made for those alone.
+        best = [row[0] for row in conn.execute("""
+        SELECT rowid FROM subtitles_fts WHERE subtitles_fts MATCH ? ORDER BY bm25(subtitles_fts) LIMIT ?
+        """, (fts_query, limit))]
+        if not best:
+            return []
+        placeholders = ",".join("?" * len(best))
+        rows = conn.execute(f"""
+        SELECT s.id, s.series_title, s.video_title, s.video_playlist_index, s.video_url,
+               snippet(subtitles_fts, 1, ?, ?, ' … ', 16)
+        FROM subtitles_fts
+        JOIN subtitles s ON s.id = subtitles_fts.rowid
+        WHERE subtitles_fts MATCH ? AND subtitles_fts.rowid IN ({placeholders})
+        """, (SEARCH_SNIPPET_START, SEARCH_SNIPPET_END, fts_query, *best)).fetchall()
+    except sqlite3.OperationalError as e:
+        logging.error(f"Subtitle search for '{query}' failed: {e}")
+        return []
+    rank = {rowid: position for position, rowid in enumerate(best)}
+    return [{"series_title": series_title, "video_title": video_title, "playlist_index": playlist_index,
+             "video_url": video_url, "snippet": snippet}
+            for _, series_title, video_title, playlist_index, video_url, snippet in sorted(rows, key=lambda row: rank[row[0]])]
+
+# --- Subtitle Storage Format ---
+# subtitles_format records how subtitles_text is stored: 'text' (plain TEXT) or 'zlib' (compressed
+# UTF-8 BLOB). Readers always go through _decode_subtitles, so both formats can coexist.
+def _encode_subtitles(text: str) -> Tuple[object, str]:
+    """Returns (value for subtitles_text, subtitles_format) according to SUBTITLE_COMPRESSION."""
+    if SUBTITLE_COMPRESSION == "zlib" and text:
+        return sqlite3.Binary(zlib.compress(text.encode('utf-8'), SUBTITLE_ZLIB_LEVEL)), "zlib"
+    return text, "text"
+
+def _decode_subtitles(value, subtitles_format: str) -> Optional[str]:
+    if value is None or subtitles_format == "text":
+        return value
+    if subtitles_format == "zlib":
+        return zlib.decompress(value).decode('utf-8')
+    raise ValueError(f"Unknown subtitles_format '{subtitles_format}'")
+
+def migrate_subtitle_storage(batch_rows: int = 200) -> int:
+    """
+    Re-encodes stored subtitles whose format differs from SUBTITLE_COMPRESSION (e.g. plain rows
+    written before compression was enabled). Runs in batches; returns the number of rows converted.
+    """
+    target_format = "zlib" if SUBTITLE_COMPRESSION == "zlib" else "text"
+    conn = get_db_connection()
+    converted = 0
+    while True:
+        rows = conn.execute("SELECT id, subtitles_text, subtitles_format FROM subtitles "
+                            "WHERE subtitles_format != ? AND subtitles_text IS NOT NULL AND subtitles_text != '' LIMIT ?",
+                            (target_format, batch_rows)).fetchall()
+        if not rows:
+            break
+        updates = [(*_encode_subtitles(_decode_subtitles(value, fmt)), row_id) for row_id, value, fmt in rows]
+        with conn:
+            conn.executemany("UPDATE subtitles SET subtitles_text = ?, subtitles_format = ? WHERE id = ?", updates)
+        converted += len(rows)
+    if converted:
+        logging.info(f"Converted {converted} stored subtitles to '{target_format}' format.")
+    return converted
+
+_SUBTITLE_INSERT_SQL = """
+INSERT OR REPLACE INTO subtitles (series_title, video_playlist_index, video_title, video_url, subtitles_text, subtitles_format)
+VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+def _prepare_subtitle_rows(series_title: str, video_playlist_index: int, video_title: str, video_url: str,
+                           subtitles_text: str) -> Tuple[tuple, List[tuple]]:
+    """Cleans raw VTT once into the subtitles row and its (start_ms, end_ms, text) cue rows."""
+    cues = list(iter_clean_vtt_cues(subtitles_text.splitlines())) if subtitles_text else []
+    cleaned_subtitles = "\n".join(text for _, _, text in cues) # Same text clean_vtt_content returns
+    subtitle_row = (series_title, video_playlist_index, video_title, video_url, *_encode_subtitles(cleaned_subtitles))
+    by_start: Dict[int, List] = {} # Cues are keyed by start; ones starting together become one row
+    for start_ms, end_ms, text in cues:
+        row = by_start.get(start_ms)
+        if row is None:
+            by_start[start_ms] = [start_ms, end_ms, text]
+        else:
+            row[1], row[2] = max(row[1], end_ms), row[2] + "\n" + text
+    return subtitle_row, [tuple(row) for row in by_start.values()]
+
+def _write_subtitle_rows(conn: sqlite3.Connection, entries: List[Tuple[tuple, List[tuple]]]):
+    """
+    Writes (subtitles row, cue rows) pairs. Replacing a video's row drops its earlier cues through
+    the subtitle_cues_subtitles_delete trigger. Caller owns the transaction.
+    """
+    for subtitle_row, cue_rows in entries:
+        subtitle_id = conn.execute(_SUBTITLE_INSERT_SQL, subtitle_row).lastrowid
+        conn.executemany("INSERT INTO subtitle_cues (subtitle_id, start_ms, end_ms, text) VALUES (?, ?, ?, ?)",
+                         [(subtitle_id, *cue_row) for cue_row in cue_rows])
+
+@DB_SECONDS.timed(operation="store_subtitle")
 def store_subtitle(series_title: str, video_playlist_index: int, video_title: str, video_url: str, subtitles_text: str) -> bool:
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+    conn = get_db_connection()
     try:
-        cleaned_subtitles = clean_vtt_content(subtitles_text) # Clean before storing
-        cursor.execute("""
-        INSERT OR REPLACE INTO subtitles (series_title, video_playlist_index, video_title, video_url, subtitles_text)
-        VALUES (?, ?, ?, ?, ?)
-        """, (series_title, video_playlist_index, video_title, video_url, cleaned_subtitles))
-        conn.commit()
+        entry = _prepare_subtitle_rows(series_title, video_playlist_index, video_title, video_url, subtitles_text) # Clean before storing
+        with conn:
+            _write_subtitle_rows(conn, [entry])
         logging.info(f"Stored cleaned subtitles for: {series_title} - Video {video_playlist_index + 1}: {video_title}")
         return True 
     except sqlite3.IntegrityError:
@@ -61,37 +651,544 @@ def store_subtitle(series_title: str, video_playlist_index: int, video_title: st
     except Exception as e:
         logging.error(f"Error storing subtitle for {video_url}: {e}")
         return False
-    finally:
-        conn.close()
 
+class SubtitleWriter:
+    """
+    Buffered writer for bulk ingestion. Cleaned subtitles (and their cues) are collected and
+    written with executemany in a single transaction once `flush_rows` rows are buffered or the oldest
+    buffered row is `flush_seconds` old, instead of one commit (and fsync) per video. The age is
+    checked on add() and flush_if_due(), which the producer calls while it waits for more rows.
+    `on_result(video_url, ok)` is called for every row once its outcome is known.
+    Use as a context manager: pending rows are flushed on exit, on error and at interpreter shutdown.
+    """
+
+    def __init__(self, on_result: Optional[Callable[[str, bool], None]] = None,
+                 flush_rows: Optional[int] = None, flush_seconds: Optional[float] = None):
+        self.on_result = on_result
+        self.flush_rows = max(1, flush_rows or SUBTITLE_WRITE_BATCH_ROWS)
+        self.flush_seconds = SUBTITLE_WRITE_BATCH_SECONDS if flush_seconds is None else flush_seconds
+        self._rows = []
+        self._oldest = None
+        self._lock = threading.RLock()
+
+    def __enter__(self):
+        atexit.register(self.flush)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        atexit.unregister(self.flush)
+        self.flush()
+        return False
+
+    def add(self, series_title: str, video_playlist_index: int, video_title: str, video_url: str, subtitles_text: str):
+        """Cleans and buffers one video's subtitles; may trigger a flush."""
+        try:
+            entry = _prepare_subtitle_rows(series_title, video_playlist_index, video_title, video_url, subtitles_text) # Clean before storing
+        except Exception as e:
+            logging.error(f"Error cleaning subtitles for {video_url}: {e}")
+            self._report(video_url, False)
+            return
+        with self._lock:
+            if not self._rows:
+                self._oldest = time.monotonic()
+            self._rows.append(entry)
+            if len(self._rows) >= self.flush_rows:
+                self.flush()
+            else:
+                self.flush_if_due()
+
+    def seconds_until_due(self) -> Optional[float]:
+        """Seconds until the oldest buffered row is `flush_seconds` old (0 if it already is), None if nothing is buffered."""
+        with self._lock:
+            if not self._rows:
+                return None
+            return max(0.0, self._oldest + self.flush_seconds - time.monotonic())
+
+    def flush_if_due(self):
+        """Flushes if the oldest buffered row is `flush_seconds` old. Call it while waiting for more rows."""
+        with self._lock:
+            if self._rows and time.monotonic() - self._oldest >= self.flush_seconds:
+                self.flush()
+
+    @DB_SECONDS.timed(operation="subtitle_writer_flush")
+    def flush(self):
+        with self._lock:
+            rows, self._rows = self._rows, []
+            if not rows:
+                return
+            conn = get_db_connection()
+            try:
+                with conn:
+                    _write_subtitle_rows(conn, rows)
+                outcomes = [(row, True) for row in rows]
+            except sqlite3.Error as e:
+                # One bad row aborts the whole batch; retry row by row to find out which videos failed.
+                logging.warning(f"Batched subtitle write of {len(rows)} rows failed ({e}), retrying row by row.")
+                outcomes = []
+                for row in rows:
+                    try:
+                        with conn:
+                            _write_subtitle_rows(conn, [row])
+                        outcomes.append((row, True))
+                    except sqlite3.Error as row_error:
+                        logging.error(f"Error storing subtitle for {row[0][3]}: {row_error}")
+                        outcomes.append((row, False))
+            logging.info(f"Stored cleaned subtitles for {sum(ok for _, ok in outcomes)} of {len(rows)} videos in one transaction.")
+        for row, ok in outcomes:
+            self._report(row[0][3], ok)
+
+    def _report(self, video_url: str, ok: bool):
+        if self.on_result:
+            self.on_result(video_url, ok)
+
+@DB_SECONDS.timed(operation="check_subtitle_exists")
 def check_subtitle_exists(video_url: str) -> bool:
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute("SELECT 1 FROM subtitles WHERE video_url = ?", (video_url,))
-    exists = cursor.fetchone() is not None
-    conn.close()
-    return exists
+    row = get_db_connection().execute("SELECT 1 FROM subtitles WHERE video_url = ?", (video_url,)).fetchone()
+    return row is not None
+
+@DB_SECONDS.timed(operation="get_existing_subtitle_urls")
+def get_existing_subtitle_urls(video_urls: Iterable[str]) -> Set[str]:
+    """Returns the subset of `video_urls` that already have stored subtitles, using a few IN queries."""
+    video_urls = list(dict.fromkeys(url for url in video_urls if url))
+    existing = set()
+    conn = get_db_connection()
+    for i in range(0, len(video_urls), SQL_IN_CHUNK_SIZE):
+        chunk = video_urls[i:i + SQL_IN_CHUNK_SIZE]
+        placeholders = ",".join("?" * len(chunk))
+        rows = conn.execute(f"SELECT video_url FROM subtitles WHERE video_url IN ({placeholders})", chunk)
+        existing.update(row[0] for row in rows)
+    return existing
 
+@DB_SECONDS.timed(operation="get_subtitle_for_review")
 def get_subtitle_for_review(video_url: str) -> Optional[str]:
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute("SELECT subtitles_text FROM subtitles WHERE video_url = ?", (video_url,))
-    row = cursor.fetchone()
-    conn.close()
+    row = get_db_connection().execute("SELECT subtitles_text, subtitles_format FROM subtitles WHERE video_url = ?",
+                                      (video_url,)).fetchone()
+    return _decode_subtitles(row[0], row[1]) if row else None
+
+@DB_SECONDS.timed(operation="get_subtitle_downloaded_at")
+def get_subtitle_downloaded_at(video_url: str) -> Optional[str]:
+    """Returns when the stored subtitles were written ('YYYY-MM-DD HH:MM:SS', UTC), or None if not stored."""
+    row = get_db_connection().execute("SELECT downloaded_at FROM subtitles WHERE video_url = ?", (video_url,)).fetchone()
     return row[0] if row else None
 
+@DB_SECONDS.timed(operation="get_subtitle_cues")
+def get_subtitle_cues(video_url: str, start_ms: Optional[int] = None, end_ms: Optional[int] = None) -> List[Tuple[int, int, str]]:
+    """Returns (start_ms, end_ms, text) of the stored cues overlapping [start_ms, end_ms), ordered by start."""
+    query = "SELECT start_ms, end_ms, text FROM subtitle_cues WHERE subtitle_id = (SELECT id FROM subtitles WHERE video_url = ?)"
+    params = [video_url]
+    if end_ms is not None:
+        query += " AND start_ms < ?"
+        params.append(end_ms)
+    if start_ms is not None:
+        query += " AND end_ms > ?"
+        params.append(start_ms)
+    return get_db_connection().execute(query + " ORDER BY start_ms", params).fetchall()
+
+def get_subtitle_text_for_range(video_url: str, start_ms: int, end_ms: int) -> Optional[str]:
+    """
+    Returns the transcript text spoken between start_ms and end_ms, one cue per line.
+    None if no timed cues are stored for the video (e.g. it was ingested before cues were kept).
+    """
+    cues = get_subtitle_cues(video_url, start_ms, end_ms)
+    if not cues and get_db_connection().execute("""
+    SELECT 1 FROM subtitle_cues WHERE subtitle_id = (SELECT id FROM subtitles WHERE video_url = ?) LIMIT 1
+    """, (video_url,)).fetchone() is None:
+        return None
+    return "\n".join(text for _, _, text in cues)
+
+# --- Ingestion State ---
+# Videos whose download stored nothing get a row in ingestion_state. "no_subtitles" means yt-dlp said
+# the video has no subtitles in SUBTITLE_LANGS_PRIORITY; anything else is a transient
+# "failed", retried after an exponential backoff. A later successful store marks the row "done".
+INGESTION_NO_SUBTITLES = "no_subtitles"
+INGESTION_FAILED = "failed"
+INGESTION_RETRY_BASE = 10 * 60 # Seconds before the first retry of a failed download; doubles with every attempt
+INGESTION_RETRY_MAX = 24 * 60 * 60 # Longest wait between retries
+INGESTION_NO_SUBTITLES_RECHECK = None # Seconds after which a video without subtitles is tried again; None never retries
+
+_INGESTION_UPSERT_SQL = """
+INSERT INTO ingestion_state (video_url, status, attempts, last_error, last_attempt_at, next_retry_at)
+VALUES (:url, :status, 1, :error, :now, :now + :first_delay)
+ON CONFLICT(video_url) DO UPDATE SET
+    status = excluded.status,
+    attempts = attempts + 1,
+    last_error = excluded.last_error,
+    last_attempt_at = excluded.last_attempt_at,
+    next_retry_at = CASE WHEN excluded.status = 'failed'
+        THEN excluded.last_attempt_at + MIN(:max_delay, :first_delay * (1 << MIN(attempts, 30)))
+        ELSE excluded.next_retry_at END
+"""
+
+@DB_SECONDS.timed(operation="record_ingestion_failures")
+def record_ingestion_failures(failures: Dict[str, str], now: Optional[float] = None) -> int:
+    """
+    Records downloads that stored nothing. failures maps video_url to INGESTION_NO_SUBTITLES or the
+    error that made the download fail. Returns how many rows were written.
+    """
+    if not failures:
+        return 0
+    now = time.time() if now is None else now
+    rows = []
+    for video_url, reason in failures.items():
+        if reason == INGESTION_NO_SUBTITLES:
+            rows.append({"url": video_url, "status": INGESTION_NO_SUBTITLES, "error": None, "now": now,
+                         "first_delay": INGESTION_NO_SUBTITLES_RECHECK, "max_delay": None})
+        else:
+            rows.append({"url": video_url, "status": INGESTION_FAILED, "error": str(reason)[-1000:], "now": now,
+                         "first_delay": INGESTION_RETRY_BASE, "max_delay": INGESTION_RETRY_MAX})
+    conn = get_db_connection()
+    try:
+        with conn:
+            conn.executemany(_INGESTION_UPSERT_SQL, rows)
+    except sqlite3.Error as e:
+        logging.error(f"Error recording {len(rows)} failed subtitle downloads: {e}")
+        return 0
+    return len(rows)
+
+@DB_SECONDS.timed(operation="get_deferred_downloads")
+def get_deferred_downloads(video_urls: Iterable[str], now: Optional[float] = None) -> Dict[str, Tuple[str, Optional[float]]]:
+    """
+    Returns {video_url: (status, next_retry_at)} for the videos of `video_urls` that shouldn't be
+    downloaded now: known to have no subtitles, or failed and still waiting for their retry.
+    """
+    now = time.time() if now is None else now
+    video_urls = list(dict.fromkeys(url for url in video_urls if url))
+    deferred = {}
+    conn = get_db_connection()
+    for i in range(0, len(video_urls), SQL_IN_CHUNK_SIZE):
+        chunk = video_urls[i:i + SQL_IN_CHUNK_SIZE]
+        placeholders = ",".join("?" * len(chunk))
+        rows = conn.execute(f"""
+        SELECT video_url, status, next_retry_at FROM ingestion_state
+        WHERE video_url IN ({placeholders}) AND status != 'done' AND (next_retry_at IS NULL OR next_retry_at > ?)
+        """, (*chunk, now))
+        deferred.update((url, (status, next_retry_at)) for url, status, next_retry_at in rows)
+    return deferred
+
+def describe_deferred_download(status: str, next_retry_at: Optional[float]) -> str:
+    """Human-readable reason for a get_deferred_downloads() entry."""
+    if status == INGESTION_NO_SUBTITLES:
+        return "no subtitles available"
+    return f"failed before, next retry at {time.strftime('%Y-%m-%d %H:%M', time.localtime(next_retry_at))}"
+
+# --- Feynman Prompt Builder ---
+# Long transcripts are split into segments on cue/sentence boundaries; when the whole transcript
+# doesn't fit the prompt budget, only the most information-dense segments are sent.
+FEYNMAN_PROMPT_TEMPLATE = """Explain the core concepts of the following lecture material as if you were teaching it to a 12-year-old. Identify the most crucial single concept or connection that, if misunderstood, would hinder understanding the rest. Based on this, formulate one single, concise, and insightful question that a student should be able to answer to demonstrate they have grasped this key aspect. The question should encourage critical thinking or application, not just recall.
+
+Lecture Subtitles:
+---
+{subtitles}
+---
+
+Your one question:
+"""
+FEYNMAN_PROMPT_TOKEN_BUDGET = 6000 # Approximate tokens for the whole prompt, instructions included
+FEYNMAN_SEGMENT_TOKENS = 600 # Approximate tokens per transcript segment
+FEYNMAN_MIN_TRANSCRIPT_TOKENS = 100 # Budgets leaving less room than this for the transcript are rejected
+FEYNMAN_SEGMENT_SEPARATOR = "\n[...]\n" # Marks transcript left out between selected segments
+FEYNMAN_SEGMENT_CACHE_SIZE = 256 # Transcripts whose segment boundaries are kept in memory
+CHARS_PER_TOKEN = 4 # Rough average for English text with common LLM tokenizers
+
+_STOPWORDS = frozenset("""
+a about above after again all also am an and any are as at be because been before being below between both
+but by can could did do does doing down during each few for from further had has have having he her here
+hers him his how i if in into is it its itself just like me more most my no nor not now of off on once only
+or other our out over own really right same she should so some such than that the their them then there
+these they this those through to too um uh under until up very was we well were what when where which while
+who whom why will with would yeah you your okay gonna going know get got thing things kind sort
+""".split())
+_WORD_RE = re.compile(r"[a-z0-9']+")
+_SENTENCE_RE = re.compile(r"[^.!?]*[.!?]+(?:\s+|$)|[^.!?]+$")
+_SENTENCE_END_CHARS = ".!?"
+
+_segment_cache: "OrderedDict[Tuple[str, int], Tuple[str, List[Tuple[int, int, int, float]]]]" = OrderedDict()
+_segment_cache_lock = threading.Lock()
+
+def estimate_tokens(text: str) -> int:
+    """Approximate LLM token count (~4 characters per token); O(1), no tokenizer needed."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def _information_density(text: str) -> float:
+    """Share of the words in text that are distinct content words (not stopwords/fillers)."""
+    words = _WORD_RE.findall(text.lower())
+    if not words:
+        return 0.0
+    content = {word for word in words if len(word) > 2 and word not in _STOPWORDS}
+    return len(content) / len(words)
+
+def _iter_transcript_units(text: str, max_chars: int) -> Iterator[Tuple[int, int]]:
+    """
+    Yields (start, end) character offsets of the smallest units a segment may be cut at:
+    stored cue lines, with lines longer than max_chars split into sentences and, if still too long, words.
+    """
+    for line in re.finditer(r"[^\n]+", text):
+        if line.end() - line.start() <= max_chars:
+            yield line.start(), line.end()
+            continue
+        for sentence in _SENTENCE_RE.finditer(text, line.start(), line.end()):
+            start, end = sentence.start(), sentence.end()
+            while end - start > max_chars:
+                cut = text.rfind(" ", start, start + max_chars)
+                cut = cut + 1 if cut > start else start + max_chars
+                yield start, cut
+                start = cut
+            if end > start:
+                yield start, end
+
+def segment_transcript(text: str, segment_tokens: int = FEYNMAN_SEGMENT_TOKENS) -> List[Tuple[int, int, int, float]]:
+    """
+    Splits a transcript into consecutive segments of at most ~segment_tokens tokens.
+    A full segment is cut after the last sentence end in its second half when there is one,
+    otherwise at the last cue boundary.
+    Returns (start, end, tokens, density) per segment; start/end are character offsets into text.
+    """
+    max_chars = max(1, segment_tokens * CHARS_PER_TOKEN)
+    units = list(_iter_transcript_units(text, max_chars))
+    boundaries = []
+
+    def close(first: int, last: int):
+        start, end = units[first][0], units[last][1]
+        boundaries.append((start, end, estimate_tokens(text[start:end]), _information_density(text[start:end])))
+
+    def ends_sentence(i: int) -> bool:
+        return text[units[i][0]:units[i][1]].rstrip()[-1:] in _SENTENCE_END_CHARS
+
+    first = 0
+    for i, (_, end) in enumerate(units):
+        while i > first and end - units[first][0] > max_chars:
+            half_way = units[first][0] + max_chars // 2
+            cut = i - 1
+            for j in range(i - 1, first - 1, -1):
+                if units[j][1] < half_way:
+                    break
+                if ends_sentence(j):
+                    cut = j
+                    break
+            close(first, cut)
+            first = cut + 1
+    if first < len(units):
+        close(first, len(units) - 1)
+    return boundaries
+
+def get_transcript_segments(video_url: str, segment_tokens: int = FEYNMAN_SEGMENT_TOKENS) -> Optional[Tuple[str, List[Tuple[int, int, int, float]]]]:
+    """
+    Returns (transcript, segments) for a stored transcript, see segment_transcript.
+    Segment boundaries are cached per video_url and reused until the subtitles are re-downloaded.
+    """
+    downloaded_at = get_subtitle_downloaded_at(video_url)
+    if downloaded_at is None:
+        return None
+    text = get_subtitle_for_review(video_url) or ""
+    key = (video_url, segment_tokens)
+    with _segment_cache_lock:
+        cached = _segment_cache.get(key)
+        if cached is not None and cached[0] == downloaded_at:
+            _segment_cache.move_to_end(key)
+            return text, cached[1]
+    segments = segment_transcript(text, segment_tokens)
+    with _segment_cache_lock:
+        _segment_cache[key] = (downloaded_at, segments)
+        _segment_cache.move_to_end(key)
+        while len(_segment_cache) > FEYNMAN_SEGMENT_CACHE_SIZE:
+            _segment_cache.popitem(last=False)
+    return text, segments
+
+def build_feynman_prompt(video_url: str, token_budget: int = FEYNMAN_PROMPT_TOKEN_BUDGET,
+                         segment_tokens: int = FEYNMAN_SEGMENT_TOKENS) -> Optional[Dict]:
+    """
+    Builds the Feynman prompt for a stored transcript within ~token_budget tokens.
+    If the whole transcript doesn't fit, the most information-dense segments that do are included,
+    in transcript order, with FEYNMAN_SEGMENT_SEPARATOR marking the gaps. Segments are made no larger
+    than the room left for the transcript, so some of it is always included.
+    Returns None if no subtitles are stored for the video. Raises ValueError if token_budget is
+    below feynman_min_token_budget().
+    """
+    if token_budget < feynman_min_token_budget():
+        raise ValueError(f"Token budget must be at least {feynman_min_token_budget()}.")
+    available = token_budget - estimate_tokens(FEYNMAN_PROMPT_TEMPLATE.format(subtitles=""))
+    result = get_transcript_segments(video_url, min(segment_tokens, available))
+    if result is None:
+        return None
+    text, segments = result
+    transcript_tokens = sum(tokens for _, _, tokens, _ in segments)
+
+    if transcript_tokens <= available:
+        selected = list(range(len(segments)))
+        subtitles = text.strip()
+    else:
+        separator_tokens = estimate_tokens(FEYNMAN_SEGMENT_SEPARATOR)
+        selected, used = [], 0
+        for index in sorted(range(len(segments)), key=lambda i: segments[i][3], reverse=True):
+            cost = segments[index][2] + (separator_tokens if selected else 0)
+            if used + cost <= available:
+                selected.append(index)
+                used += cost
+        selected.sort()
+        runs = [] # (start, end) of each run of adjacent selected segments
+        for position, index in enumerate(selected):
+            start, end, _, _ = segments[index]
+            if position and selected[position - 1] == index - 1:
+                runs[-1] = (runs[-1][0], end)
+            else:
+                runs.append((start, end))
+        subtitles = FEYNMAN_SEGMENT_SEPARATOR.join(text[start:end].strip() for start, end in runs)
+
+    prompt = FEYNMAN_PROMPT_TEMPLATE.format(subtitles=subtitles)
+    return {
+        "prompt": prompt,
+        "prompt_tokens": estimate_tokens(prompt),
+        "transcript_tokens": transcript_tokens,
+        "total_segments": len(segments),
+        "selected_segments": selected,
+        "truncated": len(selected) < len(segments),
+    }
+
+def feynman_min_token_budget() -> int:
+    """Smallest token_budget build_feynman_prompt accepts: the instructions plus FEYNMAN_MIN_TRANSCRIPT_TOKENS."""
+    return estimate_tokens(FEYNMAN_PROMPT_TEMPLATE.format(subtitles="")) + FEYNMAN_MIN_TRANSCRIPT_TOKENS
+
 # --- yt-dlp Helper Functions ---
-def get_playlist_videos_yt_dlp(playlist_url: str) -> Optional[List[Dict[str, str]]]:
+class _HostRateLimiter:
+    """Spaces out requests to the same host by at least `min_interval` seconds, across threads."""
+
+    def __init__(self, min_interval: float):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_slot = {} # host -> earliest monotonic time the next request may start
+
+    def wait(self, url: str):
+        if self.min_interval <= 0:
+            return
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.min_interval
+        if slot > now:
+            time.sleep(slot - now)
+
+_host_rate_limiter = _HostRateLimiter(YT_DLP_HOST_MIN_INTERVAL)
+
+def _run_yt_dlp(command: List[str], target_url: str, operation: str = "subtitles", **kwargs) -> subprocess.CompletedProcess:
+    """
+    Runs a yt-dlp command, respecting the per-host rate limit for `target_url`.
+    The run (not the rate-limit wait) is timed in YT_DLP_SECONDS under `operation`.
+    """
+    _host_rate_limiter.min_interval = YT_DLP_HOST_MIN_INTERVAL
+    _host_rate_limiter.wait(target_url)
+    with YT_DLP_IN_FLIGHT.track_inprogress(), YT_DLP_SECONDS.time(operation=operation):
+        return subprocess.run(command, **kwargs)
+
+@DB_SECONDS.timed(operation="load_cached_playlist")
+def load_cached_playlist(playlist_url: str) -> Optional[Tuple[List[Dict[str, str]], float]]:
+    """Returns (videos, fetched_at) from the persistent playlist cache, or None if not cached."""
+    try:
+        row = get_db_connection().execute("SELECT videos_json, fetched_at FROM playlist_cache WHERE playlist_url = ?",
+                                          (playlist_url,)).fetchone()
+    except sqlite3.Error as e:
+        logging.error(f"Error reading playlist cache for '{playlist_url}': {e}")
+        return None
+    return (json.loads(row[0]), row[1]) if row else None
+
+@DB_SECONDS.timed(operation="save_cached_playlist")
+def save_cached_playlist(playlist_url: str, videos: List[Dict[str, str]]):
+    conn = get_db_connection()
+    try:
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO playlist_cache (playlist_url, videos_json, fetched_at) VALUES (?, ?, ?)",
+                         (playlist_url, json.dumps(videos), time.time()))
+    except sqlite3.Error as e:
+        logging.error(f"Error saving playlist cache for '{playlist_url}': {e}")
+
+def invalidate_playlist_cache(playlist_url: Optional[str] = None):
+    """
+    Drops one playlist (or, without playlist_url, only the in-process listings) from the caches of
+    every process, forcing a yt-dlp refetch of that playlist.
+    """
+    global _playlist_cache_generation
+    if playlist_url:
+        _playlist_cache.pop(playlist_url, None)
+    else:
+        _playlist_cache.clear()
+    try:
+        if playlist_url:
+            conn = get_db_connection()
+            with conn:
+                conn.execute("DELETE FROM playlist_cache WHERE playlist_url = ?", (playlist_url,))
+        _playlist_cache_generation = bump_generation(PLAYLISTS_GENERATION)
+    except sqlite3.Error as e:
+        logging.error(f"Error invalidating playlist cache for '{playlist_url}': {e}")
+
+def _sync_playlist_cache():
+    """Clears _playlist_cache if another process invalidated playlists since it was filled."""
+    global _playlist_cache_generation
+    generation = get_generation(PLAYLISTS_GENERATION)
+    if generation != _playlist_cache_generation:
+        _playlist_cache.clear()
+        _playlist_cache_generation = generation
+
+def get_playlist_videos_yt_dlp(playlist_url: str, force_refresh: bool = False) -> Optional[List[Dict[str, str]]]:
+    """
+    Returns the flat video listing of a playlist. Served from the in-process cache, then the
+    persistent playlist_cache table while younger than PLAYLIST_CACHE_TTL, and only then from yt-dlp.
+    If the yt-dlp refresh fails, a stale cached listing is returned rather than nothing.
+    Fetches of one playlist are serialized across processes: a caller that waited for another
+    process's fetch uses its result instead of running yt-dlp again.
+    """
     global _playlist_cache
-    if playlist_url in _playlist_cache:
+    _sync_playlist_cache()
+    if playlist_url in _playlist_cache and not force_refresh:
+        PLAYLIST_CACHE_LOOKUPS.inc(result="memory_hit")
         return _playlist_cache[playlist_url]
 
     if not playlist_url or "youtube.com/playlist?list=" not in playlist_url:
         logging.warning(f"Invalid or non-YouTube playlist URL: {playlist_url}")
         return None
+
+    cached = load_cached_playlist(playlist_url)
+    if cached and not force_refresh and time.time() - cached[1] < PLAYLIST_CACHE_TTL:
+        PLAYLIST_CACHE_LOOKUPS.inc(result="db_hit")
+        _playlist_cache[playlist_url] = cached[0]
+        return cached[0]
+
+    requested_at = time.time()
+    lock = ProcessLock("playlist-" + hashlib.sha1(playlist_url.encode()).hexdigest()[:16])
+    locked = lock.acquire(timeout=PLAYLIST_FETCH_LOCK_TIMEOUT)
+    if not locked:
+        logging.warning(f"Another process has been fetching playlist '{playlist_url}' for over "
+                        f"{PLAYLIST_FETCH_LOCK_TIMEOUT}s, fetching it here too.")
+    try:
+        if locked:
+            latest = load_cached_playlist(playlist_url)
+            if latest and (latest[1] >= requested_at or
+                           (not force_refresh and time.time() - latest[1] < PLAYLIST_CACHE_TTL)):
+                PLAYLIST_CACHE_LOOKUPS.inc(result="shared_fetch") # Fetched by someone else while we waited
+                _playlist_cache[playlist_url] = latest[0]
+                return latest[0]
+            cached = latest or cached
+        videos = _fetch_playlist_videos(playlist_url)
+        if videos is not None:
+            save_cached_playlist(playlist_url, videos)
+    finally:
+        if locked:
+            lock.release()
+    if videos is not None:
+        PLAYLIST_CACHE_LOOKUPS.inc(result="miss")
+    elif cached:
+        PLAYLIST_CACHE_LOOKUPS.inc(result="stale")
+        logging.warning(f"Refreshing playlist '{playlist_url}' failed, using cached listing from {time.ctime(cached[1])}.")
+        videos = cached[0]
+    else:
+        PLAYLIST_CACHE_LOOKUPS.inc(result="error")
+        return None
+    _playlist_cache[playlist_url] = videos
+    return videos
+
+def _fetch_playlist_videos(playlist_url: str) -> Optional[List[Dict[str, str]]]:
     try:
         command = [YT_DLP_PATH, "--cookies-from-browser","firefox","-j", "--flat-playlist", playlist_url]
-        process = subprocess.run(command, capture_output=True, text=True, check=True, encoding='utf-8')
+        process = _run_yt_dlp(command, playlist_url, operation="playlist", capture_output=True, text=True, check=True, encoding='utf-8')
         videos = []
         for line in process.stdout.strip().split('\n'):
             if line:
@@ -100,7 +1197,6 @@ def get_playlist_videos_yt_dlp(playlist_url: str) -> Optional[List[Dict[str, str
                     'title': video_info.get('title', 'N/A'),
                     'url': video_info.get('url', video_info.get('webpage_url'))
                 })
-        _playlist_cache[playlist_url] = videos
         return videos
     except subprocess.CalledProcessError as e:
         logging.error(f"Error fetching playlist '{playlist_url}': {e.stderr}")
@@ -112,88 +1208,184 @@ def get_playlist_videos_yt_dlp(playlist_url: str) -> Optional[List[Dict[str, str
         logging.error(f"An unexpected error occurred with yt-dlp for playlist '{playlist_url}': {e}")
         return None
 
-# In lecture_manager_core.py
-def clean_vtt_content(vtt_string: str) -> str:
+# --- VTT Cleaning ---
+_VTT_TIMESTAMP_RE = re.compile(r'^(\d{2}:\d{2}:\d{2}\.\d{3})\s*-->\s*(\d{2}:\d{2}:\d{2}\.\d{3})')
+_VTT_TAG_RE = re.compile(r'<[^>]+>')
+ROLLING_OVERLAP_MIN_WORDS = 2 # Shorter prefix/suffix overlaps are kept, they're usually genuine repeats
+
+def _parse_vtt_timestamp(timestamp: str) -> int:
+    """'HH:MM:SS.mmm' -> milliseconds. The format is fixed-width, as enforced by _VTT_TIMESTAMP_RE."""
+    return int(timestamp[0:2]) * 3600000 + int(timestamp[3:5]) * 60000 + int(timestamp[6:8]) * 1000 + int(timestamp[9:12])
+
+_VTT_ZERO_TIMESTAMP = "00:00:00.000"
+
+def _iter_vtt_cues(lines: Iterable[str]) -> Iterator[Tuple[str, str, str]]:
     """
-    Cleans VTT subtitle content to extract only the spoken text.
-    Removes WEBVTT header, timestamps, cue settings, notes, and extra blank lines.
-    Joins multi-line cues into single lines of text.
+    Yields (start, end, text) for each cue, its lines joined with spaces, with tags and cue
+    settings removed. Timings stay 'HH:MM:SS.mmm' strings (fixed width, so they compare
+    correctly as strings); text before the first timestamp line gets 00:00:00.000.
     """
-    if not vtt_string:
-        return ""
-
-    lines = vtt_string.splitlines()
-    cleaned_lines = []
     current_cue_text = []
-
+    start_ts = end_ts = _VTT_ZERO_TIMESTAMP
     for line in lines:
         line = line.strip()
 
         # Skip WEBVTT header, empty lines, NOTE comments, and lines that look like timestamps
-        if not line or \
-           line.lower() == "webvtt" or \
-           line.lower().startswith("note") or \
-           re.match(r'^\d{2}:\d{2}:\d{2}\.\d{3}\s*-->\s*\d{2}:\d{2}:\d{2}\.\d{3}', line):
+        lowered = line.lower()
+        timestamp_match = _VTT_TIMESTAMP_RE.match(line) if line else None
+        if not line or lowered == "webvtt" or lowered.startswith("note") or timestamp_match:
             # If we were accumulating text for a cue and hit a timestamp or empty line,
             # it means the previous cue's text is complete.
             if current_cue_text:
-                cleaned_lines.append(" ".join(current_cue_text))
+                yield start_ts, end_ts, " ".join(current_cue_text)
                 current_cue_text = []
+            if timestamp_match:
+                start_ts, end_ts = timestamp_match.groups()
             continue
 
         # Skip lines that are purely cue settings (like align:start position:0%)
         # This is a simple check; more complex VTT styling might need more robust parsing.
         if "-->" not in line and (":" in line and "%" in line or line.startswith("<c>") or line.startswith("</c>")):
-             # if current_cue_text: # If there was text before styling, add it
-             #    cleaned_lines.append(" ".join(current_cue_text))
-             #    current_cue_text = []
             continue # Skip styling lines often found after timestamps
 
         # If it's not a timestamp, header, or comment, assume it's subtitle text.
         # Remove common HTML-like tags often found in subtitles (<b>, <i>, <u>, <c.color>)
-        line = re.sub(r'<[^>]+>', '', line)
-        current_cue_text.append(line)
+        current_cue_text.append(_VTT_TAG_RE.sub('', line) if '<' in line else line)
 
     # Add any remaining text from the last cue
     if current_cue_text:
-        cleaned_lines.append(" ".join(current_cue_text))
-    cleaned_lines_final = []
+        yield start_ts, end_ts, " ".join(current_cue_text)
 
-    for i in range(len(cleaned_lines)-1):
-        # Remove any leading/trailing whitespace and filter out empty lines
-        line = cleaned_lines[i].strip()
-        line = line.strip()
-        if line:
-            if line in cleaned_lines[i+1]:
-                # If the current line is a substring of the next line, skip it
-                continue
-            cleaned_lines_final.append(line)
-        
-    # Join all cue texts with a space, and remove any leading/trailing whitespace from the final string.
-    # Also filter out any "empty" lines that might have resulted from cues with only tags.
-    return "\n".join(filter(None, cleaned_lines_final)).strip()
+def _rolling_overlap(previous_words: List[str], next_words: List[str]) -> int:
+    """
+    Length (in words) of the longest prefix of `next_words` that is also a suffix of
+    `previous_words`, computed with the KMP prefix function in O(len(previous) + len(next)).
+    """
+    if not previous_words or not next_words:
+        return 0
+    sequence = next_words + [None] + previous_words[-len(next_words):] # None never equals a word
+    prefix = [0] * len(sequence)
+    for i in range(1, len(sequence)):
+        k = prefix[i - 1]
+        while k and sequence[i] != sequence[k]:
+            k = prefix[k - 1]
+        if sequence[i] == sequence[k]:
+            k += 1
+        prefix[i] = k
+    return prefix[-1]
+
+def _iter_clean_vtt(lines: Iterable[str], trim_overlap: bool) -> Iterator[Tuple[str, str, str]]:
+    """
+    Streaming VTT cleaner: consumes raw VTT lines (a list, a file object, ...) and yields
+    (start, end, text) per kept cue, holding only the previous cue in memory.
+    A cue whose text is contained in the next cue is dropped, as auto-generated captions
+    repeat the growing line; the next cue then inherits its start time. With `trim_overlap`,
+    words a line repeats from the end of the previously yielded line (rolling captions)
+    are trimmed from its start.
+    """
+    pending = None # Previous cue, yielded once we know the next cue doesn't contain it
+    previous_words = []
+
+    def emit(text: str) -> Optional[str]:
+        nonlocal previous_words
+        words = text.split()
+        if trim_overlap:
+            overlap = _rolling_overlap(previous_words, words)
+            if overlap >= ROLLING_OVERLAP_MIN_WORDS or (overlap and overlap == len(words)):
+                words = words[overlap:]
+                text = " ".join(words)
+        if not words:
+            return None
+        previous_words = words
+        return text
+
+    for start_ts, end_ts, cue in _iter_vtt_cues(lines):
+        if pending is not None:
+            pending_start, pending_end, text = pending
+            text = text.strip()
+            # If the previous cue is a substring of this one, skip it
+            if not text:
+                pass
+            elif text in cue:
+                start_ts = min(start_ts, pending_start)
+            else:
+                text = emit(text)
+                if text:
+                    yield pending_start, pending_end, text
+        pending = (start_ts, end_ts, cue)
+
+    if pending is not None: # The last cue has no successor that could contain it
+        pending_start, pending_end, text = pending
+        text = emit(text.strip()) if text.strip() else None
+        if text:
+            yield pending_start, pending_end, text
+
+def iter_clean_vtt_cues(lines: Iterable[str], trim_overlap: bool = True) -> Iterator[Tuple[int, int, str]]:
+    """Cleans VTT lines as described in _iter_clean_vtt, yielding (start_ms, end_ms, text) per kept cue."""
+    for start_ts, end_ts, text in _iter_clean_vtt(lines, trim_overlap):
+        yield _parse_vtt_timestamp(start_ts), _parse_vtt_timestamp(end_ts), text
+
+def iter_clean_vtt_lines(lines: Iterable[str], trim_overlap: bool = True) -> Iterator[str]:
+    """Cleans VTT lines as described in _iter_clean_vtt, yielding only the text of each kept cue."""
+    for _, _, text in _iter_clean_vtt(lines, trim_overlap):
+        yield text
+
+def clean_vtt_content(vtt_string: str, trim_overlap: bool = True) -> str:
+    """
+    Cleans VTT subtitle content to extract only the spoken text.
+    Removes WEBVTT header, timestamps, cue settings, notes, and extra blank lines.
+    Joins multi-line cues into single lines of text. See iter_clean_vtt_lines.
+    """
+    if not vtt_string:
+        return ""
+    return "\n".join(iter_clean_vtt_lines(vtt_string.splitlines(), trim_overlap=trim_overlap))
+
+def _pick_subtitle_file(temp_dir: str, video_id: str, langs_priority: List[str]) -> Optional[str]:
+    """Returns the path of the best downloaded .vtt for `video_id`, honouring the language priority."""
+    for lang in langs_priority:
+        candidate = os.path.join(temp_dir, f"{video_id}.{lang}.vtt")
+        if os.path.exists(candidate):
+            return candidate
+    return None
 
-def download_subtitles_yt_dlp(video_url: str) -> Optional[str]:
+@SUBTITLE_DOWNLOADS_IN_FLIGHT.track_inprogress(mode="single")
+def download_subtitles_yt_dlp(video_url: str, single_call: Optional[bool] = None,
+                              reasons: Optional[Dict[str, str]] = None) -> Optional[str]:
+    """
+    Downloads the raw VTT subtitles for a video, or None if none are available.
+    With `single_call` (default: SUBTITLE_SINGLE_CALL) all preferred languages are requested
+    in one yt-dlp run and the best file is picked by priority; otherwise one run per language.
+    When None is returned and `reasons` is given, reasons[video_url] says why (see _explain_missing_subtitles).
+    """
     if not video_url or not ("youtube.com/watch?v=" in video_url or "youtu.be/" in video_url):
         logging.warning(f"Invalid video URL for subtitle download: {video_url}")
+        if reasons is not None:
+            reasons[video_url] = "invalid video URL"
         return None
 
+    if single_call is None:
+        single_call = SUBTITLE_SINGLE_CALL
+
     try:
-        langs_priority = ['en', 'en-US', 'en-GB']
+        langs_priority = SUBTITLE_LANGS_PRIORITY
+        # Each attempt is one yt-dlp run asking for the listed languages.
+        attempts = [langs_priority] if single_call else [[lang] for lang in langs_priority]
         sub_content = None
+        reason = INGESTION_NO_SUBTITLES
 
         # Create a temporary directory to download subtitles into.
         # This helps avoid filename clashes and makes cleanup easier.
         with tempfile.TemporaryDirectory(prefix="yt_subs_") as temp_dir:
             logging.info(f"Created temporary directory for subtitles: {temp_dir}")
 
-            for lang in langs_priority:
+            for langs in attempts:
                 # Define a specific output filename template for the subtitle within the temp directory
                 # This template ensures a predictable filename based on video ID and language.
                 # Example: If video_url is "https://www.youtube.com/watch?v=VIDEO_ID",
                 # filename will be "VIDEO_ID.en.vtt"
-                video_id = video_url.split('v=')[-1].split('&')[0] # Basic way to get video ID
+                video_id = _video_id_from_url(video_url)
                 output_template = os.path.join(temp_dir, f"{video_id}.%(ext)s")
+                sub_langs = ",".join(langs)
 
                 # Command to download subtitles
                 command = [
@@ -202,48 +1394,166 @@ def download_subtitles_yt_dlp(video_url: str) -> Optional[str]:
                     '--write-sub',
                     '--write-auto-sub',
                     '--sub-format', 'vtt',
-                    '--sub-lang', lang,
+                    '--sub-lang', sub_langs,
                     '--skip-download',
                     '-o', output_template, # Use -o for output template
                     video_url
                 ]
 
-                logging.info(f"Attempting subtitle download for {video_url} (lang: {lang}) "
+                logging.info(f"Attempting subtitle download for {video_url} (lang: {sub_langs}) "
                              f"into {temp_dir} with command: {' '.join(command)}")
 
-                process = subprocess.run(command, capture_output=True, text=True, check=False, encoding='utf-8')
+                process = _run_yt_dlp(command, video_url, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, # One stream, in order
+                                      text=True, check=False, encoding='utf-8')
 
-                # After running the command, check if the VTT file exists based on our template.
+                # After running the command, check which VTT files exist based on our template.
                 # Since we specified --sub-format vtt, the extension should be .vtt
-                
-                expected_sub_filepath = os.path.join(temp_dir, f"{video_id}.{lang}.vtt")
+                sub_filepath = _pick_subtitle_file(temp_dir, video_id, langs)
 
-                if os.path.exists(expected_sub_filepath):
-                    logging.info(f"Subtitle file found: {expected_sub_filepath}")
-                    with open(expected_sub_filepath, 'r', encoding='utf-8') as f:
+                if sub_filepath:
+                    logging.info(f"Subtitle file found: {sub_filepath}")
+                    with open(sub_filepath, 'r', encoding='utf-8') as f:
                         sub_content = f.read()
                     # No need to explicitly os.remove, TemporaryDirectory handles cleanup
                     break # Subtitles found, exit loop
                 else:
-                    logging.warning(f"Subtitle file {expected_sub_filepath} not found after yt-dlp command for lang {lang}. "
-                                    f"RC: {process.returncode}, stdout: '{process.stdout.strip()}', stderr: '{process.stderr.strip()}'")
+                    logging.warning(f"No subtitle file for {video_id} after yt-dlp command for lang {sub_langs}. "
+                                    f"RC: {process.returncode}, output: '{process.stdout.strip()}'")
+                    attempt_reason = _explain_missing_subtitles(process, [video_url])[video_url]
+                    if attempt_reason != INGESTION_NO_SUBTITLES:
+                        reason = attempt_reason # One failed run means the other languages may exist after all
             
             if sub_content:
                 logging.info(f"Successfully downloaded and processed subtitles for {video_url}")
                 return sub_content
             else:
                 logging.warning(f"No subtitles found or downloaded for {video_url} after trying languages: {langs_priority}.")
+                if reasons is not None:
+                    reasons[video_url] = reason
                 return None
 
     except Exception as e:
         logging.error(f"An unexpected error occurred during subtitle download for {video_url}: {e}", exc_info=True)
+        if reasons is not None:
+            reasons[video_url] = f"{type(e).__name__}: {e}"
         return None
 
+_YT_DLP_VIDEO_LINE_RE = re.compile(r"\[[\w:-]+\] ([\w-]+): ") # "[youtube] VIDEO_ID: ..." names the video being processed
+_YT_DLP_NO_SUBTITLES = "There are no subtitles"
+_YT_DLP_SUBTITLE_FETCH_FAILED = "Unable to download video subtitles" # A warning, e.g. on HTTP 429, and the run exits 0
+
+def _explain_missing_subtitles(process: Optional[subprocess.CompletedProcess], video_urls: Iterable[str]) -> Dict[str, str]:
+    """
+    For videos a yt-dlp run produced no subtitle file for, tells "has no subtitles" (INGESTION_NO_SUBTITLES)
+    apart from a failure worth retrying (the message). Reads the run's combined output in order, where
+    lines like "[youtube] VIDEO_ID: ..." say which video the following lines are about. Only yt-dlp
+    saying "There are no subtitles" counts as having none. "ERROR:" lines, "Unable to download video
+    subtitles" warnings, and silence about a video are all failures.
+    """
+    problems: Dict[Optional[str], str] = {} # Video ID (None before any video was named) -> first problem line
+    no_subtitles = set()
+    last_problem, current = None, None
+    for line in (process.stdout or "").splitlines() if process is not None else []:
+        line = line.strip()
+        match = _YT_DLP_VIDEO_LINE_RE.search(line)
+        if match:
+            current = match.group(1)
+        if _YT_DLP_NO_SUBTITLES in line:
+            no_subtitles.add(current)
+        elif line.startswith("ERROR:") or _YT_DLP_SUBTITLE_FETCH_FAILED in line:
+            problems.setdefault(current, line)
+            last_problem = line
+    reasons = {}
+    for url in video_urls:
+        video_id = _video_id_from_url(url)
+        if video_id in problems:
+            reasons[url] = problems[video_id]
+        elif video_id in no_subtitles:
+            reasons[url] = INGESTION_NO_SUBTITLES
+        elif process is None:
+            reasons[url] = "yt-dlp did not run"
+        elif process.returncode != 0:
+            reasons[url] = last_problem or f"yt-dlp exited with code {process.returncode}"
+        else:
+            reasons[url] = last_problem or "yt-dlp wrote no subtitle file and did not say why"
+    return reasons
+
+def _video_id_from_url(video_url: str) -> str:
+    """Extracts the YouTube video ID, which yt-dlp uses for %(id)s in output templates."""
+    if "youtu.be/" in video_url:
+        return video_url.split("youtu.be/")[-1].split('?')[0].split('&')[0]
+    return video_url.split('v=')[-1].split('&')[0]
+
+@SUBTITLE_DOWNLOADS_IN_FLIGHT.track_inprogress(mode="batch")
+def download_subtitles_batch_yt_dlp(video_urls: List[str], reasons: Optional[Dict[str, str]] = None) -> Dict[str, Optional[str]]:
+    """
+    Downloads subtitles for many videos with a single yt-dlp process, so interpreter startup,
+    extractor import and cookie decryption are paid once per batch instead of once per video.
+    Returns a dict mapping every requested URL to its raw VTT, or None if it produced no file.
+    If `reasons` is given, it receives why for every URL mapped to None (see _explain_missing_subtitles).
+    """
+    results: Dict[str, Optional[str]] = {url: None for url in video_urls}
+    valid_urls = [url for url in results
+                  if url and ("youtube.com/watch?v=" in url or "youtu.be/" in url)]
+    for url in results.keys() - set(valid_urls):
+        logging.warning(f"Invalid video URL for subtitle download: {url}")
+        if reasons is not None:
+            reasons[url] = "invalid video URL"
+    if not valid_urls:
+        return results
+
+    try:
+        with tempfile.TemporaryDirectory(prefix="yt_subs_batch_") as temp_dir:
+            batch_file = os.path.join(temp_dir, "batch.txt")
+            with open(batch_file, 'w', encoding='utf-8') as f:
+                f.write("\n".join(valid_urls) + "\n")
+
+            command = [
+                YT_DLP_PATH,
+                "--cookies-from-browser","firefox",
+                '--ignore-errors', # Keep going when a single video fails
+                '--write-sub',
+                '--write-auto-sub',
+                '--sub-format', 'vtt',
+                '--sub-lang', ",".join(SUBTITLE_LANGS_PRIORITY),
+                '--skip-download',
+                '-o', os.path.join(temp_dir, "%(id)s.%(ext)s"),
+                '--batch-file', batch_file
+            ]
+            logging.info(f"Attempting batched subtitle download for {len(valid_urls)} videos into {temp_dir}")
+            process = _run_yt_dlp(command, valid_urls[0], operation="subtitles_batch", stdout=subprocess.PIPE,
+                                  stderr=subprocess.STDOUT, text=True, check=False, encoding='utf-8') # One stream, in order
+
+            for url in valid_urls:
+                sub_filepath = _pick_subtitle_file(temp_dir, _video_id_from_url(url), SUBTITLE_LANGS_PRIORITY)
+                if sub_filepath:
+                    with open(sub_filepath, 'r', encoding='utf-8') as f:
+                        results[url] = f.read()
+                else:
+                    logging.warning(f"No subtitle file for {url} in batched yt-dlp run.")
+
+            if not any(results.values()):
+                logging.warning(f"Batched yt-dlp run produced no subtitles. RC: {process.returncode}, "
+                                f"output: '{process.stdout.strip()[-2000:]}'")
+            if reasons is not None:
+                reasons.update(_explain_missing_subtitles(process, [url for url in valid_urls if not results[url]]))
+    except Exception as e:
+        logging.error(f"An unexpected error occurred during batched subtitle download: {e}", exc_info=True)
+        if reasons is not None:
+            reasons.update((url, f"{type(e).__name__}: {e}") for url in valid_urls if not results[url])
+
+    return results
+
 # --- Core Logic Functions ---
-def load_and_prepare_data() -> Optional[pd.DataFrame]:
+def is_youtube_playlist_url(url) -> bool:
+    return "youtube.com/playlist?list=" in str(url)
+
+def load_and_prepare_data(csv_source=None) -> Optional[pd.DataFrame]:
+    """Parses the lectures CSV (CSV_FILE, or an already-read file object passed as csv_source)."""
+    import pandas as pd
     try:
         # Load CSV file
-        df = pd.read_csv(CSV_FILE)
+        df = pd.read_csv(csv_source if csv_source is not None else CSV_FILE)
         df.columns = [col.strip().lower().replace(' ', '_').replace('.', '') for col in df.columns]
         for col in ['current', 'total']:
             df[col] = pd.to_numeric(df[col], errors='coerce')
@@ -259,9 +1569,7 @@ def load_and_prepare_data() -> Optional[pd.DataFrame]:
             logging.error("Could not identify the lecture link/URL column. Expected 'playlist_url' or 'current_lecture_link'.")
             return None
 
-        df['is_youtube_playlist'] = df['playlist_url'].astype(str).apply(
-            lambda x: "youtube.com/playlist?list=" in x
-        )
+        df['is_youtube_playlist'] = df['playlist_url'].astype(str).apply(is_youtube_playlist_url)
         return df
     except FileNotFoundError:
         logging.error(f"CSV file '{CSV_FILE}' not found.")
@@ -270,21 +1578,338 @@ def load_and_prepare_data() -> Optional[pd.DataFrame]:
         logging.error(f"Error loading or processing CSV: {e}")
         return None
 
-def select_random_lecture_to_watch(df: pd.DataFrame) -> Optional[Dict]:
-    eligible_series = df[
-        df['is_youtube_playlist'] &
-        (df['current'].notna()) &
-        (df['total'].notna()) &
-        (df['current'] < df['total'])
-    ].copy()
+_csv_state = {"mtime_ns": None, "sha1": None} # Fingerprint of the CSV that produced the loaded DataFrame
+_csv_reload_lock = threading.Lock() # Web reloads and the background CSV sync may reload at the same time
+
+def _series_snapshot(df: pd.DataFrame) -> Dict[str, Tuple[str, tuple]]:
+    """Maps each series to (playlist_url, all its CSV values) for diffing two loads."""
+    records = df.drop(columns=['is_youtube_playlist'], errors='ignore').astype(str).to_dict('records')
+    return {record['lecture_series']: (record['playlist_url'], tuple(sorted(record.items()))) for record in records}
+
+def reload_lecture_data(current_df: Optional[pd.DataFrame], invalidate: bool = True) -> Tuple[Optional[pd.DataFrame], Optional[Dict]]:
+    """
+    Reloads CSV_FILE incrementally.
+    If the file's mtime and content hash match the loaded version, it isn't parsed again and current_df is returned.
+    Otherwise the new rows are diffed against current_df by series, and only playlists that changed
+    or were removed are dropped from the playlist cache. Pass invalidate=False when another process
+    already did that for this reload.
+    Returns (df, report) with report = {"unchanged": bool, "added": [...], "removed": [...], "changed": [...]}
+    listing series titles, or (None, None) if the CSV could not be loaded.
+    """
+    with _csv_reload_lock:
+        return _reload_lecture_data(current_df, invalidate)
+
+def _reload_lecture_data(current_df: Optional[pd.DataFrame], invalidate: bool) -> Tuple[Optional[pd.DataFrame], Optional[Dict]]:
+    try:
+        mtime_ns = os.stat(CSV_FILE).st_mtime_ns
+        if current_df is not None and mtime_ns == _csv_state["mtime_ns"]:
+            return current_df, {"unchanged": True, "added": [], "removed": [], "changed": []}
+        with open(CSV_FILE, 'rb') as f:
+            data = f.read()
+    except OSError as e:
+        logging.error(f"CSV file '{CSV_FILE}' could not be read: {e}")
+        return None, None
+    sha1 = hashlib.sha1(data).hexdigest()
+    if current_df is not None and sha1 == _csv_state["sha1"]:
+        _csv_state["mtime_ns"] = mtime_ns # Touched but not edited
+        return current_df, {"unchanged": True, "added": [], "removed": [], "changed": []}
+
+    df = load_and_prepare_data(io.BytesIO(data))
+    if df is None:
+        return None, None
+    _csv_state.update(mtime_ns=mtime_ns, sha1=sha1)
+    if current_df is None or 'lecture_series' not in df.columns or 'lecture_series' not in current_df.columns:
+        if invalidate:
+            invalidate_playlist_cache() # Nothing reliable to diff against
+        titles = sorted(map(str, df['lecture_series'])) if 'lecture_series' in df.columns else []
+        return df, {"unchanged": False, "added": titles, "removed": [], "changed": []}
+
+    old, new = _series_snapshot(current_df), _series_snapshot(df)
+    report = {
+        "unchanged": False,
+        "added": sorted(new.keys() - old.keys()),
+        "removed": sorted(old.keys() - new.keys()),
+        "changed": sorted(title for title in old.keys() & new.keys() if old[title] != new[title]),
+    }
+    stale_playlists = {old[title][0] for title in report["removed"]}
+    stale_playlists.update(old[title][0] for title in report["changed"] if old[title][0] != new[title][0])
+    stale_playlists.difference_update(playlist_url for playlist_url, _ in new.values()) # Still used by another series
+    if not invalidate:
+        stale_playlists.clear()
+    for playlist_url in stale_playlists:
+        invalidate_playlist_cache(playlist_url)
+    logging.info(f"Reloaded {CSV_FILE}: {len(report['added'])} added, {len(report['removed'])} removed, "
+                 f"{len(report['changed'])} changed, {len(stale_playlists)} playlist cache entries invalidated.")
+    return df, report
+
+class SeriesRecord:
+    """One lecture series (CSV row) with 'Current'/'Total' as ints, or None when blank."""
+    __slots__ = ("title", "playlist_url", "current", "total", "is_youtube_playlist")
+
+    def __init__(self, title: str, playlist_url: str, current: Optional[int], total: Optional[int], is_youtube_playlist: bool):
+        self.title = title
+        self.playlist_url = playlist_url
+        self.current = current
+        self.total = total
+        self.is_youtube_playlist = is_youtube_playlist
+
+    @property
+    def next_video_index(self) -> Optional[int]:
+        """0-based playlist index of the next unwatched video, or None if the series is finished or has no counts."""
+        if self.current is None or self.total is None or self.current >= self.total:
+            return None
+        return self.current
+
+class LectureIndex:
+    """
+    Read-only view of the loaded lectures for the request path, built once per CSV load.
+    Series eligible for each action are precomputed, so selection is a random.choice and
+    lookups by title are a dict access; no pandas needed after construction.
+    """
+    __slots__ = ("series", "by_title", "youtube", "watch_eligible", "review_eligible", "bulk_eligible")
+
+    def __init__(self, series: List[SeriesRecord]):
+        self.series = series
+        self.by_title = {record.title: record for record in series}
+        self.youtube = [record for record in series if record.is_youtube_playlist and record.current is not None]
+        self.watch_eligible = [record for record in self.youtube if record.next_video_index is not None]
+        self.review_eligible = [record for record in self.youtube if record.current > 1]
+        self.bulk_eligible = [record for record in self.youtube if record.current > 0]
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame) -> "LectureIndex":
+        def as_int(value) -> Optional[int]:
+            return None if value != value else int(value) # NaN != NaN marks a blank cell
+
+        columns = ['lecture_series', 'playlist_url', 'current', 'total', 'is_youtube_playlist']
+        return cls([SeriesRecord(str(title), playlist_url, as_int(current), as_int(total), bool(is_youtube))
+                    for title, playlist_url, current, total, is_youtube in df[columns].itertuples(index=False, name=None)])
+
+    def __len__(self) -> int:
+        return len(self.series)
+
+    def get(self, series_title: str) -> Optional[SeriesRecord]:
+        return self.by_title.get(series_title)
+
+# --- Users and Libraries ---
+# Each user's library lives in user_library (series, playlist URL, progress); playlists, subtitles and
+# ingestion state are shared, so a video is fetched once however many users follow its playlist.
+# The CSV is DEFAULT_USER's library. source_current remembers the 'Current' last read from the CSV:
+# progress recorded in the app is kept until that cell is edited in the CSV.
+# Every write bumps users.library_version, which is how other processes notice their cached copy is stale.
+_user_lectures_cache: "OrderedDict[int, Tuple[int, LectureIndex]]" = OrderedDict() # user_id -> (library_version, index)
+_user_lectures_lock = threading.Lock()
+
+_USER_LIBRARY_UPSERT_SQL = """
+INSERT INTO user_library (user_id, series_title, playlist_url, current, total, source_current, updated_at)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(user_id, series_title) DO UPDATE SET
+    playlist_url = excluded.playlist_url,
+    total = excluded.total,
+    current = CASE WHEN excluded.source_current IS source_current THEN current ELSE excluded.current END,
+    source_current = excluded.source_current,
+    updated_at = excluded.updated_at
+"""
+
+@DB_SECONDS.timed(operation="get_or_create_user")
+def get_or_create_user(name: str) -> int:
+    """Returns the id of the user called name, creating the user on first use."""
+    conn = get_db_connection()
+    row = conn.execute("SELECT id FROM users WHERE name = ?", (name,)).fetchone()
+    if row is not None:
+        return row[0]
+    with conn:
+        conn.execute("INSERT OR IGNORE INTO users (name, created_at) VALUES (?, ?)", (name, time.time()))
+    return conn.execute("SELECT id FROM users WHERE name = ?", (name,)).fetchone()[0]
+
+@DB_SECONDS.timed(operation="save_user_library")
+def save_user_library(user_id: int, lectures: LectureIndex) -> Dict[str, int]:
+    """
+    Makes `lectures` (e.g. a parsed CSV) user_id's library: series are added or updated and series
+    missing from `lectures` are removed. Returns {"saved": n, "removed": n}.
+    """
+    now = time.time()
+    rows = [(user_id, record.title, record.playlist_url, record.current, record.total, record.current, now)
+            for record in lectures.series]
+    conn = get_db_connection()
+    existing = {row[0] for row in conn.execute("SELECT series_title FROM user_library WHERE user_id = ?", (user_id,))}
+    removed = existing - lectures.by_title.keys()
+    with conn:
+        conn.executemany(_USER_LIBRARY_UPSERT_SQL, rows)
+        conn.executemany("DELETE FROM user_library WHERE user_id = ? AND series_title = ?",
+                         [(user_id, title) for title in removed])
+        conn.execute("UPDATE users SET library_version = library_version + 1 WHERE id = ?", (user_id,))
+    invalidate_user_lectures(user_id)
+    return {"saved": len(rows), "removed": len(removed)}
+
+def get_user_lectures(user_id: int) -> LectureIndex:
+    """
+    user_id's library as a LectureIndex. The parsed index is cached per process and reused while
+    the user's library_version is unchanged, so writes made by any process are picked up.
+    """
+    version = _get_library_version(user_id)
+    with _user_lectures_lock:
+        cached = _user_lectures_cache.get(user_id)
+        if cached is not None and cached[0] == version:
+            _user_lectures_cache.move_to_end(user_id)
+            return cached[1]
+    lectures = _load_user_lectures(user_id) # A write racing this load only costs a reload next time
+    with _user_lectures_lock:
+        _user_lectures_cache[user_id] = (version, lectures)
+        _user_lectures_cache.move_to_end(user_id)
+        while len(_user_lectures_cache) > USER_LIBRARY_CACHE_SIZE:
+            _user_lectures_cache.popitem(last=False)
+    return lectures
+
+def _get_library_version(user_id: int) -> int:
+    row = get_db_connection().execute("SELECT library_version FROM users WHERE id = ?", (user_id,)).fetchone()
+    return row[0] if row else 0
+
+@DB_SECONDS.timed(operation="load_user_lectures")
+def _load_user_lectures(user_id: int) -> LectureIndex:
+    rows = get_db_connection().execute("""
+    SELECT series_title, playlist_url, current, total FROM user_library WHERE user_id = ? ORDER BY rowid
+    """, (user_id,))
+    return LectureIndex([SeriesRecord(title, playlist_url, current, total, is_youtube_playlist_url(playlist_url))
+                         for title, playlist_url, current, total in rows])
+
+def invalidate_user_lectures(user_id: Optional[int] = None):
+    """Drops this process's cached LectureIndex of user_id, or of every user."""
+    with _user_lectures_lock:
+        if user_id is None:
+            _user_lectures_cache.clear()
+        else:
+            _user_lectures_cache.pop(user_id, None)
+
+@DB_SECONDS.timed(operation="advance_series_progress")
+def advance_series_progress(user_id: int, series_title: str, watched: int) -> Optional[SeriesRecord]:
+    """
+    Records that user_id has watched the first `watched` videos of a series. Progress only moves
+    forward and stops at 'Total'. Returns the updated series, or None if it isn't in the library.
+    """
+    conn = get_db_connection()
+    with conn:
+        cursor = conn.execute("""
+        UPDATE user_library SET current = MIN(MAX(COALESCE(current, 0), ?), COALESCE(total, ?)), updated_at = ?
+        WHERE user_id = ? AND series_title = ?
+        """, (watched, watched, time.time(), user_id, series_title))
+        if cursor.rowcount:
+            conn.execute("UPDATE users SET library_version = library_version + 1 WHERE id = ?", (user_id,))
+    if cursor.rowcount == 0:
+        return None
+    invalidate_user_lectures(user_id)
+    return get_user_lectures(user_id).get(series_title)
+
+@DB_SECONDS.timed(operation="get_playlist_followers")
+def get_playlist_followers(playlist_url: str) -> List[Tuple[int, str, Optional[int], Optional[int]]]:
+    """[(user_id, series_title, current, total), ...] for every library entry pointing at playlist_url."""
+    return get_db_connection().execute("""
+    SELECT user_id, series_title, current, total FROM user_library WHERE playlist_url = ?
+    """, (playlist_url,)).fetchall()
+
+def schedule_playlist_followers(playlist_url: str, playlist_videos: List[Dict[str, str]]) -> int:
+    """Schedules reviews of the watched videos of playlist_url for every user following it. Returns the row count."""
+    return sum(register_watched_videos(user_id, series_title, playlist_url, playlist_videos, current)
+               for user_id, series_title, current, _ in get_playlist_followers(playlist_url) if current)
 
-    if eligible_series.empty:
+# --- Review Scheduling ---
+# Watched videos get a per-user SM-2 schedule in review_items once their playlist is known (prefetch,
+# bulk download or a fallback pick), so choosing a review is one indexed query, not a yt-dlp call.
+SM2_INITIAL_EASE = 2.5
+SM2_MIN_EASE = 1.3
+REVIEW_DUE_CANDIDATES = 20 # Due rows read per pick, to skip ones whose series is no longer eligible
+
+@DB_SECONDS.timed(operation="register_watched_videos")
+def register_watched_videos(user_id: int, series_title: str, playlist_url: str, playlist_videos: List[Dict[str, str]], num_watched: int) -> int:
+    """
+    Adds the first num_watched videos of a playlist to user_id's review schedule, due now.
+    Videos already scheduled keep their schedule. Returns how many videos were passed on to the DB.
+    """
+    now = time.time()
+    rows = [(user_id, video['url'], series_title, idx, video['title'], playlist_url, now, video['url'])
+            for idx, video in enumerate(playlist_videos[:num_watched]) if video.get('url')]
+    if not rows:
+        return 0
+    conn = get_db_connection()
+    try:
+        with conn:
+            conn.executemany("""
+            INSERT INTO review_items (user_id, video_url, series_title, video_playlist_index, video_title, playlist_url, due_at, has_subtitles)
+            VALUES (?, ?, ?, ?, ?, ?, ?, EXISTS(SELECT 1 FROM subtitles WHERE video_url = ?))
+            ON CONFLICT(user_id, video_url) DO UPDATE SET series_title = excluded.series_title,
+                video_playlist_index = excluded.video_playlist_index, video_title = excluded.video_title,
+                playlist_url = excluded.playlist_url
+            """, rows)
+    except sqlite3.Error as e:
+        logging.error(f"Error scheduling reviews for '{series_title}': {e}")
+        return 0
+    return len(rows)
+
+@DB_SECONDS.timed(operation="get_next_due_review")
+def get_next_due_review(user_id: int, lectures: LectureIndex, now: Optional[float] = None) -> Optional[Dict]:
+    """
+    Returns user_id's review_items row most in need of review: due videos with stored subtitles first,
+    then the longest overdue. Videos whose series is no longer review-eligible in the CSV,
+    or beyond its 'Current', are skipped. None if nothing is due.
+    """
+    now = time.time() if now is None else now
+    conn = get_db_connection()
+    for has_subtitles in (1, 0):
+        offset = 0
+        while True:
+            rows = conn.execute("""
+            SELECT video_url, series_title, video_playlist_index, video_title, playlist_url, due_at
+            FROM review_items WHERE user_id = ? AND has_subtitles = ? AND due_at <= ? ORDER BY due_at LIMIT ? OFFSET ?
+            """, (user_id, has_subtitles, now, REVIEW_DUE_CANDIDATES, offset)).fetchall()
+            for video_url, series_title, playlist_index, video_title, playlist_url, due_at in rows:
+                record = lectures.get(series_title)
+                if record is not None and record.current is not None and record.current > 1 and playlist_index < record.current:
+                    return {"video_url": video_url, "series_title": series_title, "playlist_index": playlist_index,
+                            "video_title": video_title, "playlist_url": playlist_url, "due_at": due_at,
+                            "has_subtitles": bool(has_subtitles)}
+            if len(rows) < REVIEW_DUE_CANDIDATES:
+                break
+            offset += REVIEW_DUE_CANDIDATES
+    return None
+
+@DB_SECONDS.timed(operation="record_review")
+def record_review(user_id: int, video_url: str, quality: int, now: Optional[float] = None) -> Optional[Dict]:
+    """
+    Records user_id's review graded 0-5 (SM-2: below 3 means it was not recalled) and schedules the next one.
+    Returns {"interval_days", "ease_factor", "due_at"}, or None if the video isn't scheduled for that user.
+    """
+    quality = max(0, min(5, int(quality)))
+    now = time.time() if now is None else now
+    conn = get_db_connection()
+    row = conn.execute("SELECT repetitions, interval_days, ease_factor FROM review_items WHERE user_id = ? AND video_url = ?",
+                       (user_id, video_url)).fetchone()
+    if row is None:
+        return None
+    repetitions, interval_days, ease_factor = row
+    if quality < 3: # A lapse restarts the repetitions; SM-2 leaves the ease factor as it was
+        repetitions, interval_days = 0, 1
+    else:
+        repetitions += 1
+        interval_days = 1 if repetitions == 1 else 6 if repetitions == 2 else round(interval_days * ease_factor)
+        ease_factor = max(SM2_MIN_EASE, ease_factor + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+    due_at = now + interval_days * 86400
+    with conn:
+        conn.execute("""
+        UPDATE review_items SET repetitions = ?, interval_days = ?, ease_factor = ?, due_at = ?, last_reviewed_at = ?
+        WHERE user_id = ? AND video_url = ?
+        """, (repetitions, interval_days, ease_factor, due_at, now, user_id, video_url))
+        conn.execute("INSERT INTO review_history (user_id, video_url, reviewed_at, quality, interval_days, ease_factor) VALUES (?, ?, ?, ?, ?, ?)",
+                     (user_id, video_url, now, quality, interval_days, ease_factor))
+    return {"interval_days": interval_days, "ease_factor": ease_factor, "due_at": due_at}
+
+def select_random_lecture_to_watch(lectures: LectureIndex) -> Optional[Dict]:
+    if not lectures.watch_eligible:
         return {"error": "No eligible YouTube series found to pick a new lecture from (or all are completed)."}
 
-    selected_series_row = eligible_series.sample(1).iloc[0]
-    series_title = selected_series_row['lecture_series']
-    playlist_url = selected_series_row['playlist_url']
-    next_video_index = int(selected_series_row['current'])
+    selected_series = random.choice(lectures.watch_eligible)
+    series_title = selected_series.title
+    playlist_url = selected_series.playlist_url
+    next_video_index = selected_series.next_video_index
 
     playlist_videos = get_playlist_videos_yt_dlp(playlist_url)
     if not playlist_videos:
@@ -292,34 +1917,50 @@ def select_random_lecture_to_watch(df: pd.DataFrame) -> Optional[Dict]:
 
     if next_video_index < len(playlist_videos):
         video_to_watch = playlist_videos[next_video_index]
+        # Usually already stored by the background prefetcher. The text itself is loaded
+        # by the page on demand, see get_subtitle_for_review.
+        subtitles_exist = bool(video_to_watch['url']) and check_subtitle_exists(video_to_watch['url'])
         return {
             "series_title": series_title,
             "video_title": video_to_watch['title'],
             "video_url": video_to_watch['url'],
+            "subtitles_exist_in_db": subtitles_exist,
+            "playlist_index": next_video_index,
             "message": f"Selected lecture: '{video_to_watch['title']}' from '{series_title}'. This is video #{next_video_index + 1}."
         }
     else:
-        return {"error": f"CSV 'Current' ({selected_series_row['current']}) for '{series_title}' might be out of sync or playlist fully watched. Playlist length: {len(playlist_videos)}."}
-
-def select_random_watched_lecture_for_review(df: pd.DataFrame) -> Optional[Dict]:
-    eligible_series = df[
-        df['is_youtube_playlist'] &
-        (df['current'].notna()) &
-        (df['current'] > 1)
-    ].copy()
+        return {"error": f"CSV 'Current' ({selected_series.current}) for '{series_title}' might be out of sync or playlist fully watched. Playlist length: {len(playlist_videos)}."}
 
-    if eligible_series.empty:
+def select_random_watched_lecture_for_review(lectures: LectureIndex, user_id: int) -> Optional[Dict]:
+    """
+    Picks user_id's scheduled review that is most due (see get_next_due_review). Only when nothing is due
+    does it fall back to a random watched video of `lectures`, fetching that playlist and scheduling its videos.
+    """
+    if not lectures.review_eligible:
         return {"error": "No YouTube series with watched lectures found for review."}
 
-    selected_series_row = eligible_series.sample(1).iloc[0]
-    series_title = selected_series_row['lecture_series']
-    playlist_url = selected_series_row['playlist_url']
-    num_watched = int(selected_series_row['current'])
+    due = get_next_due_review(user_id, lectures)
+    if due is not None:
+        return {
+            "series_title": due["series_title"],
+            "video_title": due["video_title"],
+            "video_url": due["video_url"],
+            "subtitles_exist_in_db": due["has_subtitles"],
+            "playlist_index": due["playlist_index"],
+            "playlist_url": due["playlist_url"],
+            "message": f"Due for review: '{due['video_title']}' from '{due['series_title']}'. Video #{due['playlist_index'] + 1}."
+        }
+
+    selected_series = random.choice(lectures.review_eligible)
+    series_title = selected_series.title
+    playlist_url = selected_series.playlist_url
+    num_watched = selected_series.current
 
     playlist_videos = get_playlist_videos_yt_dlp(playlist_url)
     if not playlist_videos:
         return {"error": f"Could not retrieve videos for playlist: {series_title} ({playlist_url})"}
 
+    register_watched_videos(user_id, series_title, playlist_url, playlist_videos, num_watched)
     actual_max_watched_index = min(num_watched, len(playlist_videos))
     if actual_max_watched_index == 0:
         return {"error": f"No videos to review in '{series_title}' based on playlist content or 'Current' count."}
@@ -327,84 +1968,382 @@ def select_random_watched_lecture_for_review(df: pd.DataFrame) -> Optional[Dict]
     random_watched_video_index = random.randint(0, actual_max_watched_index - 1)
     video_to_review = playlist_videos[random_watched_video_index]
     
-    subtitles = get_subtitle_for_review(video_to_review['url'])
-    subtitles_exist = bool(subtitles)
+    subtitles_exist = check_subtitle_exists(video_to_review['url']) # Text is loaded by the page on demand
 
     return {
         "series_title": series_title,
         "video_title": video_to_review['title'],
         "video_url": video_to_review['url'],
-        "subtitles": subtitles,
         "subtitles_exist_in_db": subtitles_exist,
         "playlist_index": random_watched_video_index, # For potential download
+        "playlist_url": playlist_url,
         "message": f"Selected for review: '{video_to_review['title']}' from '{series_title}'. Video #{random_watched_video_index + 1}."
     }
 
-def bulk_download_watched_subtitles(df: pd.DataFrame) -> Dict:
+def bulk_download_watched_subtitles(lectures: LectureIndex, max_workers: Optional[int] = None,
+                                    batch_size: Optional[int] = None,
+                                    job: Optional["BulkDownloadJob"] = None) -> Dict:
+    """
+    Downloads subtitles for every watched video that is not in the DB yet.
+    Playlists and subtitle batches (`batch_size` videos per yt-dlp process) are fetched
+    concurrently by a bounded thread pool, while this thread stays the single writer:
+    it consumes results in playlist order and is the only one calling store_subtitle,
+    so SQLite never sees competing writes. Progress is reported to `job` if given.
+    Stored subtitles and ingestion_state act as the checkpoint: a rerun (e.g. after a crash) skips
+    everything already stored, videos without subtitles and failures whose retry isn't due yet.
+    A video listed in several series is downloaded once; its other listings count as skipped if
+    that download was stored and as failed otherwise.
+    """
     results = {"downloaded": 0, "skipped": 0, "failed": 0, "messages": []}
-    youtube_series = df[df['is_youtube_playlist'] & (df['current'].notna()) & (df['current'] > 0)]
-
-    if youtube_series.empty:
+    if not lectures.bulk_eligible:
         results["messages"].append("No YouTube series with watched videos found in CSV.")
         return results
 
-    for _, row in youtube_series.iterrows():
-        series_title = row['lecture_series']
-        playlist_url = row['playlist_url']
-        num_watched = int(row['current'])
-        
-        current_series_msg = f"Processing series: {series_title} ({num_watched} watched videos)"
-        logging.info(current_series_msg)
-        results["messages"].append(current_series_msg)
-
-        playlist_videos = get_playlist_videos_yt_dlp(playlist_url)
-        if not playlist_videos:
-            msg = f"  Could not fetch video list for {series_title}. Skipping."
-            logging.warning(msg)
-            results["messages"].append(msg)
-            results["failed"] += num_watched # Count all potential videos as failed for this series
-            continue
-        
-        for video_idx in range(min(num_watched, len(playlist_videos))):
-            video_info = playlist_videos[video_idx]
-            video_title = video_info['title']
-            video_url = video_info['url']
+    series_rows = [(record.title, record.playlist_url, record.current) for record in lectures.bulk_eligible]
+    max_workers = max(1, max_workers or BULK_DOWNLOAD_WORKERS)
+    batch_size = max(1, batch_size or BULK_BATCH_SIZE)
 
-            if not video_url:
-                msg = f"    Skipping video with no URL: {video_title}"
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bulk_subs") as executor:
+        # Fetch all playlist listings up front; map() keeps results in CSV order.
+        playlists = executor.map(get_playlist_videos_yt_dlp, [playlist_url for _, playlist_url, _ in series_rows])
+
+        # Build the ordered work plan. Each entry is either a finished message or a download task.
+        plan = []
+        planned_urls = set()
+        repeats = [] # (video_title, video_url) listed again after being planned, resolved once the first attempt is done
+        for (series_title, playlist_url, num_watched), playlist_videos in zip(series_rows, playlists):
+            current_series_msg = f"Processing series: {series_title} ({num_watched} watched videos)"
+            logging.info(current_series_msg)
+            plan.append(("message", current_series_msg))
+            if job:
+                job.set_current_series(series_title)
+
+            if not playlist_videos:
+                msg = f"  Could not fetch video list for {series_title}. Skipping."
                 logging.warning(msg)
-                results["messages"].append(msg)
-                results["failed"] +=1
+                plan.append(("message", msg))
+                results["failed"] += num_watched # Count all potential videos as failed for this series
+                if job:
+                    job.advance(num_watched, failure=msg.strip())
                 continue
 
-            if check_subtitle_exists(video_url):
-                msg = f"    Subtitles already in DB for {video_title}. Skipping."
+            schedule_playlist_followers(playlist_url, playlist_videos)
+            watched_videos = playlist_videos[:num_watched]
+            stored_urls = get_existing_subtitle_urls(video['url'] for video in watched_videos)
+            deferred = get_deferred_downloads(video['url'] for video in watched_videos if video['url'] not in stored_urls)
+            for video_idx, video_info in enumerate(watched_videos):
+                video_title = video_info['title']
+                video_url = video_info['url']
+
+                if not video_url:
+                    msg = f"    Skipping video with no URL: {video_title}"
+                    logging.warning(msg)
+                    plan.append(("message", msg))
+                    results["failed"] +=1
+                    if job:
+                        job.advance(failure=msg.strip())
+                    continue
+
+                if video_url in planned_urls:
+                    repeats.append((video_title, video_url))
+                    continue
+
+                if video_url in stored_urls:
+                    msg = f"    Subtitles already in DB for {video_title}. Skipping."
+                    logging.info(msg)
+                    plan.append(("message", msg))
+                    results["skipped"] += 1
+                    if job:
+                        job.advance()
+                    continue
+
+                if video_url in deferred:
+                    msg = f"    Skipping {video_title}: {describe_deferred_download(*deferred[video_url])}."
+                    logging.info(msg)
+                    plan.append(("message", msg))
+                    results["skipped"] += 1
+                    if job:
+                        job.advance()
+                    continue
+
+                planned_urls.add(video_url) # A video listed twice is downloaded once, see `repeats`
+                plan.append(("download", (series_title, video_idx, video_title, video_url)))
+
+        # Hand the downloads to yt-dlp in chunks of `batch_size` URLs, one process per chunk.
+        download_urls = [entry[1][3] for entry in plan if entry[0] == "download"]
+        chunks = [download_urls[i:i + batch_size] for i in range(0, len(download_urls), batch_size)]
+        if job:
+            job.set_total(results["failed"] + results["skipped"] + len(download_urls) + len(repeats))
+
+        # Keep only a bounded window of chunks in flight so finished-but-unwritten
+        # subtitles don't pile up in memory on large libraries.
+        max_in_flight = max_workers * 2
+        chunk_futures = {} # chunk index -> future of {video_url: raw VTT or None}
+        chunk_reasons = {} # chunk index -> {video_url: why it has no VTT}, filled by the download
+        next_chunk_to_submit = 0
+        download_pos = 0
+
+        # Downloads are written through a buffered writer; a video only counts as downloaded
+        # once the transaction holding it has committed.
+        pending_titles = {} # video_url -> video_title, for rows waiting in the writer
+        stored_ok = {} # video_url -> whether this run stored it, for resolving `repeats`
+
+        def on_stored(video_url: str, ok: bool):
+            video_title = pending_titles.pop(video_url)
+            stored_ok[video_url] = ok
+            if ok:
+                results["downloaded"] += 1
+                if job:
+                    job.advance()
+            else: # Store subtitle failed
+                results["failed"] +=1
+                results["messages"].append(f"    Failed to store subtitles for {video_title} after download.")
+                if job:
+                    job.advance(failure=f"Failed to store subtitles for {video_title} after download.")
+
+        with SubtitleWriter(on_result=on_stored) as writer:
+            for entry in plan:
+                if entry[0] == "message":
+                    results["messages"].append(entry[1])
+                    continue
+
+                series_title, video_idx, video_title, video_url = entry[1]
+                if job:
+                    job.set_current_series(series_title)
+                chunk_idx = download_pos // batch_size
+                download_pos += 1
+                while next_chunk_to_submit < len(chunks) and next_chunk_to_submit < chunk_idx + max_in_flight:
+                    chunk_reasons[next_chunk_to_submit] = {}
+                    chunk_futures[next_chunk_to_submit] = executor.submit(download_subtitles_batch_yt_dlp, chunks[next_chunk_to_submit],
+                                                                          chunk_reasons[next_chunk_to_submit])
+                    next_chunk_to_submit += 1
+
+                # While waiting for a chunk, commit buffered rows as they come due, so a slow or
+                # failing stretch of downloads doesn't hold earlier subtitles uncommitted.
+                while True:
+                    try:
+                        chunk_results = chunk_futures[chunk_idx].result(timeout=writer.seconds_until_due())
+                        break
+                    except FutureTimeoutError:
+                        writer.flush_if_due()
+                writer.flush_if_due()
+                # A video absent from its chunk's output comes back as None and counts as a failure.
+                subtitles_text = chunk_results.get(video_url)
+                reason = chunk_reasons[chunk_idx].get(video_url)
+                if download_pos % batch_size == 0 or download_pos == len(download_urls):
+                    del chunk_futures[chunk_idx] # Last video of this chunk, release its results
+                    record_ingestion_failures(chunk_reasons.pop(chunk_idx)) # Remembered for the next run
+
+                if subtitles_text:
+                    pending_titles[video_url] = video_title
+                    writer.add(series_title, video_idx, video_title, video_url, subtitles_text)
+                else:
+                    if reason == INGESTION_NO_SUBTITLES:
+                        msg = f"    No subtitles available for {video_title}."
+                    else:
+                        msg = f"    Failed to download subtitles for {video_title}: {reason or 'no subtitle file'}."
+                    logging.warning(msg)
+                    results["messages"].append(msg)
+                    results["failed"] += 1
+                    stored_ok[video_url] = False
+                    if job:
+                        job.advance(failure=msg.strip())
+
+        # A repeat counts as skipped if its first listing was stored, else as failed (as if it had been
+        # retried and failed again), so the counts match downloading every listing in turn.
+        for video_title, video_url in repeats:
+            if stored_ok.get(video_url):
+                msg = f"    Subtitles for {video_title} were stored earlier in this run (listed twice). Skipping."
                 logging.info(msg)
                 results["messages"].append(msg)
                 results["skipped"] += 1
-                continue
-
-            subtitles_text = download_subtitles_yt_dlp(video_url)
-            if subtitles_text:
-                if store_subtitle(series_title, video_idx, video_title, video_url, subtitles_text):
-                    results["downloaded"] += 1
-                else: # Store subtitle failed
-                    results["failed"] +=1
-                    results["messages"].append(f"    Failed to store subtitles for {video_title} after download.")
+                if job:
+                    job.advance()
             else:
-                msg = f"    Failed to download or no subtitles found for {video_title}."
+                msg = f"    Failed to download subtitles for {video_title}: listed earlier in this run, and that download failed."
                 logging.warning(msg)
                 results["messages"].append(msg)
                 results["failed"] += 1
-    
+                if job:
+                    job.advance(failure=msg.strip())
+
     summary_msg = (f"Bulk Download Summary -- Downloaded: {results['downloaded']}, "
                    f"Skipped: {results['skipped']}, Failed: {results['failed']}")
     logging.info(summary_msg)
     results["messages"].append(summary_msg)
     return results
 
-def download_single_subtitle_if_needed(series_title: str, playlist_url: str, video_playlist_index: int) -> Optional[Dict]:
-    """Downloads subtitles for a specific video if not already present."""
+# --- Background Bulk Download Jobs ---
+class BulkDownloadJob:
+    """
+    Progress of one background bulk_download_watched_subtitles run. Safe to read from other threads.
+    The state is also written to the bulk_jobs table (at most every BULK_JOB_PERSIST_INTERVAL seconds
+    while running), so every worker process can report it.
+    """
+
+    MAX_REPORTED_FAILURES = 200
+
+    def __init__(self, library_key: str, library_lock: Optional[ProcessLock] = None):
+        self.job_id = uuid.uuid4().hex
+        self.library_key = library_key
+        self.status = "running" # running | finished | error
+        self.done = 0
+        self.total = None # Unknown until every playlist has been scanned
+        self.current_series = None
+        self.failures = []
+        self.results = None
+        self.error = None
+        self.started_at = time.time()
+        self.finished_at = None
+        self._lock = threading.Lock()
+        self._library_lock = library_lock # Held until the run ends, see start_bulk_download_job
+        self._persisted_at = 0.0
+
+    def set_current_series(self, series_title: str):
+        self.current_series = series_title
+        self._persist()
+
+    def set_total(self, total: int):
+        with self._lock:
+            self.total = total
+        self._persist()
+
+    def advance(self, count: int = 1, failure: Optional[str] = None):
+        with self._lock:
+            self.done += count
+            if failure and len(self.failures) < self.MAX_REPORTED_FAILURES:
+                self.failures.append(failure)
+        self._persist()
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            return {
+                "job_id": self.job_id,
+                "status": self.status,
+                "done": self.done,
+                "total": self.total,
+                "current_series": self.current_series,
+                "failures": list(self.failures),
+                "results": self.results,
+                "error": self.error,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+            }
+
+    def _persist(self, force: bool = False):
+        if not force and time.monotonic() - self._persisted_at < BULK_JOB_PERSIST_INTERVAL:
+            return
+        self._persisted_at = time.monotonic()
+        state = self.to_dict()
+        conn = get_db_connection()
+        try:
+            with conn:
+                conn.execute("""
+                INSERT OR REPLACE INTO bulk_jobs (job_id, library_key, status, done, total, current_series,
+                    failures_json, results_json, error, started_at, finished_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (self.job_id, self.library_key, state["status"], state["done"], state["total"], state["current_series"],
+                      json.dumps(state["failures"]), json.dumps(state["results"]), state["error"],
+                      state["started_at"], state["finished_at"]))
+        except sqlite3.Error as e:
+            logging.warning(f"Could not save progress of bulk download job {self.job_id}: {e}")
+
+    def _run(self, lectures: LectureIndex):
+        try:
+            results = bulk_download_watched_subtitles(lectures, job=self)
+            with self._lock:
+                self.results = results
+                self.status = "finished"
+        except Exception as e:
+            logging.error(f"Bulk download job {self.job_id} failed: {e}", exc_info=True)
+            with self._lock:
+                self.error = str(e)
+                self.status = "error"
+        finally:
+            self.finished_at = time.time()
+            self.current_series = None
+            self._persist(force=True)
+            with _bulk_jobs_lock:
+                _bulk_jobs.pop(self.job_id, None) # Readers now get the final state from the DB
+            if self._library_lock is not None:
+                self._library_lock.release()
+
+_bulk_jobs: Dict[str, BulkDownloadJob] = {} # job_id -> job running in this process
+_bulk_jobs_lock = threading.Lock()
+MAX_REMEMBERED_BULK_JOBS = 20
+BULK_JOB_PERSIST_INTERVAL = 0.5 # Seconds between progress writes of a running job to bulk_jobs
+BULK_JOB_START_WAIT = 2.0 # Seconds to wait for another process's just-started job to show up in bulk_jobs
+
+def start_bulk_download_job(lectures: LectureIndex, library_key: str = DEFAULT_USER) -> Tuple[Optional[Dict], bool]:
+    """
+    Starts bulk_download_watched_subtitles in a background thread.
+    Returns (job state, see BulkDownloadJob.to_dict, started). If a job is already running for
+    `library_key` in any worker process, that job is returned with started=False instead of
+    launching a duplicate (its state is None if it could not be read).
+    One job per library is enforced by a ProcessLock held for the whole run.
+    """
+    library_lock = ProcessLock("bulk-" + hashlib.sha1(library_key.encode()).hexdigest()[:16])
+    if not library_lock.acquire(timeout=0):
+        return _find_running_bulk_job(library_key), False
+    try:
+        conn = get_db_connection()
+        with conn:
+            # Nobody holds the lock, so jobs still marked running died with their process
+            conn.execute("""
+            UPDATE bulk_jobs SET status = 'error', error = 'Interrupted: the process running it stopped.', finished_at = ?
+            WHERE library_key = ? AND status = 'running'
+            """, (time.time(), library_key))
+            conn.execute("""
+            DELETE FROM bulk_jobs WHERE status != 'running'
+            AND job_id NOT IN (SELECT job_id FROM bulk_jobs ORDER BY started_at DESC LIMIT ?)
+            """, (MAX_REMEMBERED_BULK_JOBS,))
+        job = BulkDownloadJob(library_key, library_lock)
+        job._persist(force=True)
+    except BaseException:
+        library_lock.release()
+        raise
+    with _bulk_jobs_lock:
+        _bulk_jobs[job.job_id] = job
+    threading.Thread(target=job._run, args=(lectures,), name=f"bulk-{job.job_id[:8]}", daemon=True).start()
+    logging.info(f"Started bulk download job {job.job_id} for {library_key}.")
+    return job.to_dict(), True
+
+def _find_running_bulk_job(library_key: str) -> Optional[Dict]:
+    """The running job of library_key, waiting up to BULK_JOB_START_WAIT for one that is just starting."""
+    deadline = time.monotonic() + BULK_JOB_START_WAIT
+    while True:
+        row = get_db_connection().execute("""
+        SELECT job_id FROM bulk_jobs WHERE library_key = ? AND status = 'running' ORDER BY started_at DESC LIMIT 1
+        """, (library_key,)).fetchone()
+        if row is not None or time.monotonic() >= deadline:
+            return get_bulk_download_job(row[0]) if row is not None else None
+        time.sleep(0.05)
+
+@DB_SECONDS.timed(operation="get_bulk_download_job")
+def get_bulk_download_job(job_id: str) -> Optional[Dict]:
+    """The state of a bulk job started by any worker process (see BulkDownloadJob.to_dict), or None."""
+    with _bulk_jobs_lock:
+        job = _bulk_jobs.get(job_id)
+    if job is not None:
+        return job.to_dict() # Fresher than its last write to the DB
+    row = get_db_connection().execute("""
+    SELECT status, done, total, current_series, failures_json, results_json, error, started_at, finished_at
+    FROM bulk_jobs WHERE job_id = ?
+    """, (job_id,)).fetchone()
+    if row is None:
+        return None
+    status, done, total, current_series, failures_json, results_json, error, started_at, finished_at = row
+    return {"job_id": job_id, "status": status, "done": done, "total": total, "current_series": current_series,
+            "failures": json.loads(failures_json), "results": json.loads(results_json), "error": error,
+            "started_at": started_at, "finished_at": finished_at}
+
+def download_single_subtitle_if_needed(series_title: str, playlist_url: str, video_playlist_index: int,
+                                       respect_backoff: bool = False) -> Optional[Dict]:
+    """
+    Downloads subtitles for a specific video if not already present.
+    With `respect_backoff` (background callers) videos deferred in ingestion_state aren't tried again yet;
+    an explicit request always tries.
+    """
     playlist_videos = get_playlist_videos_yt_dlp(playlist_url)
     if not playlist_videos or video_playlist_index >= len(playlist_videos):
         return {"error": "Could not find video in playlist or playlist error."}
@@ -416,11 +2355,18 @@ def download_single_subtitle_if_needed(series_title: str, playlist_url: str, vid
     if not video_url:
         return {"error": f"Video {video_title} has no URL."}
 
-    if check_subtitle_exists(video_url):
+    stored_subtitles = get_subtitle_for_review(video_url) # One lookup answers both "exists?" and "what is it?"
+    if stored_subtitles is not None:
         # Subtitles from DB are already cleaned if store_subtitle was used
-        return {"message": f"Subtitles for '{video_title}' already exist.", "subtitles": get_subtitle_for_review(video_url)}
+        return {"message": f"Subtitles for '{video_title}' already exist.", "subtitles": stored_subtitles}
+
+    if respect_backoff:
+        deferred = get_deferred_downloads([video_url]).get(video_url)
+        if deferred:
+            return {"error": f"Skipped '{video_title}': {describe_deferred_download(*deferred)}."}
 
-    raw_subtitles_text = download_subtitles_yt_dlp(video_url) # This gets the raw VTT
+    reasons = {}
+    raw_subtitles_text = download_subtitles_yt_dlp(video_url, reasons=reasons) # This gets the raw VTT
     if raw_subtitles_text:
         # store_subtitle will clean it before saving
         if store_subtitle(series_title, video_playlist_index, video_title, video_url, raw_subtitles_text):
@@ -433,15 +2379,131 @@ def download_single_subtitle_if_needed(series_title: str, playlist_url: str, vid
         else:
             return {"error": f"Failed to store downloaded subtitles for '{video_title}'."}
     else:
+        record_ingestion_failures(reasons)
         return {"error": f"Failed to download subtitles for '{video_title}'. yt-dlp reported no subtitles available or an error."}
 
-def check_yt_dlp():
-    """Checks if yt-dlp is accessible."""
+def check_yt_dlp(max_age: Optional[float] = None) -> bool:
+    """
+    Checks if yt-dlp is accessible. With max_age, a result stored by any process less than
+    max_age seconds ago is reused instead of starting yt-dlp again.
+    """
+    if max_age is not None:
+        try:
+            probe = get_app_state("yt_dlp_probe")
+        except sqlite3.Error:
+            probe = None
+        if probe and probe[0].get("path") == YT_DLP_PATH and time.time() - probe[1] < max_age:
+            return probe[0]["ok"]
     try:
         process = subprocess.run([YT_DLP_PATH, '--version'], capture_output=True, check=True, text=True)
         logging.info(f"yt-dlp found: {process.stdout.strip()}")
-        return True
+        ok = True
     except (subprocess.CalledProcessError, FileNotFoundError) as e:
         logging.error(f"Error: '{YT_DLP_PATH}' command not found or not working. {e}")
         logging.error("Please ensure yt-dlp is installed and in your PATH, or update YT_DLP_PATH in lecture_manager_core.py.")
-        return False
+        ok = False
+    try:
+        set_app_state("yt_dlp_probe", {"path": YT_DLP_PATH, "ok": ok})
+    except sqlite3.Error as e:
+        logging.warning(f"Could not share the yt-dlp check with other processes: {e}")
+    return ok
+
+# --- Background Prefetch ---
+class LecturePrefetcher:
+    """
+    Warms the playlist cache and downloads subtitles for the next unwatched video of each
+    series in the background, so "Next Lecture" clicks don't wait on yt-dlp.
+    Work goes through a bounded queue drained by a fixed number of worker threads.
+    Tasks are per playlist: one fetch schedules reviews and prefetches next lectures for every
+    user following it (see get_playlist_followers).
+    """
+
+    def __init__(self, workers: int = PREFETCH_WORKERS, queue_size: int = PREFETCH_QUEUE_SIZE):
+        self.workers = max(1, workers)
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._pending = set() # Playlist URLs queued or being processed, to avoid duplicate work
+        self._pending_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        if self._threads:
+            return
+        self._stop.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"prefetch-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logging.info(f"Prefetcher started with {self.workers} workers.")
+
+    def enqueue_library(self, series: Iterable[SeriesRecord]) -> int:
+        """Queues every YouTube series with a known 'Current' (e.g. LectureIndex.series). Returns how many were queued."""
+        if self._stop.is_set() or series is None:
+            return 0
+        series = [record for record in series if record.is_youtube_playlist and record.current is not None]
+        queued = 0
+        for record in series:
+            playlist_url = record.playlist_url
+            with self._pending_lock:
+                if playlist_url in self._pending:
+                    continue
+                self._pending.add(playlist_url)
+            task = (record.title, playlist_url, record.next_video_index)
+            try:
+                self._queue.put_nowait(task)
+                queued += 1
+            except queue.Full:
+                with self._pending_lock:
+                    self._pending.discard(playlist_url)
+                logging.warning(f"Prefetch queue full, {len(series) - queued} series not queued.")
+                break
+        logging.info(f"Queued {queued} series for prefetch.")
+        return queued
+
+    def shutdown(self, wait: bool = True, timeout: Optional[float] = None):
+        """Stops the workers. Tasks still queued are dropped; running ones finish first when `wait`."""
+        self._stop.set()
+        for _ in self._threads:
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:
+                pass # Workers also check the stop flag between tasks
+        if wait:
+            for thread in self._threads:
+                thread.join(timeout)
+        self._threads = []
+        logging.info("Prefetcher stopped.")
+
+    def _worker(self):
+        while not self._stop.is_set():
+            try:
+                task = self._queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            if task is None or self._stop.is_set():
+                break
+            series_title, playlist_url, next_video_index = task
+            try:
+                playlist_videos = get_playlist_videos_yt_dlp(playlist_url)
+                if not playlist_videos:
+                    continue
+                next_videos = {} # playlist index -> series title, the queued series' next video first
+                if next_video_index is not None:
+                    next_videos[next_video_index] = series_title
+                for user_id, title, current, total in get_playlist_followers(playlist_url):
+                    if current:
+                        register_watched_videos(user_id, title, playlist_url, playlist_videos, current)
+                    follower_next = SeriesRecord(title, playlist_url, current, total, True).next_video_index
+                    if follower_next is not None:
+                        next_videos.setdefault(follower_next, title)
+                for video_index, title in list(next_videos.items())[:PREFETCH_MAX_VIDEOS_PER_PLAYLIST]:
+                    if self._stop.is_set():
+                        break
+                    result = download_single_subtitle_if_needed(title, playlist_url, video_index, respect_backoff=True)
+                    if result and "error" in result:
+                        logging.info(f"Prefetch for '{title}': {result['error']}")
+            except Exception as e:
+                logging.error(f"Prefetch failed for '{series_title}': {e}", exc_info=True)
+            finally:
+                with self._pending_lock:
+                    self._pending.discard(playlist_url)
@@ -1,18 +1,178 @@
-import requests
-import numpy as np
-from urllib3.exceptions import InsecureRequestWarning
+import csv
+import io
+import json
+import logging
+import os
+import tempfile
+import threading
+from typing import Callable, Optional
 
-requests.packages.urllib3.disable_warnings(category=InsecureRequestWarning)
-URL = "CSV_URL"
+URL = os.environ.get("LECTURES_CSV_URL", "CSV_URL")
+CSV_PATH = "lectures.csv"
+SYNC_INTERVAL = int(os.environ.get("LECTURES_CSV_SYNC_INTERVAL", 15 * 60)) # Seconds between background syncs
+REQUEST_TIMEOUT = (5, 30) # (connect, read) seconds, so an unreachable sheet can't hang a sync
+VERIFY_TLS = False # Matches the original setup; set True if your sheet host has a valid certificate
+REQUIRED_COLUMNS = ("lecture_series", "current", "total") # After the same normalization load_and_prepare_data applies
+URL_COLUMNS = ("playlist_url", "current_lecture_link", "url")
+
+
+def is_sync_configured(url: str = URL) -> bool:
+    """True once URL points at a real CSV download link instead of the placeholder."""
+    return url.startswith(("http://", "https://"))
+
+
+def _state_path(df_path: str) -> str:
+    return df_path + ".sync.json" # ETag/Last-Modified of the local copy, for conditional requests
+
+
+def _load_state(df_path: str) -> dict:
+    if not os.path.exists(df_path): # Without a local copy a 304 would leave us with nothing
+        return {}
+    try:
+        with open(_state_path(df_path)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_state(df_path: str, state: dict):
+    try:
+        with open(_state_path(df_path), "w") as f:
+            json.dump(state, f)
+    except OSError as e:
+        logging.warning(f"Could not save CSV sync state for '{df_path}': {e}")
+
+
+def validate_csv(content: bytes) -> Optional[str]:
+    """Returns why content is not a usable lectures CSV (e.g. an HTML error page), or None if it looks fine."""
+    try:
+        text = content.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        return "not UTF-8 text"
+    if text.lstrip().startswith("<"):
+        return "looks like HTML, not CSV"
+    rows = csv.reader(io.StringIO(text))
+    header = [col.strip().lower().replace(' ', '_').replace('.', '') for col in next(rows, [])]
+    missing = [col for col in REQUIRED_COLUMNS if col not in header]
+    if missing:
+        return f"missing columns: {', '.join(missing)}"
+    if not any(col in header for col in URL_COLUMNS):
+        return "missing a playlist URL column"
+    if next(rows, None) is None:
+        return "no lecture rows"
+    return None
+
+
+def _replace_atomically(df_path: str, content: bytes):
+    """Writes content next to df_path and renames it over df_path, so readers never see a partial file."""
+    directory = os.path.dirname(os.path.abspath(df_path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".lectures-", suffix=".csv.tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, df_path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
 
 
 def download_last_version(
     url: str = URL,
-    df_path: str = "lectures.csv",
-):
-    with open(df_path, "wb") as f:
-        resp = requests.get(
-            url,
-            verify=False,
-        )
-        f.write(resp.content)
+    df_path: str = CSV_PATH,
+    timeout=REQUEST_TIMEOUT,
+) -> bool:
+    """
+    Syncs df_path with the CSV at url. Returns True if the local file was replaced.
+    Uses a conditional GET, and only replaces the file with a validated download that differs from it;
+    on any failure the last good local copy is kept.
+    """
+    if not is_sync_configured(url):
+        return False
+    import requests # Imported on first sync so app startup doesn't pay for it
+    from urllib3.exceptions import InsecureRequestWarning
+    requests.packages.urllib3.disable_warnings(category=InsecureRequestWarning)
+
+    state = _load_state(df_path)
+    headers = {}
+    if state.get("etag"):
+        headers["If-None-Match"] = state["etag"]
+    if state.get("last_modified"):
+        headers["If-Modified-Since"] = state["last_modified"]
+    try:
+        resp = requests.get(url, headers=headers, timeout=timeout, verify=VERIFY_TLS)
+    except requests.RequestException as e:
+        logging.warning(f"CSV sync from {url} failed, keeping local '{df_path}': {e}")
+        return False
+    if resp.status_code == 304:
+        logging.info(f"CSV sync: '{df_path}' is up to date.")
+        return False
+    if resp.status_code != 200:
+        logging.warning(f"CSV sync from {url} returned HTTP {resp.status_code}, keeping local '{df_path}'.")
+        return False
+    problem = validate_csv(resp.content)
+    if problem:
+        logging.warning(f"CSV sync from {url} rejected ({problem}), keeping local '{df_path}'.")
+        return False
+
+    new_state = {"etag": resp.headers.get("ETag"), "last_modified": resp.headers.get("Last-Modified")}
+    try:
+        with open(df_path, "rb") as f:
+            unchanged = f.read() == resp.content
+    except OSError:
+        unchanged = False
+    if not unchanged:
+        try:
+            _replace_atomically(df_path, resp.content)
+        except OSError as e:
+            logging.error(f"CSV sync could not write '{df_path}': {e}")
+            return False
+        logging.info(f"CSV sync: updated '{df_path}' from {url}.")
+    _save_state(df_path, new_state)
+    return not unchanged
+
+
+class CsvSync:
+    """
+    Runs download_last_version in a background thread: once right after start(), then every `interval`
+    seconds. on_update is called after the local CSV was replaced.
+    """
+
+    def __init__(self, url: str = URL, df_path: str = CSV_PATH, interval: float = SYNC_INTERVAL,
+                 on_update: Optional[Callable[[], None]] = None):
+        self.url = url
+        self.df_path = df_path
+        self.interval = interval
+        self.on_update = on_update
+        self._lock = threading.Lock() # One download at a time, background or on demand
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="csv-sync", daemon=True)
+        self._thread.start()
+        logging.info(f"CSV sync started for {self.url} every {self.interval}s.")
+
+    def sync(self) -> bool:
+        """Syncs now, in the calling thread. Returns True if the local CSV was replaced."""
+        with self._lock:
+            return download_last_version(self.url, self.df_path)
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if self.sync() and self.on_update is not None:
+                    self.on_update()
+            except Exception as e:
+                logging.error(f"CSV sync error: {e}")
+            self._stop.wait(self.interval)
@@ -0,0 +1,168 @@
+# metrics.py
+"""
+Minimal in-process metrics (counters, gauges, histograms) rendered in the Prometheus text format,
+plus a per-request timing profile that the app can return as a Server-Timing header.
+No dependencies; every metric is safe to update from any thread.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0) # Seconds
+
+_registry: List["_Metric"] = []
+_profile = threading.local()
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[Tuple[str, str], ...], object] = {}
+        _registry.append(self)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.extend(self._render_value(labels, value))
+        return lines
+
+    def _render_value(self, labels, value) -> List[str]:
+        return [f"{self.name}{_format_labels(labels)} {value:g}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track_inprogress(self, **labels):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+                 profile_name: Optional[str] = None):
+        super().__init__(name, help_text)
+        self.buckets = tuple(sorted(buckets))
+        self.profile_name = profile_name or name # Prefix of this histogram's entries in request profiles
+
+    def observe(self, seconds: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0] # Per-bucket counts, sum, count
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += seconds
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Times the block into this histogram and, if a request profile is active, into the profile."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.observe(elapsed, **labels)
+            record_profile(".".join([self.profile_name, *map(str, labels.values())]), elapsed)
+
+    def timed(self, **labels):
+        """Decorator form of time()."""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.time(**labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def _render_value(self, labels, value) -> List[str]:
+        bucket_counts, total, count = value
+        lines, cumulative = [], 0
+        for bound, bucket_count in zip(self.buckets, bucket_counts):
+            cumulative += bucket_count
+            le = 'le="%g"' % bound
+            lines.append(f"{self.name}_bucket{_format_labels(labels, le)} {cumulative}")
+        le = 'le="+Inf"'
+        lines.append(f"{self.name}_bucket{_format_labels(labels, le)} {count}")
+        lines.append(f"{self.name}_sum{_format_labels(labels)} {total:g}")
+        lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+def render_prometheus() -> str:
+    """All registered metrics in the Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    for metric in list(_registry):
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# --- Per-request profiling ---
+def start_profile():
+    """Starts collecting timed blocks run by this thread (see Histogram.time) until stop_profile()."""
+    _profile.entries = []
+
+
+def record_profile(name: str, seconds: float):
+    """Adds a timing to this thread's active profile, if any."""
+    entries = getattr(_profile, "entries", None)
+    if entries is not None:
+        entries.append((name, seconds))
+
+
+def stop_profile() -> Optional[List[Tuple[str, float]]]:
+    """Returns [(name, seconds), ...] summed per name in first-seen order, or None if no profile was active."""
+    entries = getattr(_profile, "entries", None)
+    _profile.entries = None
+    if entries is None:
+        return None
+    totals: Dict[str, float] = {}
+    for name, seconds in entries:
+        totals[name] = totals.get(name, 0.0) + seconds
+    return list(totals.items())
@@ -0,0 +1,113 @@
+# tests/test_csv_sync.py
+"""load_df's CSV sync against a local HTTP server standing in for the published sheet."""
+import http.server
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import load_df
+
+LOCAL_CSV = b"Lecture Series,Current,Total,Playlist URL\nLocal Series,1,10,https://www.youtube.com/playlist?list=PLlocal\n"
+REMOTE_CSV = b"Lecture Series,Current,Total,Playlist URL\nRemote Series,2,20,https://www.youtube.com/playlist?list=PLremote\n"
+ETAG = '"v1"'
+
+
+class SheetHandler(http.server.BaseHTTPRequestHandler):
+    """Answers with server.response: (status, body, delay), 304 when If-None-Match matches the ETag."""
+
+    def do_GET(self):
+        self.server.requests.append(dict(self.headers))
+        status, body, delay = self.server.response
+        if delay:
+            time.sleep(delay)
+        if status == 200 and self.headers.get("If-None-Match") == ETAG:
+            status, body = 304, b""
+        self.send_response(status)
+        if status == 200:
+            self.send_header("ETag", ETAG)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def sheet():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), SheetHandler)
+    server.daemon_threads = True
+    server.requests = []
+    server.response = (200, REMOTE_CSV, 0)
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/lectures.csv"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "lectures.csv"
+    path.write_bytes(LOCAL_CSV)
+    return str(path)
+
+
+def test_download_replaces_file_and_saves_etag(sheet, csv_path):
+    inode = os.stat(csv_path).st_ino
+    assert load_df.download_last_version(sheet.url, csv_path) is True
+    with open(csv_path, "rb") as f:
+        assert f.read() == REMOTE_CSV
+    assert os.stat(csv_path).st_ino != inode # Renamed over the old file, not rewritten in place
+    assert sorted(os.listdir(os.path.dirname(csv_path))) == ["lectures.csv", "lectures.csv.sync.json"]
+    assert load_df._load_state(csv_path)["etag"] == ETAG
+
+
+def test_second_sync_is_conditional(sheet, csv_path):
+    assert load_df.download_last_version(sheet.url, csv_path) is True
+    assert load_df.download_last_version(sheet.url, csv_path) is False
+    assert "If-None-Match" not in sheet.requests[0]
+    assert sheet.requests[1]["If-None-Match"] == ETAG
+    with open(csv_path, "rb") as f:
+        assert f.read() == REMOTE_CSV
+
+
+@pytest.mark.parametrize("response", [
+    (200, b"<!DOCTYPE html><html><body>Sign in to continue</body></html>", 0),
+    (200, b"Name,Value\nfoo,1\n", 0),
+    (500, b"Internal Server Error", 0),
+])
+def test_bad_download_keeps_local_file(sheet, csv_path, response):
+    sheet.response = response
+    assert load_df.download_last_version(sheet.url, csv_path) is False
+    with open(csv_path, "rb") as f:
+        assert f.read() == LOCAL_CSV
+    assert load_df._load_state(csv_path) == {}
+
+
+def test_slow_sheet_times_out_without_touching_file(sheet, csv_path):
+    sheet.response = (200, REMOTE_CSV, 2)
+    started = time.monotonic()
+    assert load_df.download_last_version(sheet.url, csv_path, timeout=(1, 0.3)) is False
+    assert time.monotonic() - started < 1.5
+    with open(csv_path, "rb") as f:
+        assert f.read() == LOCAL_CSV
+
+
+def test_background_sync_calls_on_update(sheet, csv_path):
+    updated = threading.Event()
+    sync = load_df.CsvSync(sheet.url, csv_path, interval=60, on_update=updated.set)
+    sync.start()
+    try:
+        assert updated.wait(5)
+    finally:
+        sync.stop(timeout=5)
+    assert sync.sync() is False # Unchanged sheet: answered with 304
+    assert len(sheet.requests) == 2
@@ -0,0 +1,27 @@
+# tests/test_import_time.py
+"""
+Module-level imports stay light: heavy dependencies are imported lazily, where they're used.
+Uses benchmarks/bench_import_time.py; its millisecond budgets are only checked with
+LECTURE_MANAGER_CHECK_IMPORT_BUDGETS=1, as they depend on the machine.
+"""
+import os
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_DIR, "benchmarks"))
+
+from bench_import_time import BUDGETS, import_times
+
+CHECK_BUDGETS = os.environ.get("LECTURE_MANAGER_CHECK_IMPORT_BUDGETS") == "1"
+
+
+@pytest.mark.parametrize("module", sorted(BUDGETS))
+def test_no_heavy_imports_at_import_time(module, tmp_path):
+    budget_ms, forbidden = BUDGETS[module]
+    times = import_times(module, str(tmp_path)) # app creates its DB in the working directory
+    assert module in times
+    assert [name for name in forbidden if name in times] == []
+    if CHECK_BUDGETS:
+        assert times[module] / 1000 <= budget_ms
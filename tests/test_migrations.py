@@ -0,0 +1,147 @@
+# tests/test_migrations.py
+"""init_db on a database created by the single-user version, whose subtitles and review tables it rebuilds."""
+import os
+import sqlite3
+import sys
+import zlib
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import lecture_manager_core as core
+
+# Schema written by init_db before users were added: subtitles unique per (series, playlist index),
+# cues keyed by video_url, an FTS index holding its own copy of the text, review state per video.
+SINGLE_USER_SCHEMA = """
+CREATE TABLE subtitles (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    series_title TEXT NOT NULL,
+    video_playlist_index INTEGER NOT NULL,
+    video_title TEXT,
+    video_url TEXT UNIQUE NOT NULL,
+    subtitles_text TEXT,
+    downloaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    subtitles_format TEXT NOT NULL DEFAULT 'text',
+    UNIQUE(series_title, video_playlist_index)
+);
+CREATE TABLE playlist_cache (playlist_url TEXT PRIMARY KEY, videos_json TEXT NOT NULL, fetched_at REAL NOT NULL);
+CREATE TABLE subtitle_cues (video_url TEXT NOT NULL, start_ms INTEGER NOT NULL, end_ms INTEGER NOT NULL, text TEXT NOT NULL);
+CREATE INDEX idx_subtitle_cues_video_start ON subtitle_cues(video_url, start_ms);
+CREATE TABLE review_items (
+    video_url TEXT PRIMARY KEY,
+    series_title TEXT NOT NULL,
+    video_playlist_index INTEGER NOT NULL,
+    video_title TEXT,
+    playlist_url TEXT,
+    repetitions INTEGER NOT NULL DEFAULT 0,
+    interval_days REAL NOT NULL DEFAULT 0,
+    ease_factor REAL NOT NULL DEFAULT 2.5,
+    due_at REAL NOT NULL,
+    last_reviewed_at REAL,
+    has_subtitles INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX idx_review_items_due ON review_items(has_subtitles, due_at);
+CREATE TABLE review_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    video_url TEXT NOT NULL,
+    reviewed_at REAL NOT NULL,
+    quality INTEGER NOT NULL,
+    interval_days REAL NOT NULL,
+    ease_factor REAL NOT NULL
+);
+CREATE INDEX idx_review_history_video ON review_history(video_url, reviewed_at);
+CREATE TRIGGER review_items_subtitles_insert AFTER INSERT ON subtitles BEGIN
+    UPDATE review_items SET has_subtitles = 1 WHERE video_url = new.video_url;
+END;
+CREATE TRIGGER review_items_subtitles_delete AFTER DELETE ON subtitles BEGIN
+    UPDATE review_items SET has_subtitles = 0 WHERE video_url = old.video_url;
+END;
+CREATE TABLE ingestion_state (
+    video_url TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    last_attempt_at REAL,
+    next_retry_at REAL
+);
+CREATE INDEX idx_subtitles_format ON subtitles(subtitles_format);
+CREATE VIRTUAL TABLE subtitles_fts USING fts5(video_title, subtitles_text, tokenize = 'porter unicode61');
+CREATE TRIGGER subtitles_fts_insert AFTER INSERT ON subtitles BEGIN
+    INSERT INTO subtitles_fts (rowid, video_title, subtitles_text)
+    VALUES (new.id, new.video_title, subtitle_plaintext(new.subtitles_text, new.subtitles_format));
+END;
+CREATE TRIGGER subtitles_fts_delete AFTER DELETE ON subtitles BEGIN
+    DELETE FROM subtitles_fts WHERE rowid = old.id;
+END;
+"""
+
+GROUPS_URL = "https://www.youtube.com/watch?v=OLDGROUPS01"
+RINGS_URL = "https://www.youtube.com/watch?v=OLDRINGS001"
+GROUPS_TEXT = "a group has an identity\nevery element has an inverse"
+RINGS_TEXT = "a ring has two operations\nmultiplication distributes over addition"
+
+
+@pytest.fixture
+def single_user_db(tmp_path, monkeypatch):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.create_function("subtitle_plaintext", 2, core._decode_subtitles)
+    conn.executescript(SINGLE_USER_SCHEMA)
+    with conn:
+        conn.execute("INSERT INTO review_items (video_url, series_title, video_playlist_index, video_title, playlist_url, "
+                     "repetitions, interval_days, ease_factor, due_at, last_reviewed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                     (GROUPS_URL, "Group Theory", 0, "Groups", "https://www.youtube.com/playlist?list=PLgroups",
+                      2, 6.0, 2.36, 1000.0, 500.0))
+        conn.execute("INSERT INTO review_history (video_url, reviewed_at, quality, interval_days, ease_factor) VALUES (?, ?, ?, ?, ?)",
+                     (GROUPS_URL, 500.0, 4, 6.0, 2.36))
+        conn.execute("INSERT INTO subtitles (id, series_title, video_playlist_index, video_title, video_url, subtitles_text, subtitles_format) "
+                     "VALUES (7, 'Group Theory', 0, 'Groups', ?, ?, 'text')", (GROUPS_URL, GROUPS_TEXT))
+        conn.execute("INSERT INTO subtitles (id, series_title, video_playlist_index, video_title, video_url, subtitles_text, subtitles_format) "
+                     "VALUES (9, 'Ring Theory', 0, 'Rings', ?, ?, 'zlib')", (RINGS_URL, zlib.compress(RINGS_TEXT.encode())))
+        conn.executemany("INSERT INTO subtitle_cues (video_url, start_ms, end_ms, text) VALUES (?, ?, ?, ?)", [
+            (GROUPS_URL, 0, 2000, "a group has an identity"),
+            (GROUPS_URL, 2000, 4000, "every element has an inverse"),
+        ])
+    conn.close()
+    monkeypatch.setattr(core, "DB_FILE", path)
+    core.init_db()
+    yield path
+    core.close_db_connection()
+
+
+def test_subtitles_survive_migration(single_user_db):
+    conn = core.get_db_connection()
+    assert conn.execute("SELECT id, video_url FROM subtitles ORDER BY id").fetchall() == [(7, GROUPS_URL), (9, RINGS_URL)]
+    assert core.get_subtitle_for_review(GROUPS_URL) == GROUPS_TEXT
+    assert core.get_subtitle_for_review(RINGS_URL) == RINGS_TEXT
+    assert core.get_subtitle_cues(GROUPS_URL) == [(0, 2000, "a group has an identity"), (2000, 4000, "every element has an inverse")]
+    # Another library may now store a video under the same series name and playlist index
+    assert core.store_subtitle("Group Theory", 0, "Other groups", "https://www.youtube.com/watch?v=NEWGROUPS01", "cosets")
+    assert core.get_subtitle_for_review(GROUPS_URL) == GROUPS_TEXT
+
+
+def test_search_index_survives_migration(single_user_db):
+    assert [hit["video_url"] for hit in core.search_subtitles("identity")] == [GROUPS_URL]
+    assert [hit["video_url"] for hit in core.search_subtitles("distributes")] == [RINGS_URL]
+    # Raises if the index no longer matches the subtitles it is built from
+    core.get_db_connection().execute("INSERT INTO subtitles_fts (subtitles_fts) VALUES ('integrity-check')")
+
+
+def test_review_schedule_moves_to_default_user(single_user_db):
+    conn = core.get_db_connection()
+    default_user_id = core.get_or_create_user(core.DEFAULT_USER)
+    assert conn.execute("SELECT user_id, video_url, repetitions, interval_days, ease_factor, due_at, last_reviewed_at, has_subtitles "
+                        "FROM review_items").fetchall() == [(default_user_id, GROUPS_URL, 2, 6.0, 2.36, 1000.0, 500.0, 1)]
+    assert conn.execute("SELECT user_id, video_url, quality FROM review_history").fetchall() == [(default_user_id, GROUPS_URL, 4)]
+    other_user_id = core.get_or_create_user("someone-else")
+    assert conn.execute("SELECT COUNT(*) FROM review_items WHERE user_id = ?", (other_user_id,)).fetchone()[0] == 0
+
+
+def test_migration_runs_once(single_user_db):
+    conn = core.get_db_connection()
+    schema = conn.execute("SELECT name, sql FROM sqlite_master ORDER BY name").fetchall()
+    core.init_db()
+    assert conn.execute("SELECT name, sql FROM sqlite_master ORDER BY name").fetchall() == schema
+    assert core.get_subtitle_for_review(GROUPS_URL) == GROUPS_TEXT
@@ -0,0 +1,36 @@
+# tests/test_search.py
+"""Full-text search over stored subtitles."""
+import os
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import lecture_manager_core as core
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(core, "DB_FILE", str(tmp_path / "test.db"))
+    core.init_db()
+    for i in range(5):
+        # Lecture i mentions "coset" i + 1 times, so later lectures rank higher
+        text = "\n".join(["a coset of a subgroup"] * (i + 1) + ["groups act on sets"] * (5 - i))
+        assert core.store_subtitle("Group Theory", i, f"Lecture {i}", f"https://www.youtube.com/watch?v=SEARCH{i:05d}", text)
+    yield
+    core.close_db_connection()
+
+
+def test_best_matches_first(db):
+    hits = core.search_subtitles("coset")
+    assert [hit["video_title"] for hit in hits] == [f"Lecture {i}" for i in reversed(range(5))]
+    assert core.SEARCH_SNIPPET_START + "coset" + core.SEARCH_SNIPPET_END in hits[0]["snippet"]
+    assert core.search_subtitles("zebra") == []
+
+
+@pytest.mark.parametrize("limit, expected", [(-1, 1), (0, 1), (2, 2), (10 ** 9, 3)])
+def test_limit_is_clamped(db, monkeypatch, limit, expected):
+    monkeypatch.setattr(core, "SEARCH_MAX_RESULTS", 3)
+    assert len(core.search_subtitles("coset", limit=limit)) == expected
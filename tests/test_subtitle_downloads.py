@@ -0,0 +1,125 @@
+# tests/test_subtitle_downloads.py
+"""Subtitle downloads against benchmarks/fake_yt_dlp.py, which stands in for the yt-dlp executable."""
+import os
+import subprocess
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, "benchmarks"))
+
+import lecture_manager_core as core
+import fake_yt_dlp
+
+FAKE_YT_DLP = os.path.join(REPO_DIR, "benchmarks", "fake_yt_dlp.py")
+VIDEO_URL = "https://www.youtube.com/watch?v=TESTVIDEO01"
+
+
+@pytest.fixture
+def yt_dlp_runs(monkeypatch):
+    """Points the core at the fake yt-dlp and records the command of every run."""
+    monkeypatch.setattr(core, "YT_DLP_PATH", FAKE_YT_DLP)
+    monkeypatch.setattr(core, "YT_DLP_HOST_MIN_INTERVAL", 0)
+    monkeypatch.setattr(core, "SUBTITLE_LANGS_PRIORITY", ["en", "en-US", "en-GB"])
+    runs = []
+    real_run = subprocess.run
+
+    def run(command, *args, **kwargs):
+        runs.append(command)
+        return real_run(command, *args, **kwargs)
+
+    monkeypatch.setattr(core.subprocess, "run", run)
+    return runs
+
+
+def test_single_call_picks_preferred_language(yt_dlp_runs, monkeypatch):
+    monkeypatch.setenv("FAKE_YT_DLP_LANGS", "en-GB,en")
+    vtt = core.download_subtitles_yt_dlp(VIDEO_URL, single_call=True)
+    assert vtt is not None and "Language: en\n" in vtt
+    assert len(yt_dlp_runs) == 1
+    assert yt_dlp_runs[0][yt_dlp_runs[0].index("--sub-lang") + 1] == "en,en-US,en-GB"
+
+
+def test_single_call_falls_back_when_preferred_language_is_missing(yt_dlp_runs, monkeypatch):
+    monkeypatch.setenv("FAKE_YT_DLP_LANGS", "en-GB")
+    vtt = core.download_subtitles_yt_dlp(VIDEO_URL, single_call=True)
+    assert vtt is not None and "Language: en-GB\n" in vtt
+    assert len(yt_dlp_runs) == 1
+
+
+def test_per_language_calls_stop_at_first_available(yt_dlp_runs, monkeypatch):
+    monkeypatch.setenv("FAKE_YT_DLP_LANGS", "en-US")
+    vtt = core.download_subtitles_yt_dlp(VIDEO_URL, single_call=False)
+    assert vtt is not None and "Language: en-US\n" in vtt
+    assert len(yt_dlp_runs) == 2 # en, then en-US
+
+
+def test_no_subtitles_in_any_language(yt_dlp_runs, monkeypatch):
+    monkeypatch.setenv("FAKE_YT_DLP_LANGS", "de")
+    reasons = {}
+    assert core.download_subtitles_yt_dlp(VIDEO_URL, single_call=True, reasons=reasons) is None
+    assert reasons == {VIDEO_URL: core.INGESTION_NO_SUBTITLES}
+    assert len(yt_dlp_runs) == 1
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(core, "DB_FILE", str(tmp_path / "test.db"))
+    core.init_db()
+    yield
+    core.close_db_connection()
+
+
+def test_rate_limited_batch_is_retried_later(yt_dlp_runs, db, monkeypatch):
+    """With --ignore-errors, yt-dlp reports HTTP 429 on subtitles as a warning and exits 0."""
+    monkeypatch.setenv("FAKE_YT_DLP_SUBTITLE_ERROR_RATE", "1")
+    urls = [VIDEO_URL, "https://www.youtube.com/watch?v=TESTVIDEO02"]
+    reasons = {}
+    results = core.download_subtitles_batch_yt_dlp(urls, reasons=reasons)
+    assert results == {url: None for url in urls}
+    assert all("HTTP Error 429" in reasons[url] for url in urls)
+
+    assert core.record_ingestion_failures(reasons, now=1000) == 2
+    deferred = core.get_deferred_downloads(urls, now=1000)
+    assert {status for status, _ in deferred.values()} == {core.INGESTION_FAILED}
+    assert all(next_retry_at == 1000 + core.INGESTION_RETRY_BASE for _, next_retry_at in deferred.values())
+    assert core.get_deferred_downloads(urls, now=1000 + core.INGESTION_RETRY_BASE) == {}
+
+
+def test_rate_limited_single_download_is_a_failure(yt_dlp_runs, monkeypatch):
+    monkeypatch.setenv("FAKE_YT_DLP_SUBTITLE_ERROR_RATE", "1")
+    reasons = {}
+    assert core.download_subtitles_yt_dlp(VIDEO_URL, single_call=True, reasons=reasons) is None
+    assert "HTTP Error 429" in reasons[VIDEO_URL]
+
+
+def test_batch_tells_missing_subtitles_from_failures(yt_dlp_runs, monkeypatch):
+    monkeypatch.setenv("FAKE_YT_DLP_LANGS", "de")
+    reasons = {}
+    core.download_subtitles_batch_yt_dlp([VIDEO_URL], reasons=reasons)
+    assert reasons == {VIDEO_URL: core.INGESTION_NO_SUBTITLES}
+
+    silent = subprocess.CompletedProcess([], 0, stdout="[youtube] TESTVIDEO01: Downloading webpage\n")
+    assert core._explain_missing_subtitles(silent, [VIDEO_URL])[VIDEO_URL] != core.INGESTION_NO_SUBTITLES
+
+
+@pytest.mark.parametrize("first_ok, expected", [(True, (1, 1, 0)), (False, (0, 0, 2))])
+def test_video_in_two_series_is_downloaded_once(yt_dlp_runs, db, monkeypatch, first_ok, expected):
+    playlist_url = "https://www.youtube.com/playlist?list=SHARED01n1"
+    downloads = []
+
+    def download_batch(video_urls, reasons=None):
+        downloads.extend(video_urls)
+        if not first_ok and reasons is not None:
+            reasons.update({url: "yt-dlp exited with code 1" for url in video_urls})
+        return {url: fake_yt_dlp.synthetic_vtt("SHARED01", 5) if first_ok else None for url in video_urls}
+
+    monkeypatch.setattr(core, "download_subtitles_batch_yt_dlp", download_batch)
+    lectures = core.LectureIndex([core.SeriesRecord("First Series", playlist_url, 1, 1, True),
+                                  core.SeriesRecord("Second Series", playlist_url, 1, 1, True)])
+    results = core.bulk_download_watched_subtitles(lectures)
+    assert len(downloads) == 1
+    assert (results["downloaded"], results["skipped"], results["failed"]) == expected
+    assert any("earlier in this run" in message for message in results["messages"])
@@ -0,0 +1,90 @@
+# tests/test_subtitle_writer.py
+"""Buffered subtitle writes during bulk ingestion: rows are committed within flush_seconds."""
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, "benchmarks"))
+
+import lecture_manager_core as core
+import fake_yt_dlp
+
+FAKE_YT_DLP = os.path.join(REPO_DIR, "benchmarks", "fake_yt_dlp.py")
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(core, "DB_FILE", str(tmp_path / "test.db"))
+    core.init_db()
+    yield
+    core.close_db_connection()
+
+
+def committed_urls():
+    """Subtitle URLs visible to another connection, i.e. committed."""
+    conn = sqlite3.connect(core.DB_FILE)
+    try:
+        return {row[0] for row in conn.execute("SELECT video_url FROM subtitles")}
+    finally:
+        conn.close()
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_lone_row_is_flushed_once_due(db):
+    stored = []
+    url = "https://www.youtube.com/watch?v=LONEROW0001"
+    with core.SubtitleWriter(on_result=lambda video_url, ok: stored.append((video_url, ok)),
+                             flush_rows=50, flush_seconds=0.05) as writer:
+        writer.add("Series", 0, "Lecture 1", url, fake_yt_dlp.synthetic_vtt("LONEROW0001", 5))
+        writer.flush_if_due()
+        assert committed_urls() == set() # Not due yet
+        assert 0 < writer.seconds_until_due() <= 0.05
+        time.sleep(0.06)
+        assert writer.seconds_until_due() == 0
+        writer.flush_if_due()
+        assert committed_urls() == {url}
+        assert stored == [(url, True)]
+        assert writer.seconds_until_due() is None
+
+
+def test_bulk_ingestion_commits_while_waiting_for_a_slow_chunk(db, monkeypatch):
+    """A stored subtitle is committed within flush_seconds even when the next yt-dlp chunk takes much longer."""
+    monkeypatch.setattr(core, "YT_DLP_PATH", FAKE_YT_DLP)
+    monkeypatch.setattr(core, "SUBTITLE_WRITE_BATCH_SECONDS", 0.05)
+    playlist_url = "https://www.youtube.com/playlist?list=SLOW0001n2"
+    first_url, second_url = [video["url"] for video in fake_yt_dlp.playlist_entries("SLOW0001n2")]
+    release_second = threading.Event()
+
+    def download_batch(video_urls, reasons=None):
+        if video_urls == [second_url]:
+            release_second.wait(10)
+            if reasons is not None:
+                reasons[second_url] = "yt-dlp exited with code 1"
+            return {second_url: None}
+        return {url: fake_yt_dlp.synthetic_vtt(url[-10:], 5) for url in video_urls}
+
+    monkeypatch.setattr(core, "download_subtitles_batch_yt_dlp", download_batch)
+    lectures = core.LectureIndex([core.SeriesRecord("Slow Series", playlist_url, 2, 10, True)])
+    results = {}
+    runner = threading.Thread(target=lambda: results.update(core.bulk_download_watched_subtitles(lectures, batch_size=1)))
+    runner.start()
+    try:
+        assert wait_for(lambda: committed_urls() == {first_url}) # Committed while the second chunk is still running
+    finally:
+        release_second.set()
+        runner.join(10)
+    assert (results["downloaded"], results["skipped"], results["failed"]) == (1, 0, 1)
@@ -0,0 +1,99 @@
+# tests/test_vtt_cleaner.py
+"""clean_vtt_content against the pre-streaming cleaner (kept in benchmarks/bench_vtt_cleaner.py) and golden outputs."""
+import os
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, "benchmarks"))
+
+import lecture_manager_core as core
+import fake_yt_dlp
+from bench_vtt_cleaner import legacy_clean_vtt_content
+
+# Two rolling auto-caption lines: each line grows with word timings, then moves up above the next one.
+ROLLING_VTT = """WEBVTT
+Kind: captions
+Language: en
+
+00:00:00.000 --> 00:00:02.500 align:start position:0%
+
+so<00:00:00.300><c> today</c><00:00:00.600><c> we</c><00:00:00.900><c> look</c><00:00:01.200><c> at</c><00:00:01.500><c> groups</c>
+
+00:00:02.500 --> 00:00:02.510 align:start position:0%
+so today we look at groups
+
+
+00:00:02.510 --> 00:00:05.000 align:start position:0%
+so today we look at groups
+a<00:00:02.800><c> group</c><00:00:03.100><c> has</c><00:00:03.400><c> an</c><00:00:03.700><c> identity</c>
+
+00:00:05.000 --> 00:00:05.010 align:start position:0%
+a group has an identity
+
+
+00:00:05.010 --> 00:00:07.000 align:start position:0%
+a group has an identity
+and<00:00:05.300><c> inverses</c>
+"""
+
+def vtt(*cues: str) -> str:
+    """A plain VTT with one cue per second."""
+    lines = ["WEBVTT", ""]
+    for i, text in enumerate(cues):
+        lines += [f"00:00:{i:02d}.000 --> 00:00:{i + 1:02d}.000", text, ""]
+    return "\n".join(lines)
+
+
+@pytest.mark.parametrize("vtt_string", [
+    ROLLING_VTT,
+    fake_yt_dlp.synthetic_vtt("lecture", 200),
+    fake_yt_dlp.synthetic_vtt("other-lecture", 37, lang="en-GB"),
+])
+def test_untrimmed_output_matches_legacy_cleaner(vtt_string):
+    legacy = legacy_clean_vtt_content(vtt_string)
+    streaming = core.clean_vtt_content(vtt_string, trim_overlap=False)
+    # The legacy cleaner dropped the final cue; everything before it is identical.
+    assert streaming.split("\n")[:-1] == legacy.split("\n")
+
+
+def test_untrimmed_output_keeps_the_final_cue():
+    assert core.clean_vtt_content(ROLLING_VTT, trim_overlap=False) == (
+        "Kind: captions Language: en\n"
+        "so today we look at groups a group has an identity\n"
+        "a group has an identity and inverses")
+
+
+def test_trimmed_output_golden():
+    assert core.clean_vtt_content(ROLLING_VTT) == (
+        "Kind: captions Language: en\n"
+        "so today we look at groups a group has an identity\n"
+        "and inverses")
+    assert list(core.iter_clean_vtt_cues(ROLLING_VTT.splitlines())) == [
+        (0, 0, "Kind: captions Language: en"),
+        (0, 5000, "so today we look at groups a group has an identity"),
+        (5000, 7000, "and inverses"),
+    ]
+
+
+def test_empty_input():
+    assert core.clean_vtt_content("") == ""
+    assert core.clean_vtt_content("WEBVTT\n\n") == ""
+
+
+@pytest.mark.parametrize("cues, expected", [
+    # A one-word overlap is below ROLLING_OVERLAP_MIN_WORDS: a genuine repeat, kept
+    (("this is the group", "group theory is fun"), "this is the group\ngroup theory is fun"),
+    # ROLLING_OVERLAP_MIN_WORDS words repeated from the previous line are trimmed
+    (("this is the group", "the group theory is fun"), "this is the group\ntheory is fun"),
+    # A line that only repeats the end of the previous one is dropped, however short
+    (("this is the group", "group", "next line"), "this is the group\nnext line"),
+    # No overlap
+    (("this is the group", "theory is fun"), "this is the group\ntheory is fun"),
+])
+def test_rolling_overlap_boundaries(cues, expected):
+    assert core.ROLLING_OVERLAP_MIN_WORDS == 2
+    assert core.clean_vtt_content(vtt(*cues)) == expected
+    assert core.clean_vtt_content(vtt(*cues), trim_overlap=False) == "\n".join(cues)
@@ -0,0 +1,123 @@
+# tests/test_workers.py
+"""State shared between worker processes through DB_FILE: process locks, generations and bulk jobs."""
+import multiprocessing
+import os
+import sys
+import time
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import lecture_manager_core as core
+
+FAKE_YT_DLP = os.path.join(REPO_DIR, "benchmarks", "fake_yt_dlp.py")
+PLAYLIST_URL = "https://www.youtube.com/playlist?list=WORKERS1n3"
+CHILD_TIMEOUT = 20
+
+# Spawned, not forked: a worker process doesn't inherit the parent's threads or SQLite connections
+spawn = multiprocessing.get_context("spawn")
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(core, "DB_FILE", str(tmp_path / "test.db"))
+    core.init_db()
+    yield str(tmp_path / "test.db")
+    core.close_db_connection()
+
+
+def run_worker(target, *args):
+    """Starts target(*args) in another process."""
+    process = spawn.Process(target=target, args=args, daemon=True)
+    process.start()
+    return process
+
+
+# --- Worker process bodies ---
+def hold_lock(db_file, name, acquired, release):
+    core.DB_FILE = db_file
+    lock = core.ProcessLock(name)
+    lock.acquire()
+    acquired.set()
+    release.wait(CHILD_TIMEOUT)
+    lock.release()
+
+
+def publish_playlist(db_file, videos):
+    core.DB_FILE = db_file
+    core.save_cached_playlist(PLAYLIST_URL, videos)
+    core.bump_generation(core.PLAYLISTS_GENERATION)
+
+
+def run_bulk_job(db_file, library_key, started):
+    core.DB_FILE = db_file
+    core.YT_DLP_PATH = FAKE_YT_DLP
+    os.environ["FAKE_YT_DLP_LATENCY"] = "10" # yt-dlp runs outlast the test, which kills this process
+    lectures = core.LectureIndex([core.SeriesRecord("Worker Series", PLAYLIST_URL, 2, 3, True)])
+    job, was_started = core.start_bulk_download_job(lectures, library_key)
+    started.put((job["job_id"], was_started))
+    time.sleep(CHILD_TIMEOUT)
+
+
+# --- Tests ---
+def test_process_lock_excludes_other_processes(db):
+    acquired, release = spawn.Event(), spawn.Event()
+    lock = core.ProcessLock("shared")
+    worker = run_worker(hold_lock, db, "shared", acquired, release)
+    try:
+        assert acquired.wait(CHILD_TIMEOUT)
+        assert lock.acquire(timeout=0) is False
+        other = core.ProcessLock("other") # Locks are per name
+        assert other.acquire(timeout=0) is True
+        other.release()
+    finally:
+        release.set()
+        worker.join(CHILD_TIMEOUT)
+    assert lock.acquire(timeout=5) is True
+    lock.release()
+
+
+def test_generation_bump_clears_other_process_playlist_cache(db):
+    old_videos = [{"title": "Old lecture", "url": "https://www.youtube.com/watch?v=WORKERS1v0"}]
+    new_videos = old_videos + [{"title": "New lecture", "url": "https://www.youtube.com/watch?v=WORKERS1v1"}]
+    core.save_cached_playlist(PLAYLIST_URL, old_videos)
+    assert core.get_playlist_videos_yt_dlp(PLAYLIST_URL) == old_videos
+    assert PLAYLIST_URL in core._playlist_cache
+
+    worker = run_worker(publish_playlist, db, new_videos)
+    worker.join(CHILD_TIMEOUT)
+    assert worker.exitcode == 0
+    time.sleep(core.SHARED_STATE_POLL_INTERVAL + 0.1)
+    core._sync_playlist_cache()
+    assert core._playlist_cache == {}
+    assert core.get_playlist_videos_yt_dlp(PLAYLIST_URL) == new_videos
+
+
+def test_one_bulk_job_per_library_across_processes(db, monkeypatch):
+    monkeypatch.setattr(core, "YT_DLP_PATH", FAKE_YT_DLP)
+    started = spawn.Queue()
+    worker = run_worker(run_bulk_job, db, "library-a", started)
+    try:
+        job_id, was_started = started.get(timeout=CHILD_TIMEOUT)
+        assert was_started is True
+        lectures = core.LectureIndex([core.SeriesRecord("Worker Series", PLAYLIST_URL, 2, 3, True)])
+        job, was_started = core.start_bulk_download_job(lectures, "library-a")
+        assert was_started is False
+        assert job["job_id"] == job_id and job["status"] == "running"
+        assert core.get_bulk_download_job(job_id)["status"] == "running"
+    finally:
+        worker.kill()
+        worker.join(CHILD_TIMEOUT)
+
+    # The process running it died: the next start marks it interrupted and runs a new job
+    monkeypatch.setenv("FAKE_YT_DLP_LATENCY", "0")
+    job, was_started = core.start_bulk_download_job(lectures, "library-a")
+    assert was_started is True and job["job_id"] != job_id
+    interrupted = core.get_bulk_download_job(job_id)
+    assert interrupted["status"] == "error" and interrupted["error"].startswith("Interrupted")
+    deadline = time.monotonic() + CHILD_TIMEOUT
+    while core.get_bulk_download_job(job["job_id"])["status"] == "running" and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert core.get_bulk_download_job(job["job_id"])["status"] == "finished"
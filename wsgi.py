@@ -0,0 +1,14 @@
+# wsgi.py
+"""
+Entry point for running the app under a production WSGI server with several worker processes:
+
+    LECTURE_MANAGER_SECRET_KEY=... gunicorn -w 4 --threads 4 wsgi:app
+
+Workers share lecture_subtitles.db: user libraries, cached playlists, subtitles and the yt-dlp
+check live there, and a reload of lectures.csv in one worker reaches the others within
+core.SHARED_STATE_POLL_INTERVAL. Don't use --preload: each worker must start its own background
+threads (startup, prefetcher, CSV sync), which do not survive a fork.
+"""
+from app import app
+
+application = app